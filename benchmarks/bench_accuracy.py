@@ -0,0 +1,75 @@
+"""
+Benchmark: Batch Accuracy Scoring
+Compares per-call MetricsEvaluator.evaluate_accuracy against
+evaluate_accuracy_batch and checks that the scores agree
+Author: Context Windows Lab
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+from utils.text_generator import TextGenerator
+
+EXPECTED = "The CEO of the company is David Cohen"
+
+
+def make_responses(count: int, words: int, seed: int):
+    """Mix of exact answers, near misses and long filler responses"""
+    rng = np.random.default_rng(seed)
+    responses = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            responses.append(EXPECTED)
+        elif kind == 1:
+            responses.append("The CEO is John Smith")
+        elif kind == 2:
+            responses.append(EXPECTED.replace("David", "Daniel"))
+        else:
+            responses.append(TextGenerator.generate_filler_text(words, rng=rng))
+    return responses
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Accuracy scoring benchmark')
+    parser.add_argument('--responses', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=200,
+                        help='Words in the long filler responses')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    responses = make_responses(args.responses, args.words, args.seed)
+    print(f"Scoring {len(responses):,} responses")
+
+    start = time.perf_counter()
+    reference = [MetricsEvaluator.evaluate_accuracy(r, EXPECTED) for r in responses]
+    baseline = time.perf_counter() - start
+    print(f"  {'evaluate_accuracy':<28} {baseline:8.3f}s")
+
+    for workers in (1, args.workers):
+        start = time.perf_counter()
+        scores = MetricsEvaluator.evaluate_accuracy_batch(
+            responses, EXPECTED, workers=workers,
+            chunk_size=max(1, len(responses) // workers)
+        )
+        elapsed = time.perf_counter() - start
+        label = f"evaluate_accuracy_batch x{workers}"
+        print(
+            f"  {label:<28} {elapsed:8.3f}s  {baseline / elapsed:6.1f}x"
+            f"  match={scores == reference}"
+        )
+
+
+if __name__ == "__main__":
+    main()
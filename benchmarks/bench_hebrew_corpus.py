@@ -0,0 +1,60 @@
+"""
+Benchmark: Templated Hebrew Corpus Generation
+Measures documents/min of HebrewCorpusGenerator against the fixed-sentence
+generator in TextGenerator
+Author: Context Windows Lab
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.hebrew_corpus import HebrewCorpusGenerator
+from utils.text_generator import TextGenerator
+
+
+def bench(label: str, func, docs: int) -> None:
+    """Consume func() and print docs/min and distinct-document ratio"""
+    start = time.perf_counter()
+    texts = [doc['text'] for doc in func()]
+    elapsed = time.perf_counter() - start
+    distinct = len(set(texts)) / len(texts)
+    print(
+        f"  {label:<22} {elapsed:8.3f}s  {docs / elapsed * 60:14,.0f} docs/min"
+        f"  distinct={distinct:.1%}"
+    )
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Hebrew corpus benchmark')
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--distribution', type=str, default='uniform')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = np.random.default_rng(42)
+
+    print(f"\nGenerating {args.docs} Hebrew documents")
+    bench(
+        "fixed sentences",
+        lambda: TextGenerator.iter_hebrew_documents(args.docs, rng=rng),
+        args.docs
+    )
+    generator = HebrewCorpusGenerator(distribution=args.distribution)
+    bench(
+        "templated engine",
+        lambda: generator.iter_documents(args.docs, rng=rng),
+        args.docs
+    )
+    print()
+
+
+if __name__ == "__main__":
+    main()
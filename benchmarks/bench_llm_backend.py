@@ -0,0 +1,92 @@
+"""
+Benchmark: HTTP LLM Backend Load Test
+Drives the local mock server through HTTPBackend at several pool sizes and
+concurrency levels, with and without keep-alive connections
+Author: Context Windows Lab
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.clock import VirtualClock, WALL_CLOCK
+from utils.llm_backends import HTTPBackend
+from utils.mock_server import start_server
+from utils.text_generator import TextGenerator
+
+
+async def load(backend, contexts, mode):
+    """Issue one query per context concurrently; latencies in seconds"""
+    answers = await asyncio.gather(*(
+        backend.query(context, "Who is the CEO of the company?", mode=mode,
+                      rng=np.random.default_rng(i))
+        for i, context in enumerate(contexts)
+    ))
+    return np.array([latency for _, _, latency in answers])
+
+
+def run(base_url, contexts, mode, pool_size, concurrency, keep_alive):
+    """Throughput and latency of one configuration"""
+    backend = HTTPBackend(base_url, pool_size=pool_size, max_concurrency=concurrency, retries=0)
+    if not keep_alive:
+        # Server closes the socket after every response
+        backend._headers["Connection"] = "close"
+    try:
+        start = time.perf_counter()
+        latencies = asyncio.run(load(backend, contexts, mode))
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.close()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    label = f"pool={pool_size:<3} conc={concurrency:<3} {'keep-alive' if keep_alive else 'close':<10}"
+    print(
+        f"  {label} {len(contexts) / elapsed:8.0f} req/s"
+        f"  p50={p50:7.2f}ms  p99={p99:7.2f}ms"
+        f"  tcp connections={backend.pool.created if keep_alive else len(contexts)}"
+    )
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='HTTP LLM backend load test')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--docs', type=int, default=5,
+                        help='Documents per request context')
+    parser.add_argument('--clock', choices=['virtual', 'wall'], default='virtual',
+                        help='virtual: network path only; wall: server sleeps the mock latency')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    server = start_server(clock=VirtualClock() if args.clock == 'virtual' else WALL_CLOCK)
+    # Experiment 3 modes wait a tenth of the simulated latency on a wall clock
+    mode = 'rag'
+    context = str(TextGenerator.build_context(TextGenerator.create_documents(
+        num_docs=args.docs, words_per_doc=200, fact="The CEO of the company is David Cohen",
+        rng=np.random.default_rng(args.seed)
+    )))
+    contexts = [context] * args.requests
+    print(
+        f"{args.requests:,} requests, {len(context):,} chars/context, "
+        f"clock={args.clock}, server={server.base_url}"
+    )
+
+    try:
+        run(server.base_url, contexts, mode, pool_size=1, concurrency=1, keep_alive=False)
+        run(server.base_url, contexts, mode, pool_size=1, concurrency=1, keep_alive=True)
+        for pool_size in (4, 16):
+            run(server.base_url, contexts, mode, pool_size, pool_size, keep_alive=False)
+            run(server.base_url, contexts, mode, pool_size, pool_size, keep_alive=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
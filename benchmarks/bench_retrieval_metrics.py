@@ -0,0 +1,89 @@
+"""
+Benchmark: Batch Retrieval Metrics
+Compares a per-query Python loop with the vectorized
+evaluate_retrieval_batch (recall/precision/nDCG at several k, MRR, MAP)
+Author: Context Windows Lab
+"""
+
+import argparse
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+
+
+def loop_metrics(ranked, relevant_sets, ks):
+    """Same metrics as evaluate_retrieval_batch, one query at a time"""
+    totals = {}
+    for ranking, relevant in zip(ranked, relevant_sets):
+        if not relevant:
+            continue
+        hits = [1 if doc in relevant else 0 for doc in ranking]
+        values = {}
+        for k in ks:
+            found = sum(hits[:k])
+            values[f"recall@{k}"] = found / len(relevant)
+            values[f"precision@{k}"] = found / k
+            dcg = sum(h / math.log2(i + 2) for i, h in enumerate(hits[:k]))
+            ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevant), k, len(hits))))
+            values[f"ndcg@{k}"] = dcg / ideal
+        values["mrr"] = next((1 / (i + 1) for i, h in enumerate(hits) if h), 0.0)
+        found, precision_sum = 0, 0.0
+        for i, h in enumerate(hits):
+            if h:
+                found += 1
+                precision_sum += found / (i + 1)
+        values["map"] = precision_sum / len(relevant)
+        for name, value in values.items():
+            totals[name] = totals.get(name, 0.0) + value
+    return totals
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Retrieval metrics benchmark')
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--docs', type=int, default=1000)
+    parser.add_argument('--depth', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(args.seed)
+    scores = rng.random((args.queries, args.docs))
+    ranked = np.argsort(-scores, axis=1)[:, :args.depth]
+    relevance = rng.random((args.queries, args.docs)) < 0.02
+    print(f"{args.queries:,} queries, {args.docs:,} docs, depth {args.depth}")
+
+    ks = (1, 5, 10, 50, 100)
+    relevant_sets = [set(np.flatnonzero(row).tolist()) for row in relevance]
+    ranked_lists = ranked.tolist()
+
+    start = time.perf_counter()
+    totals = loop_metrics(ranked_lists, relevant_sets, ks)
+    loop = time.perf_counter() - start
+    print(f"  {'per-query Python loop':<24} {loop:8.3f}s")
+
+    start = time.perf_counter()
+    metrics = MetricsEvaluator.evaluate_retrieval_batch(ranked, relevance, ks=ks)
+    batch = time.perf_counter() - start
+    evaluated = metrics['num_queries']
+    match = all(
+        abs(totals[name] / evaluated - metrics[name]) < 1e-9 for name in totals
+    )
+    print(
+        f"  {'evaluate_retrieval_batch':<24} {batch:8.3f}s"
+        f"  {loop / batch:6.1f}x  match={match}"
+    )
+    print(f"  MRR={metrics['mrr']:.4f}  MAP={metrics['map']:.4f}  nDCG@10={metrics['ndcg@10']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
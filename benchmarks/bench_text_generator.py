@@ -0,0 +1,82 @@
+"""
+Benchmark: Filler Text Generation Throughput
+Compares the legacy per-word random.choice generator with the
+vectorized NumPy batch generator in TextGenerator
+Author: Context Windows Lab
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.text_generator import TextGenerator
+
+
+def legacy_filler_text(words: int) -> str:
+    """Original per-word implementation, kept here as the baseline"""
+    text_words = []
+    for _ in range(words):
+        word = random.choice(TextGenerator.FILLER_WORDS)
+        text_words.append(word)
+
+    sentences = []
+    for i in range(0, len(text_words), random.randint(10, 15)):
+        sentence_words = text_words[i:i+random.randint(10, 15)]
+        if sentence_words:
+            sentence = " ".join(sentence_words).capitalize() + "."
+            sentences.append(sentence)
+
+    return " ".join(sentences)
+
+
+def bench(label: str, func, total_words: int) -> float:
+    """Run func once and print words/sec"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    rate = total_words / elapsed
+    print(f"  {label:<28} {elapsed:8.3f}s  {rate:14,.0f} words/sec")
+    return rate
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Filler generation benchmark')
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(42)
+    rng = np.random.default_rng(42)
+    total_words = args.docs * args.words
+
+    print(f"\nGenerating {args.docs} docs x {args.words} words")
+
+    before = bench(
+        "legacy per-word",
+        lambda: [legacy_filler_text(args.words) for _ in range(args.docs)],
+        total_words
+    )
+
+    def batched():
+        remaining = args.docs
+        while remaining > 0:
+            n = min(args.batch_size, remaining)
+            TextGenerator.generate_filler_batch(n, args.words, rng=rng)
+            remaining -= n
+
+    after = bench("vectorized batch", batched, total_words)
+    print(f"\n  Speedup: {after / before:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: Timing Registry Overhead
+Measures the per-sample cost of TimingRegistry.record and timer() against
+an empty loop, and the percentile error of the log-bucketed histogram
+Author: Context Windows Lab
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from utils.timing import LatencyHistogram, TimingRegistry
+
+
+def per_sample_ns(func, samples: int) -> float:
+    """Average nanoseconds of func(samples) per sample, minus an empty loop"""
+    start = time.perf_counter_ns()
+    for _ in range(samples):
+        pass
+    empty = time.perf_counter_ns() - start
+
+    start = time.perf_counter_ns()
+    func(samples)
+    return (time.perf_counter_ns() - start - empty) / samples
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Timing registry benchmark')
+    parser.add_argument('--samples', type=int, default=1000000)
+    args = parser.parse_args()
+
+    registry = TimingRegistry()
+
+    def record(n):
+        for _ in range(n):
+            registry.record("llm_call", 123456)
+
+    def timer(n):
+        for _ in range(n):
+            with registry.timer("evaluation"):
+                pass
+
+    def clock_only(n):
+        clock = time.perf_counter_ns
+        for _ in range(n):
+            clock()
+            clock()
+
+    print(f"Per-sample overhead ({args.samples:,} samples)")
+    print(f"  {'2x perf_counter_ns':<24} {per_sample_ns(clock_only, args.samples):8.1f} ns")
+    print(f"  {'record()':<24} {per_sample_ns(record, args.samples):8.1f} ns")
+    print(f"  {'with timer()':<24} {per_sample_ns(timer, args.samples):8.1f} ns")
+
+    values = np.random.default_rng(0).lognormal(15, 1.5, args.samples).astype(np.int64)
+    histogram = LatencyHistogram()
+    for value in values.tolist():
+        histogram.record(value)
+    quantiles = [0.5, 0.9, 0.99]
+    estimated = histogram.percentiles(quantiles)
+    exact = np.quantile(values, quantiles, method="inverted_cdf")
+    print("Percentile relative error (lognormal samples)")
+    for q, est, ref in zip(quantiles, estimated, exact):
+        print(f"  p{int(q * 100):<3} {abs(est - ref) / ref:8.3%}")
+
+
+if __name__ == "__main__":
+    main()
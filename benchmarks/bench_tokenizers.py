@@ -0,0 +1,72 @@
+"""
+Benchmark: Token Counting
+Measures counting throughput of the heuristic and byte-level BPE tokenizers,
+cold and memoized, and how far the heuristic drifts on English vs Hebrew
+Author: Context Windows Lab
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from utils.tokenizers import BPETokenizer, HeuristicTokenizer
+from utils.text_generator import TextGenerator
+
+
+def bench(label: str, func, texts) -> int:
+    """Run func(texts), print texts/s and MB/s, return the token total"""
+    nbytes = sum(len(t.encode("utf-8")) for t in texts)
+    start = time.perf_counter()
+    counts = func(texts)
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {label:<26} {elapsed:8.3f}s  {len(texts) / elapsed:12,.0f} texts/s"
+        f"  {nbytes / elapsed / 1e6:8.1f} MB/s"
+    )
+    return sum(counts)
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Tokenizer benchmark')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--vocab', type=str, default=None, help='vocab.json path')
+    parser.add_argument('--merges', type=str, default=None, help='merges.txt path')
+    parser.add_argument('--vocab-size', type=int, default=2048,
+                        help='Vocabulary size when training in-process')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    corpora = {
+        "english": [doc['text'] for doc in TextGenerator.iter_documents(
+            args.docs, 200, "The CEO of the company is David Cohen")],
+        "hebrew": [doc['text'] for doc in TextGenerator.iter_hebrew_documents(args.docs)],
+    }
+
+    if args.vocab and args.merges:
+        bpe = BPETokenizer.from_files(args.vocab, args.merges)
+    else:
+        start = time.perf_counter()
+        sample = corpora["english"][:200] + corpora["hebrew"][:200]
+        bpe = BPETokenizer.train(sample, args.vocab_size)
+        print(f"Trained {len(bpe.vocab)}-token BPE in {time.perf_counter() - start:.2f}s")
+    heuristic = HeuristicTokenizer()
+
+    for name, texts in corpora.items():
+        # Distinct texts so the cold pass is not served from the memo
+        texts = [f"{i} {text}" for i, text in enumerate(texts)]
+        print(f"\n{name} ({len(texts):,} documents)")
+        approx = bench("heuristic", heuristic.count_batch, texts)
+        bpe._cache.clear()
+        bpe._word_cache.clear()
+        exact = bench("bpe (cold)", bpe.count_batch, texts)
+        bench("bpe (memoized)", bpe.count_batch, texts)
+        print(f"  heuristic / bpe token ratio: {approx / exact:.2f}")
+
+
+if __name__ == "__main__":
+    main()
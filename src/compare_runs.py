@@ -0,0 +1,124 @@
+"""
+Context Windows Laboratory - Run Comparison Script
+Flags latency, token and accuracy regressions between result directories
+Author: Context Windows Lab
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for relative imports
+sys.path.append(str(Path(__file__).parent))
+
+from utils.cli_utils import print_header
+from utils.config import Config
+from utils.regression import load_runs, compare_runs, SIGNIFICANCE_TESTS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Compare runs and exit non-zero on a regression"""
+    settings = Config.get_regression_config()
+    parser = argparse.ArgumentParser(
+        description='Context Windows Laboratory - Cross-run regression check',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python src/main.py --experiment all --output-dir runs/base
+  python src/main.py --experiment all --output-dir runs/new
+  python src/compare_runs.py --baseline runs/base --candidate runs/new
+  python src/compare_runs.py --baseline runs/base1 runs/base2 --candidate runs/new1 runs/new2
+        """
+    )
+    parser.add_argument('--baseline', nargs='+', required=True,
+                        help='Results directories of the baseline run(s)')
+    parser.add_argument('--candidate', nargs='+', required=True,
+                        help='Results directories of the candidate run(s)')
+    parser.add_argument('--latency-tolerance', type=float, default=settings['latency_tolerance'],
+                        help='Allowed relative latency increase (default: %(default)s)')
+    parser.add_argument('--min-latency-ms', type=float, default=settings['min_latency_ms'],
+                        help='Ignore latency increases below this many ms (default: %(default)s)')
+    parser.add_argument('--tokens-tolerance', type=float, default=settings['tokens_tolerance'],
+                        help='Allowed relative token increase (default: %(default)s)')
+    parser.add_argument('--accuracy-tolerance', type=float, default=settings['accuracy_tolerance'],
+                        help='Allowed absolute accuracy drop (default: %(default)s)')
+    parser.add_argument('--alpha', type=float, default=settings['alpha'],
+                        help='Significance level for repeated observations (default: %(default)s)')
+    parser.add_argument('--method', choices=sorted(SIGNIFICANCE_TESTS), default='permutation',
+                        help='Significance test (default: %(default)s)')
+    parser.add_argument('--resamples', type=int, default=10000,
+                        help='Resamples per significance test (default: %(default)s)')
+    parser.add_argument('--metrics', nargs='+', default=['*'],
+                        help='Metric name patterns to compare (default: all)')
+    parser.add_argument('--ignore', nargs='*', default=['*.timings.plotting.*'],
+                        help='Metric name patterns to skip (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the significance tests (default: %(default)s)')
+    parser.add_argument('--report', type=str, default=None,
+                        help='Write the comparison as JSON to this file')
+    parser.add_argument('--all', action='store_true',
+                        help='List every compared metric, not only regressions')
+    args = parser.parse_args()
+
+    baseline = load_runs(args.baseline)
+    candidate = load_runs(args.candidate)
+    comparisons = compare_runs(
+        baseline, candidate,
+        tolerances={
+            "latency": args.latency_tolerance,
+            "tokens": args.tokens_tolerance,
+            "accuracy": args.accuracy_tolerance
+        },
+        alpha=args.alpha,
+        method=args.method,
+        resamples=args.resamples,
+        patterns=args.metrics,
+        ignore=args.ignore,
+        min_latency_ms=args.min_latency_ms,
+        rng=np.random.default_rng(args.seed)
+    )
+    if not comparisons:
+        logger.error("No metrics in common between baseline and candidate")
+        sys.exit(2)
+
+    regressions = [c for c in comparisons if c['regression']]
+    print_header(
+        f"RUN COMPARISON: {len(comparisons)} metrics, {len(regressions)} regressions"
+    )
+    for c in comparisons if args.all else regressions:
+        p_value = "-" if c['p_value'] is None else f"{c['p_value']:.4f}"
+        flag = "REGRESSION" if c['regression'] else ""
+        print(
+            f"  {c['metric']:<48} {c['baseline_mean']:>12.4g} -> {c['candidate_mean']:<12.4g}"
+            f" ({c['relative_delta']:+.1%})  p={p_value:<7} {flag}"
+        )
+
+    if args.report:
+        report_path = Path(args.report)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump({
+                "baseline": args.baseline,
+                "candidate": args.candidate,
+                "method": args.method,
+                "alpha": args.alpha,
+                "comparisons": comparisons
+            }, f, indent=2)
+        logger.info(f"Comparison saved to {report_path}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
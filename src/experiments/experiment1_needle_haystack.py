@@ -4,16 +4,31 @@ Demonstrates the "Lost in the Middle" phenomenon
 Author: Context Windows Lab
 """
 
+import asyncio
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 import sys
+
+import numpy as np
+
 sys.path.append(str(Path(__file__).parent.parent))
 
 from utils.text_generator import TextGenerator
+from utils.compact_corpus import CompactCorpus
+from utils.document_table import DocumentTable
+from utils.corpus_store import CorpusReader
+from utils.rng import RNGContext, root_context, CORPUS_STREAM
+from utils.corpus_cache import get_documents
 from utils.metrics import MetricsEvaluator
 from utils.visualization import Visualizer
+from utils.timing import TimingRegistry
+from utils.running_stats import RunningStats
+from utils.llm_backends import LLMBackend, CallableBackend, create_backend, with_cache
+from utils.config import Config
 
 # Configure logging
 logging.basicConfig(
@@ -33,7 +48,16 @@ class NeedleHaystackExperiment:
         self,
         num_docs: int = 5,
         words_per_doc: int = 200,
-        critical_fact: str = "The CEO of the company is David Cohen"
+        critical_fact: str = "The CEO of the company is David Cohen",
+        stream: bool = False,
+        batch_size: int = 1000,
+        compact: bool = False,
+        corpus_path: str = None,
+        rng: Optional[RNGContext] = None,
+        workers: int = 1,
+        keep_trials: bool = True,
+        backend: Optional[LLMBackend] = None,
+        use_cache: Optional[bool] = None
     ):
         """
         Initialize experiment
@@ -42,47 +66,104 @@ class NeedleHaystackExperiment:
             num_docs: Number of documents to generate
             words_per_doc: Words per document
             critical_fact: Fact to embed and search for
+            stream: Generate documents lazily instead of holding the corpus
+            batch_size: Documents generated per batch in streaming mode
+            compact: Hold the corpus as token-id arrays, rendering text lazily
+            corpus_path: Pre-built corpus file to read instead of generating
+            rng: Random context (default: process root context)
+            workers: Threads used to evaluate trials; results do not
+                depend on this value
+            keep_trials: Keep every trial's accuracy in self.results;
+                summaries only need the running statistics in self.stats
+            backend: LLM backend (default: this experiment's position-aware
+                mock when USE_MOCK_LLM, otherwise create_backend())
+            use_cache: Serve repeated calls of the default backend from
+                the response cache (default: ENABLE_CACHE)
         """
         self.num_docs = num_docs
         self.words_per_doc = words_per_doc
         self.critical_fact = critical_fact
+        self.stream = stream
+        self.batch_size = batch_size
+        self.compact = compact
+        self.corpus_path = corpus_path
+        self.rng = rng or root_context()
+        self.workers = workers
+        self.keep_trials = keep_trials
+        if backend is None:
+            backend = (
+                with_cache(CallableBackend(self._mock_call, Config.get_llm_concurrency()), use_cache)
+                if Config.get_llm_backend() == "mock" else create_backend(cache=use_cache)
+            )
+        self.backend = backend
         self.documents = []
         self.results = {'start': [], 'middle': [], 'end': []}
+        self.stats = {position: RunningStats() for position in self.results}
+        self.timings = TimingRegistry()
 
         logger.info(
             f"Initialized Needle in Haystack experiment: "
             f"{num_docs} docs, {words_per_doc} words/doc"
         )
 
-    def generate_documents(self) -> List[Dict]:
+    def generate_documents(self):
         """
         Generate synthetic documents with embedded facts
 
         Returns:
-            List of document dictionaries
+            DocumentTable, or the compact corpus
         """
+        if self.corpus_path:
+            with CorpusReader(self.corpus_path) as corpus:
+                self.documents = DocumentTable.from_documents(corpus)
+            logger.info(
+                f"Loaded {len(self.documents)} documents from {self.corpus_path}"
+            )
+            return self.documents
+
         logger.info("Generating documents with embedded facts")
 
-        self.documents = TextGenerator.create_documents(
+        if self.compact:
+            self.documents = CompactCorpus.generate(
+                num_docs=self.num_docs,
+                words_per_doc=self.words_per_doc,
+                fact=self.critical_fact,
+                rng=self.rng.corpus()
+            )
+            logger.info(f"Generated {len(self.documents)} compact documents")
+            return self.documents
+
+        # Shared with other experiments through the in-process corpus cache
+        self.documents = get_documents(
             num_docs=self.num_docs,
             words_per_doc=self.words_per_doc,
-            fact=self.critical_fact
+            fact=self.critical_fact,
+            rng=self.rng.derive(CORPUS_STREAM),
+            as_table=True
         )
 
         logger.info(f"Generated {len(self.documents)} documents")
         return self.documents
 
-    def query_llm_mock(self, context: str, query: str) -> str:
+    def query_llm_mock(
+        self,
+        context: str,
+        query: str,
+        rng: Optional[np.random.Generator] = None
+    ) -> str:
         """
         Mock LLM query for testing (simulates position-based accuracy)
 
         Args:
             context: Document context
             query: Query string
+            rng: NumPy generator for this trial
 
         Returns:
             Mock response
         """
+        rng = rng if rng is not None else self.rng.generator
+
         # Simulate Lost in the Middle phenomenon
         # Higher accuracy at start/end, lower in middle
 
@@ -101,14 +182,13 @@ class NeedleHaystackExperiment:
         position_ratio = fact_sentence_idx / len(sentences)
 
         # Simulate Lost in the Middle: lower accuracy in middle (0.3-0.7)
-        import random
         if position_ratio < 0.3 or position_ratio > 0.7:
             # High accuracy at start/end
-            if random.random() < 0.9:
+            if rng.random() < 0.9:
                 return self.critical_fact
         else:
             # Low accuracy in middle
-            if random.random() < 0.4:
+            if rng.random() < 0.4:
                 return self.critical_fact
 
         return "The CEO is John Smith"  # Wrong answer
@@ -122,35 +202,156 @@ class NeedleHaystackExperiment:
         """
         logger.info("Running Needle in Haystack experiment")
 
-        if not self.documents:
-            self.generate_documents()
+        chunks = self._iter_chunks(self._document_source())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # Chunking keeps streaming corpora bounded under the pool
+            while True:
+                with self.timings.timer("generation"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                self._score_chunk(chunk, list(pool.map(self._run_trial, chunk)))
 
-        query = f"Who is the CEO of the company?"
+        logger.info("Experiment completed successfully")
+        return self.results
 
-        for doc in self.documents:
-            context = doc['text']
-            position = doc['fact_position']
+    async def run_experiment_async(self, backend: Optional[LLMBackend] = None) -> Dict:
+        """
+        Execute the experiment with each chunk's trials queried concurrently
+
+        Results match run_experiment: trials keep their random streams and
+        are scored in document order.
 
-            # Query LLM
-            response = self.query_llm_mock(context, query)
+        Args:
+            backend: LLM backend (default: the experiment's)
 
-            # Evaluate accuracy
-            accuracy = MetricsEvaluator.evaluate_accuracy(
-                response=response,
+        Returns:
+            Results dictionary
+        """
+        logger.info("Running Needle in Haystack experiment (async)")
+        backend = backend or self.backend
+
+        chunks = self._iter_chunks(self._document_source())
+        while True:
+            with self.timings.timer("generation"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            trials = await asyncio.gather(
+                *(self._run_trial_async(doc, backend) for doc in chunk)
+            )
+            self._score_chunk(chunk, trials)
+
+        logger.info("Experiment completed successfully")
+        return self.results
+
+    def _document_source(self):
+        """Corpus to iterate: a lazy stream, or the generated/loaded documents"""
+        if self.stream and self.corpus_path:
+            return self._read_corpus()
+        if self.stream and not self.corpus_path:
+            # Bounded memory: documents are generated batch by batch
+            return TextGenerator.iter_documents(
+                num_docs=self.num_docs,
+                words_per_doc=self.words_per_doc,
+                fact=self.critical_fact,
+                batch_size=self.batch_size,
+                rng=self.rng.corpus()
+            )
+        if not len(self.documents):
+            with self.timings.timer("generation"):
+                self.generate_documents()
+        return self.documents
+
+    def _read_corpus(self) -> Iterator[Dict]:
+        """Stream the corpus file document by document, closing it once read"""
+        with CorpusReader(self.corpus_path) as corpus:
+            logger.info(f"Opened {len(corpus)} documents from {self.corpus_path}")
+            yield from corpus
+
+    def _score_chunk(self, chunk: DocumentTable, trials: List[Tuple[int, str, str]]) -> None:
+        """
+        Score a chunk's responses and fold them into the results
+
+        Args:
+            chunk: Documents of the chunk
+            trials: (document id, fact position, response) per document
+        """
+        # Score the whole chunk in one pass
+        with self.timings.timer("evaluation"):
+            accuracies = MetricsEvaluator.evaluate_accuracy_batch(
+                responses=[response for _, _, response in trials],
                 expected=self.critical_fact,
                 threshold=0.6
             )
 
-            # Store result
-            self.results[position].append(accuracy)
-
+        for (doc_id, position, _), accuracy in zip(trials, accuracies):
             logger.info(
-                f"Doc {doc['id']}: Position={position}, "
+                f"Doc {doc_id}: Position={position}, "
                 f"Accuracy={accuracy:.2f}"
             )
 
-        logger.info("Experiment completed successfully")
-        return self.results
+        # Store results grouped by fact position in one pass
+        for position, values in chunk.split_by("position", accuracies).items():
+            self.stats[position].update_batch(values)
+            if self.keep_trials:
+                self.results[position].extend(values.tolist())
+
+    def _iter_chunks(self, documents) -> Iterator[DocumentTable]:
+        """
+        Split documents into DocumentTable chunks of batch_size
+
+        Tables are sliced without copying; other sources (streams, compact
+        corpora, corpus files) are read one chunk at a time.
+
+        Args:
+            documents: DocumentTable or any iterable of documents
+
+        Yields:
+            DocumentTable per chunk
+        """
+        if isinstance(documents, DocumentTable):
+            for start in range(0, len(documents), self.batch_size):
+                yield documents[start:start + self.batch_size]
+            return
+
+        documents = iter(documents)
+        while True:
+            chunk = DocumentTable.from_documents(islice(documents, self.batch_size))
+            if not len(chunk):
+                return
+            yield chunk
+
+    def _run_trial(self, doc: Dict) -> Tuple[int, str, str]:
+        """
+        Query the LLM for a single document
+
+        Args:
+            doc: Document dictionary
+
+        Returns:
+            Tuple of (document id, fact position, response)
+        """
+        query = "Who is the CEO of the company?"
+
+        # Query LLM with the trial's own random stream
+        response, _, _ = self.backend.query_sync(
+            doc['text'], query, rng=self.rng.trial(doc['id']), timings=self.timings
+        )
+
+        return doc['id'], doc['fact_position'], response
+
+    async def _run_trial_async(self, doc: Dict, backend: LLMBackend) -> Tuple[int, str, str]:
+        """Async _run_trial through a backend"""
+        response, _, _ = await backend.query(
+            doc['text'], "Who is the CEO of the company?",
+            rng=self.rng.trial(doc['id']), timings=self.timings
+        )
+        return doc['id'], doc['fact_position'], response
+
+    def _mock_call(self, context: str, query: str, mode: Optional[str], rng) -> Tuple[str, float]:
+        """query_llm_mock in the CallableBackend signature"""
+        return self.query_llm_mock(context, query, rng=rng), 0.0
 
     def visualize_results(self, output_dir: str = "src/data/results/experiment1"):
         """
@@ -164,11 +365,16 @@ class NeedleHaystackExperiment:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        # Plot accuracy by position
-        Visualizer.plot_accuracy_by_position(
-            results=self.results,
-            output_path=str(output_path / "accuracy_by_position.png")
-        )
+        # Plot accuracy by position with bootstrap intervals
+        with self.timings.timer("plotting"):
+            Visualizer.plot_accuracy_by_position(
+                results={pos: [stats.mean] for pos, stats in self.stats.items()},
+                output_path=str(output_path / "accuracy_by_position.png"),
+                intervals={
+                    pos: stats.confidence_interval(rng=self.rng.bootstrap())
+                    for pos, stats in self.stats.items()
+                }
+            )
 
     def save_results(self, output_dir: str = "src/data/results/experiment1"):
         """
@@ -180,14 +386,15 @@ class NeedleHaystackExperiment:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        # Calculate statistics
-        summary = {}
-        for position, accuracies in self.results.items():
-            stats = MetricsEvaluator.aggregate_results(
-                [{"accuracy": acc} for acc in accuracies],
-                metric_key="accuracy"
-            )
-            summary[position] = stats
+        # Statistics come from the running aggregates, not the trial lists
+        summary = {
+            position: stats.to_dict(rng=self.rng.bootstrap())
+            for position, stats in self.stats.items()
+        }
+        summary["timings"] = self.timings.snapshot()
+        cache = self.backend.cache_stats()
+        if cache is not None:
+            summary["cache"] = cache
 
         # Save to JSON
         output_file = output_path / "summary.json"
@@ -0,0 +1,309 @@
+"""
+Experiment 2: Capacity Planning
+Fits latency-vs-context-size models and derives throughput and SLO limits
+Author: Context Windows Lab
+"""
+
+import logging
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fitted model families and their parameter counts
+MODELS = {"linear": 2, "quadratic": 3, "power_law": 2}
+
+# Context sizes (multiples of the largest tested size) to extrapolate to
+EXTRAPOLATION_FACTORS = (2, 4, 8)
+
+# Parts of a streamed response's latency: latency = ttft + decode_time
+LATENCY_COMPONENTS = ("ttft", "decode_time", "inter_token_latency")
+
+
+def _design_matrix(model: str, tokens: np.ndarray) -> np.ndarray:
+    """Least-squares design matrix of a model (power law in log space)"""
+    if model == "linear":
+        return np.column_stack([np.ones_like(tokens), tokens])
+    if model == "quadratic":
+        return np.column_stack([np.ones_like(tokens), tokens, tokens ** 2])
+    if model == "power_law":
+        return np.column_stack([np.ones_like(tokens), np.log(tokens)])
+    raise ValueError(f"Unknown latency model: {model}")
+
+
+def predict_latency(fit: Dict, tokens: Sequence[float]) -> np.ndarray:
+    """
+    Latency predicted by a fitted model
+
+    Args:
+        fit: Model entry from fit_latency_models
+        tokens: Context sizes in tokens
+
+    Returns:
+        Predicted latency (seconds) per size
+    """
+    tokens = np.asarray(tokens, dtype=np.float64)
+    coef = fit['coefficients']
+    if fit['model'] == "linear":
+        return coef[0] + coef[1] * tokens
+    if fit['model'] == "quadratic":
+        return coef[0] + coef[1] * tokens + coef[2] * tokens ** 2
+    # latency = a * tokens ** b
+    return coef[0] * np.power(tokens, coef[1])
+
+
+def fit_latency_models(tokens: Sequence[float], latencies: Sequence[float]) -> Dict[str, Dict]:
+    """
+    Fit linear, quadratic and power-law latency models with least squares
+
+    The power law is fitted as a line in log-log space; goodness of fit
+    is reported on the original scale for every model so they compare
+    directly. Models with as many parameters as points are skipped.
+
+    Args:
+        tokens: Context size of each measurement (tokens)
+        latencies: Measured latency of each measurement (seconds)
+
+    Returns:
+        Model name -> {model, coefficients, formula, r_squared,
+        adjusted_r_squared, rmse}
+    """
+    x = np.asarray(tokens, dtype=np.float64)
+    y = np.asarray(latencies, dtype=np.float64)
+    if len(x) != len(y):
+        raise ValueError(f"Got {len(x)} sizes and {len(y)} latencies")
+
+    total = float(((y - y.mean()) ** 2).sum())
+    fits = {}
+    for model, params in MODELS.items():
+        n = len(x)
+        if n <= params:
+            logger.debug(f"Skipping {model} fit: {n} points for {params} parameters")
+            continue
+        if model == "power_law" and (np.any(x <= 0) or np.any(y <= 0)):
+            logger.debug("Skipping power_law fit: non-positive values")
+            continue
+
+        target = np.log(y) if model == "power_law" else y
+        coef, *_ = np.linalg.lstsq(_design_matrix(model, x), target, rcond=None)
+        if model == "power_law":
+            coef = np.array([np.exp(coef[0]), coef[1]])
+
+        fit = {"model": model, "coefficients": coef.tolist()}
+        residuals = y - predict_latency(fit, x)
+        sse = float((residuals ** 2).sum())
+        r_squared = 1.0 - sse / total if total > 0 else 1.0
+        fit.update({
+            "formula": _formula(model, coef),
+            "r_squared": r_squared,
+            "adjusted_r_squared": 1.0 - (1.0 - r_squared) * (n - 1) / (n - params),
+            "rmse": float(np.sqrt(sse / n))
+        })
+        fits[model] = fit
+
+    return fits
+
+
+def _formula(model: str, coef: np.ndarray) -> str:
+    """Human-readable model equation (latency in s, tokens as T)"""
+    if model == "linear":
+        return f"{coef[0]:.4g} + {coef[1]:.4g}*T"
+    if model == "quadratic":
+        return f"{coef[0]:.4g} + {coef[1]:.4g}*T + {coef[2]:.4g}*T^2"
+    return f"{coef[0]:.4g}*T^{coef[1]:.4g}"
+
+
+def max_tokens_for_slo(fit: Dict, slo_seconds: float) -> Optional[float]:
+    """
+    Largest context size whose predicted latency stays within an SLO
+
+    Args:
+        fit: Model entry from fit_latency_models
+        slo_seconds: Latency objective (seconds)
+
+    Returns:
+        Token count, 0.0 if even an empty context breaks the SLO, or None
+        if the model never reaches the SLO (non-increasing latency)
+    """
+    coef = fit['coefficients']
+    if fit['model'] == "power_law":
+        a, b = coef
+        if b <= 0:
+            return None
+        return float((slo_seconds / a) ** (1.0 / b))
+
+    if coef[0] > slo_seconds:
+        return 0.0
+    # Smallest positive root of poly(T) = slo
+    poly = np.polynomial.Polynomial([coef[0] - slo_seconds] + list(coef[1:]))
+    roots = poly.roots()
+    positive = [r.real for r in roots if abs(r.imag) < 1e-9 and r.real > 0]
+    return float(min(positive)) if positive else None
+
+
+def build_latency_breakdown(results: List[Dict]) -> Optional[Dict]:
+    """
+    Which part of streamed latency grows with context size
+
+    Each component is fitted with a line against context tokens. Growth
+    is the fitted change across the tested range; the share of latency
+    growth due to time to first token (prefill) and to decoding tells
+    which component scales with context.
+
+    Args:
+        results: Experiment 2 result dictionaries (tokens_used, latency,
+            ttft, decode_time, inter_token_latency)
+
+    Returns:
+        Breakdown dictionary, or None for unstreamed results or fewer
+        than two sizes. A component not measured at every size (e.g.
+        inter-token latency of one-token responses) is reported as None;
+        scales_with_context is None when neither TTFT nor decode time
+        grows.
+    """
+    if len(results) < 2 or any(r.get('ttft') is None for r in results):
+        return None
+    tokens = np.array([r['tokens_used'] for r in results], dtype=np.float64)
+    span = float(tokens.max() - tokens.min())
+    if span <= 0:
+        return None
+
+    components = {}
+    for name in LATENCY_COMPONENTS + ("latency",):
+        if any(r.get(name) is None for r in results):
+            components[name] = None
+            continue
+        values = np.array([r[name] for r in results], dtype=np.float64)
+        slope, intercept = np.polyfit(tokens, values, 1)
+        total = float(((values - values.mean()) ** 2).sum())
+        sse = float(((values - (intercept + slope * tokens)) ** 2).sum())
+        components[name] = {
+            "intercept_seconds": float(intercept),
+            "ms_per_1k_tokens": float(slope * 1e6),
+            "growth_seconds": float(slope * span),
+            "r_squared": 1.0 - sse / total if total > 0 else 1.0
+        }
+
+    growth = components["latency"]["growth_seconds"]
+    scaling = max(("ttft", "decode_time"), key=lambda name: components[name]["growth_seconds"])
+    if components[scaling]["growth_seconds"] <= 0:
+        scaling = None
+    return {
+        "token_range": [int(tokens.min()), int(tokens.max())],
+        "components": components,
+        "scales_with_context": scaling,
+        "ttft_share_of_growth": components["ttft"]["growth_seconds"] / growth if growth else None
+    }
+
+
+def build_capacity_report(results: List[Dict], slo_seconds: float) -> Dict:
+    """
+    Capacity report from experiment 2 measurements
+
+    The model with the highest adjusted R^2 is used to extrapolate
+    per-worker throughput (1 / predicted latency) beyond the tested sizes
+    and the largest context that meets the latency SLO.
+
+    Args:
+        results: Experiment 2 result dictionaries (tokens_used, latency)
+        slo_seconds: Latency objective (seconds)
+
+    Returns:
+        Report dictionary
+    """
+    tokens = np.array([r['tokens_used'] for r in results], dtype=np.float64)
+    latencies = np.array([r['latency'] for r in results], dtype=np.float64)
+    fits = fit_latency_models(tokens, latencies)
+
+    report = {
+        "latency_slo_seconds": slo_seconds,
+        "measurements": [
+            {"tokens": int(t), "latency": float(l), "throughput_qps": float(1.0 / l) if l > 0 else None}
+            for t, l in zip(tokens, latencies)
+        ],
+        "models": fits,
+        "best_model": None,
+        "max_tokens_for_slo": None,
+        "throughput_at_slo_qps": None,
+        "projections": [],
+        "latency_breakdown": build_latency_breakdown(results)
+    }
+    if not fits:
+        logger.warning(f"Not enough measurements to fit latency models ({len(results)})")
+        return report
+
+    best = max(fits.values(), key=lambda fit: fit['adjusted_r_squared'])
+    report["best_model"] = best['model']
+    for fit in fits.values():
+        fit["max_tokens_for_slo"] = max_tokens_for_slo(fit, slo_seconds)
+
+    limit = best["max_tokens_for_slo"]
+    report["max_tokens_for_slo"] = limit
+    if limit:
+        report["throughput_at_slo_qps"] = float(1.0 / predict_latency(best, [limit])[0])
+
+    sizes = [tokens.max() * factor for factor in EXTRAPOLATION_FACTORS]
+    for size, latency in zip(sizes, predict_latency(best, sizes)):
+        report["projections"].append({
+            "tokens": int(size),
+            "predicted_latency": float(latency),
+            "throughput_qps": float(1.0 / latency) if latency > 0 else None,
+            "meets_slo": bool(latency <= slo_seconds)
+        })
+
+    return report
+
+
+def save_capacity_report(
+    results: List[Dict],
+    output_dir: str = "src/data/results/experiment2",
+    slo_seconds: float = 2.0
+) -> Dict:
+    """
+    Write capacity_report.json next to metrics.json
+
+    Args:
+        results: Experiment 2 result dictionaries
+        output_dir: Directory to save the report
+        slo_seconds: Latency objective (seconds)
+
+    Returns:
+        Report dictionary
+    """
+    report = build_capacity_report(results, slo_seconds)
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    output_file = output_path / "capacity_report.json"
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if report["best_model"]:
+        best = report["models"][report["best_model"]]
+        limit = report["max_tokens_for_slo"]
+        logger.info(
+            f"Latency model: {best['model']} ({best['formula']}), "
+            f"R^2={best['r_squared']:.4f}; "
+            f"max context for {slo_seconds}s SLO: "
+            f"{'unbounded' if limit is None else f'{limit:,.0f} tokens'}"
+        )
+    breakdown = report["latency_breakdown"]
+    if breakdown:
+        components = breakdown["components"]
+        inter_token = components['inter_token_latency']
+        inter_token_growth = (
+            "n/a" if inter_token is None else f"{inter_token['ms_per_1k_tokens']:.3f}ms"
+        )
+        scaling = breakdown['scales_with_context']
+        logger.info(
+            f"Latency growth per 1K context tokens: "
+            f"TTFT {components['ttft']['ms_per_1k_tokens']:.1f}ms, "
+            f"decode {components['decode_time']['ms_per_1k_tokens']:.1f}ms, "
+            f"inter-token {inter_token_growth}; "
+            f"{scaling or 'no component'} scales with context"
+        )
+    logger.info(f"Capacity report saved to {output_file}")
+    return report
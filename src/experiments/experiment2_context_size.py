@@ -4,15 +4,24 @@ Measures performance degradation as context grows
 Author: Context Windows Lab
 """
 
+import asyncio
 import logging
 import json
+import math
 from pathlib import Path
-from typing import List, Dict
-import time
+from typing import List, Dict, Optional, Iterator
 
 from utils.text_generator import TextGenerator
 from utils.metrics import MetricsEvaluator
-from utils.mock_llm import query_llm_mock
+from utils.rng import RNGContext, root_context, CORPUS_STREAM
+from utils.corpus_cache import get_documents
+from utils.context_buffer import ContextBuffer
+from utils.timing import TimingRegistry
+from utils.running_stats import RunningStats
+from utils.memory_profile import MemoryTracker
+from utils.clock import Clock, default_clock
+from utils.llm_backends import LLMBackend, TokenStream, create_backend
+from utils.visualization import Visualizer
 from experiments.experiment2_results_manager import visualize_results, save_results
 
 
@@ -30,10 +39,21 @@ class ContextSizeExperiment:
     Tests accuracy and latency across different context sizes
     """
 
+    EXPECTED_ANSWER = "The CEO of the company is David Cohen"
+    QUERY = "Who is the CEO of the company?"
+
     def __init__(
         self,
         doc_counts: List[int] = None,
-        words_per_doc: int = 200
+        words_per_doc: int = 200,
+        rng: Optional[RNGContext] = None,
+        nested: bool = True,
+        repetitions: int = 1,
+        latency_slo: float = 2.0,
+        memory: Optional[MemoryTracker] = None,
+        clock: Optional[Clock] = None,
+        backend: Optional[LLMBackend] = None,
+        use_cache: Optional[bool] = None
     ):
         """
         Initialize experiment
@@ -41,19 +61,81 @@ class ContextSizeExperiment:
         Args:
             doc_counts: List of document counts to test
             words_per_doc: Words per document
+            rng: Random context (default: process root context)
+            nested: Generate the largest haystack once and test each size
+                on a prefix view of it (paired design); otherwise every
+                size gets an independently drawn corpus
+            repetitions: Queries per size; results report the mean with
+                bootstrap confidence intervals
+            latency_slo: Latency objective (seconds) for the capacity report
+            memory: Tracker for per-phase, per-size memory (default: off)
+            clock: Clock LLM latency is measured on (default: a
+                VirtualClock for the mock LLM, the wall clock otherwise)
+            backend: LLM backend (default: create_backend())
+            use_cache: Serve repeated calls of the default backend from
+                the response cache (default: ENABLE_CACHE)
         """
+        if repetitions < 1:
+            raise ValueError(f"repetitions must be positive, got {repetitions}")
         self.doc_counts = doc_counts or [2, 5, 10, 20, 50]
         self.words_per_doc = words_per_doc
+        self.rng = rng or root_context()
+        self.nested = nested
+        self.repetitions = repetitions
+        self.latency_slo = latency_slo
+        self.memory = memory or MemoryTracker(enabled=False)
+        self.clock = clock if clock is not None else default_clock()
+        self.backend = backend or create_backend(cache=use_cache)
         self.results = []
+        self.timings = TimingRegistry()
 
         logger.info(
             f"Initialized Context Size experiment: "
             f"Testing sizes {self.doc_counts}"
+            f"{' (nested)' if nested else ''}"
         )
 
+    def build_contexts(self, expected_answer: str) -> Iterator[ContextBuffer]:
+        """
+        Yield the context for each size in doc_counts
 
+        In nested mode one haystack of max(doc_counts) documents is built
+        and every size is served as a prefix view sharing its span offsets
+        and token counts.
 
+        Args:
+            expected_answer: Fact embedded in every document
 
+        Yields:
+            ContextBuffer per entry of doc_counts, in order
+        """
+        if self.nested:
+            largest = max(self.doc_counts)
+            with self.memory.phase("generation", largest):
+                documents = get_documents(
+                    num_docs=largest,
+                    words_per_doc=self.words_per_doc,
+                    fact=expected_answer,
+                    rng=self.rng.derive(CORPUS_STREAM)
+                )
+            with self.memory.phase("context_build", largest):
+                haystack = TextGenerator.build_context(documents)
+            for num_docs in self.doc_counts:
+                yield haystack.prefix(num_docs)
+            return
+
+        for size_idx, num_docs in enumerate(self.doc_counts):
+            # Independent sample per size
+            with self.memory.phase("generation", num_docs):
+                documents = get_documents(
+                    num_docs=num_docs,
+                    words_per_doc=self.words_per_doc,
+                    fact=expected_answer,
+                    rng=self.rng.derive(CORPUS_STREAM, size_idx)
+                )
+            with self.memory.phase("context_build", num_docs):
+                context = TextGenerator.build_context(documents)
+            yield context
 
     def run_experiment(self) -> List[Dict]:
         """
@@ -64,56 +146,183 @@ class ContextSizeExperiment:
         """
         logger.info("Running Context Size Impact experiment")
 
-        expected_answer = "The CEO of the company is David Cohen"
+        contexts = self.build_contexts(self.EXPECTED_ANSWER)
+        for size_idx, num_docs in enumerate(self.doc_counts):
+            context, tokens_used = self._next_context(contexts, num_docs)
 
-        for num_docs in self.doc_counts:
-            logger.info(f"\nTesting with {num_docs} documents...")
+            trials = []
+            for rep in range(self.repetitions):
+                # Query LLM, streaming to separate prefill from decode
+                with self.memory.phase("llm_call", num_docs):
+                    stream = self.backend.query_stream_sync(
+                        context, self.QUERY, mode='context_size',
+                        rng=self._trial_rng(size_idx, rep), clock=self.clock,
+                        timings=self.timings
+                    )
+                trials.append(stream)
 
-            # Generate documents
-            documents = TextGenerator.create_documents(
-                num_docs=num_docs,
-                words_per_doc=self.words_per_doc,
-                fact=expected_answer
-            )
+            self._record_size(size_idx, num_docs, context, tokens_used, trials)
 
-            # Concatenate into single context
-            context = TextGenerator.concatenate_documents(documents)
-            tokens_used = MetricsEvaluator.count_tokens(context)
+        logger.info("\nExperiment completed successfully")
+        return self.results
 
-            # Query LLM
-            query = "Who is the CEO of the company?"
-            start_time = time.time()
-            response, simulated_latency = query_llm_mock(context, query, mode='context_size')
-            actual_latency = time.time() - start_time
+    async def run_experiment_async(self, backend: Optional[LLMBackend] = None) -> List[Dict]:
+        """
+        Execute the experiment with every (size, repetition) query in flight
+        at once, up to the backend's concurrency limit
 
-            # Evaluate accuracy
-            accuracy = MetricsEvaluator.evaluate_accuracy(
-                response=response,
-                expected=expected_answer,
-                threshold=0.6
-            )
-
-            # Store results
-            result = {
-                'num_docs': num_docs,
-                'tokens_used': tokens_used,
-                'latency': actual_latency,
-                'accuracy': accuracy,
-                'context_length': len(context)
-            }
-            self.results.append(result)
-
-            logger.info(
-                f"  Documents: {num_docs}, "
-                f"Tokens: {tokens_used}, "
-                f"Latency: {actual_latency:.3f}s, "
-                f"Accuracy: {accuracy:.2f}"
-            )
+        Each query is timed on its own fork of the experiment clock, so
+        latencies (and, on the mock, all results) match run_experiment.
+        Memory is tracked for the whole batch of calls rather than per size.
+
+        Args:
+            backend: LLM backend (default: the experiment's)
+
+        Returns:
+            List of result dictionaries
+        """
+        logger.info("Running Context Size Impact experiment (async)")
+        backend = backend or self.backend
+
+        contexts = self.build_contexts(self.EXPECTED_ANSWER)
+        sized = [
+            self._next_context(contexts, num_docs) for num_docs in self.doc_counts
+        ]
+
+        with self.memory.phase("llm_call"):
+            streams = await asyncio.gather(*(
+                backend.query_stream(
+                    context, self.QUERY, mode='context_size',
+                    rng=self._trial_rng(size_idx, rep), clock=self.clock,
+                    timings=self.timings
+                )
+                for size_idx, (context, _) in enumerate(sized)
+                for rep in range(self.repetitions)
+            ))
+
+        for size_idx, (num_docs, (context, tokens_used)) in enumerate(zip(self.doc_counts, sized)):
+            trials = streams[size_idx * self.repetitions:(size_idx + 1) * self.repetitions]
+            self._record_size(size_idx, num_docs, context, tokens_used, trials)
 
         logger.info("\nExperiment completed successfully")
         return self.results
 
+    def _next_context(self, contexts: Iterator[ContextBuffer], num_docs: int):
+        """Next context from build_contexts and its token count"""
+        logger.info(f"\nTesting with {num_docs} documents...")
+        with self.timings.timer("generation"):
+            context = next(contexts)
+            with self.memory.phase("context_build", num_docs):
+                # Span-based context: no concatenation or rescanning
+                tokens_used = context.total_tokens
+        return context, tokens_used
+
+    def _trial_rng(self, size_idx: int, rep: int):
+        """Random generator of one query"""
+        # The first repetition keeps the single-trial stream
+        return self.rng.trial(size_idx, rep) if rep else self.rng.trial(size_idx)
+
+    def _record_size(
+        self,
+        size_idx: int,
+        num_docs: int,
+        context: ContextBuffer,
+        tokens_used: int,
+        trials: List[TokenStream]
+    ) -> Dict:
+        """
+        Score one size's responses and append its result
 
+        Args:
+            size_idx: Index of the size in doc_counts
+            num_docs: Document count of the size
+            context: Context the queries ran on
+            tokens_used: Context token count
+            trials: Finished response stream per repetition
+
+        Returns:
+            Result dictionary
+        """
+        accuracy_stats = RunningStats()
+        latency_stats = RunningStats()
+        ttft_stats = RunningStats()
+        inter_token_stats = RunningStats()
+        for stream in trials:
+            latency_stats.update(stream.latency)
+            # NaN when not measurable (e.g. one-token streams of backends
+            # that cannot stream): left out rather than averaged
+            if not math.isnan(stream.ttft):
+                ttft_stats.update(stream.ttft)
+            if not math.isnan(stream.inter_token_latency):
+                inter_token_stats.update(stream.inter_token_latency)
+
+            # Evaluate accuracy
+            with self.timings.timer("evaluation"):
+                accuracy_stats.update(MetricsEvaluator.evaluate_accuracy(
+                    response=stream.response,
+                    expected=self.EXPECTED_ANSWER,
+                    threshold=0.6
+                ))
+
+        actual_latency = latency_stats.mean
+        accuracy = accuracy_stats.mean
+        ttft = ttft_stats.mean if ttft_stats.count else None
+        inter_token = inter_token_stats.mean if inter_token_stats.count else None
+
+        # Store results
+        result = {
+            'num_docs': num_docs,
+            'tokens_used': tokens_used,
+            'latency': actual_latency,
+            'ttft': ttft,
+            'inter_token_latency': inter_token,
+            # Time spent decoding after the first token
+            'decode_time': None if ttft is None else actual_latency - ttft,
+            'accuracy': accuracy,
+            'context_length': len(context)
+        }
+        if self.repetitions > 1:
+            bootstrap_rng = self.rng.bootstrap(size_idx)
+            result['repetitions'] = self.repetitions
+            result['accuracy_ci'] = list(accuracy_stats.confidence_interval(rng=bootstrap_rng))
+            result['latency_ci'] = list(latency_stats.confidence_interval(rng=bootstrap_rng))
+            result['latency_std'] = latency_stats.std
+            if ttft_stats.count:
+                result['ttft_ci'] = list(ttft_stats.confidence_interval(rng=bootstrap_rng))
+        self.results.append(result)
+
+        streaming = (
+            f"TTFT {'n/a' if ttft is None else f'{ttft:.3f}s'}, "
+            f"{'n/a' if inter_token is None else f'{inter_token * 1000:.1f}ms'}/token"
+        )
+        logger.info(
+            f"  Documents: {num_docs}, "
+            f"Tokens: {tokens_used}, "
+            f"Latency: {actual_latency:.3f}s ({streaming}), "
+            f"Accuracy: {accuracy:.2f}"
+        )
+        return result
+
+    def visualize_results(self, output_dir: str = "src/data/results/experiment2"):
+        """Create visualizations"""
+        with self.memory.phase("plotting"), self.timings.timer("plotting"):
+            visualize_results(self.results, output_dir)
+            if self.memory.records:
+                Visualizer.plot_memory_scaling(
+                    self.memory.scaling_curve(),
+                    output_path=f"{output_dir}/memory_scaling.png"
+                )
+
+    def save_results(self, output_dir: str = "src/data/results/experiment2"):
+        """Save results to JSON"""
+        save_results(
+            self.results, output_dir,
+            timings=self.timings.snapshot(),
+            latency_slo=self.latency_slo,
+            cache=self.backend.cache_stats()
+        )
+        if self.memory.records:
+            self.memory.save(output_dir)
 
 
 def main():
@@ -132,10 +341,10 @@ def main():
     experiment.run_experiment()
 
     # Visualize
-    visualize_results(experiment.results)
+    experiment.visualize_results()
 
     # Save
-    save_results(experiment.results)
+    experiment.save_results()
 
     logger.info("\nExperiment 2 completed successfully!")
 
@@ -1,13 +1,20 @@
 import logging
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from utils.visualization import Visualizer
 from utils.metrics import MetricsEvaluator
+from experiments.experiment2_capacity import save_capacity_report
 
 logger = logging.getLogger(__name__)
 
 
+def _average(values) -> Optional[float]:
+    """Mean of the measured values (None entries skipped), None if none"""
+    measured = [value for value in values if value is not None]
+    return sum(measured) / len(measured) if measured else None
+
+
 def visualize_results(results: List[Dict], output_dir: str = "src/data/results/experiment2"):
     """
     Create visualizations of results
@@ -27,14 +34,31 @@ def visualize_results(results: List[Dict], output_dir: str = "src/data/results/e
         output_path=str(output_path / "context_size_impact.png")
     )
 
+    # Prefill vs decode share of latency (streamed results only)
+    if results and any(r.get('ttft') is not None for r in results):
+        Visualizer.plot_latency_breakdown(
+            results=results,
+            output_path=str(output_path / "latency_breakdown.png")
+        )
 
-def save_results(results: List[Dict], output_dir: str = "src/data/results/experiment2"):
+
+def save_results(
+    results: List[Dict],
+    output_dir: str = "src/data/results/experiment2",
+    timings: Optional[Dict] = None,
+    latency_slo: Optional[float] = None,
+    cache: Optional[Dict] = None
+):
     """
     Save results to JSON
 
     Args:
         results: List of result dictionaries
         output_dir: Directory to save results
+        timings: Per-phase latency statistics to include in the summary
+        latency_slo: Latency objective (seconds); when set, a capacity
+            report is written next to metrics.json
+        cache: Response cache statistics to include in the summary
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -46,6 +70,9 @@ def save_results(results: List[Dict], output_dir: str = "src/data/results/experi
 
     logger.info(f"Results saved to {output_file}")
 
+    if latency_slo is not None:
+        save_capacity_report(results, output_dir, slo_seconds=latency_slo)
+
     # Create summary statistics
     summary = {
         "total_tests": len(results),
@@ -53,6 +80,15 @@ def save_results(results: List[Dict], output_dir: str = "src/data/results/experi
         "average_latency": sum(r['latency'] for r in results) / len(results),
         "max_tokens_tested": max(r['tokens_used'] for r in results)
     }
+    if 'ttft' in results[0]:
+        summary["average_ttft"] = _average(r['ttft'] for r in results)
+        summary["average_inter_token_latency"] = _average(
+            r['inter_token_latency'] for r in results
+        )
+    if timings is not None:
+        summary["timings"] = timings
+    if cache is not None:
+        summary["cache"] = cache
 
     summary_file = output_path / "summary.json"
     with open(summary_file, 'w') as f:
@@ -1,106 +1,236 @@
 import logging
-import time
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
 from utils.metrics import MetricsEvaluator
-from utils.mock_llm import query_llm_mock
 from utils.rag_utils import simple_similarity_search
+from utils.context_buffer import ContextBuffer
+from utils.timing import TimingRegistry, TIMINGS
+from utils.memory_profile import MemoryTracker
+from utils.clock import Clock, default_clock
+from utils.llm_backends import LLMBackend, TokenStream, create_backend
 
 logger = logging.getLogger(__name__)
 
 
-def run_full_context_mode(documents: List[Dict], query: str) -> Dict:
+def run_full_context_mode(
+    documents: List[Dict],
+    query: str,
+    rng: Optional[np.random.Generator] = None,
+    timings: Optional[TimingRegistry] = None,
+    memory: Optional[MemoryTracker] = None,
+    clock: Optional[Clock] = None,
+    backend: Optional[LLMBackend] = None
+) -> Dict:
     """
     Run query with full context (all documents)
 
     Args:
         documents: List of all documents
         query: Search query
+        rng: NumPy generator for this trial
+        timings: Registry for phase timings (default: process-wide)
+        memory: Tracker for per-phase memory (default: off)
+        clock: Clock the LLM call is timed on (default: default_clock())
+        backend: LLM backend (default: create_backend())
 
     Returns:
         Results dictionary
     """
     logger.info("Running FULL CONTEXT mode...")
+    timings = timings if timings is not None else TIMINGS
+    memory = memory or MemoryTracker(enabled=False)
+    clock = clock if clock is not None else default_clock()
+    size = len(documents)
 
-    # Concatenate all documents
-    all_texts = [doc['text'] for doc in documents]
-    full_context = "\n\n".join(all_texts)
+    # Span-based view over all documents
+    with memory.phase("context_build", size):
+        full_context = ContextBuffer.from_documents(documents)
 
     # Query LLM
-    start_time = time.time()
-    response, simulated_latency = query_llm_mock(
-        full_context, query, mode='full_context'
-    )
-    actual_latency = time.time() - start_time
+    backend = backend or create_backend()
+    with memory.phase("llm_call", size):
+        stream = backend.query_stream_sync(
+            full_context, query, mode='full_context', rng=rng, clock=clock, timings=timings
+        )
+    return _mode_result('full_context', stream, full_context, size, timings)
+
+
+def run_rag_mode(
+    documents: List[Dict],
+    query: str,
+    top_k: int,
+    rng: Optional[np.random.Generator] = None,
+    timings: Optional[TimingRegistry] = None,
+    memory: Optional[MemoryTracker] = None,
+    clock: Optional[Clock] = None,
+    backend: Optional[LLMBackend] = None
+) -> Dict:
+    """
+    Run query with RAG (selective retrieval)
 
-    # Evaluate
-    tokens_used = MetricsEvaluator.count_tokens(full_context)
-    accuracy = MetricsEvaluator.evaluate_accuracy(
-        response=response,
-        expected="כאבי ראש",
-        threshold=0.5
-    )
+    Args:
+        documents: List of all documents
+        query: Search query
+        top_k: Number of documents to retrieve
+        rng: NumPy generator for this trial
+        timings: Registry for phase timings (default: process-wide)
+        memory: Tracker for per-phase memory (default: off); phases are
+            keyed by the corpus size
+        clock: Clock the LLM call is timed on (default: default_clock())
+        backend: LLM backend (default: create_backend())
 
-    result = {
-        'mode': 'full_context',
-        'accuracy': accuracy,
-        'latency': actual_latency,
-        'tokens_used': tokens_used,
-        'num_docs': len(documents)
-    }
+    Returns:
+        Results dictionary
+    """
+    logger.info("Running RAG mode...")
+    timings = timings if timings is not None else TIMINGS
+    memory = memory or MemoryTracker(enabled=False)
+    clock = clock if clock is not None else default_clock()
+    size = len(documents)
 
-    logger.info(
-        f"  Accuracy: {accuracy:.2f}, "
-        f"Latency: {actual_latency:.3f}s, "
-        f"Tokens: {tokens_used}"
-    )
+    # Retrieve relevant documents
+    relevant_docs, rag_context = _retrieve(documents, query, top_k, timings, memory)
 
-    return result
+    # Query LLM
+    backend = backend or create_backend()
+    with memory.phase("llm_call", size):
+        stream = backend.query_stream_sync(
+            rag_context, query, mode='rag', rng=rng, clock=clock, timings=timings
+        )
+    return _mode_result('rag', stream, rag_context, len(relevant_docs), timings)
+
+
+async def run_full_context_mode_async(
+    documents: List[Dict],
+    query: str,
+    backend: Optional[LLMBackend] = None,
+    rng: Optional[np.random.Generator] = None,
+    timings: Optional[TimingRegistry] = None,
+    memory: Optional[MemoryTracker] = None,
+    clock: Optional[Clock] = None
+) -> Dict:
+    """
+    run_full_context_mode through an async backend
+
+    The LLM call is timed by the backend on its own fork of clock, so it
+    can overlap other calls (e.g. run_rag_mode_async). Only the context
+    build is tracked by memory; the call itself is left to the caller.
 
+    Args:
+        documents: List of all documents
+        query: Search query
+        backend: LLM backend (default: create_backend())
+        rng: NumPy generator for this trial
+        timings: Registry for phase timings (default: process-wide)
+        memory: Tracker for per-phase memory (default: off)
+        clock: Clock the LLM call is timed on (default: default_clock())
 
-def run_rag_mode(documents: List[Dict], query: str, top_k: int) -> Dict:
+    Returns:
+        Results dictionary
     """
-    Run query with RAG (selective retrieval)
+    logger.info("Running FULL CONTEXT mode (async)...")
+    timings = timings if timings is not None else TIMINGS
+    memory = memory or MemoryTracker(enabled=False)
+    backend = backend or create_backend()
+    size = len(documents)
+
+    with memory.phase("context_build", size):
+        full_context = ContextBuffer.from_documents(documents)
+
+    stream = await backend.query_stream(
+        full_context, query, mode='full_context', rng=rng,
+        clock=clock if clock is not None else default_clock(), timings=timings
+    )
+    return _mode_result('full_context', stream, full_context, size, timings)
+
+
+async def run_rag_mode_async(
+    documents: List[Dict],
+    query: str,
+    top_k: int,
+    backend: Optional[LLMBackend] = None,
+    rng: Optional[np.random.Generator] = None,
+    timings: Optional[TimingRegistry] = None,
+    memory: Optional[MemoryTracker] = None,
+    clock: Optional[Clock] = None
+) -> Dict:
+    """
+    run_rag_mode through an async backend
 
     Args:
         documents: List of all documents
         query: Search query
         top_k: Number of documents to retrieve
+        backend: LLM backend (default: create_backend())
+        rng: NumPy generator for this trial
+        timings: Registry for phase timings (default: process-wide)
+        memory: Tracker for per-phase memory (default: off); only
+            retrieval is tracked, as in run_full_context_mode_async
+        clock: Clock the LLM call is timed on (default: default_clock())
 
     Returns:
         Results dictionary
     """
-    logger.info("Running RAG mode...")
+    logger.info("Running RAG mode (async)...")
+    timings = timings if timings is not None else TIMINGS
+    memory = memory or MemoryTracker(enabled=False)
+    backend = backend or create_backend()
 
-    # Retrieve relevant documents
-    relevant_docs = simple_similarity_search(documents, query, k=top_k)
-    rag_context = "\n\n".join([doc['text'] for doc in relevant_docs])
+    relevant_docs, rag_context = _retrieve(documents, query, top_k, timings, memory)
 
-    # Query LLM
-    start_time = time.time()
-    response, simulated_latency = query_llm_mock(
-        rag_context, query, mode='rag'
+    stream = await backend.query_stream(
+        rag_context, query, mode='rag', rng=rng,
+        clock=clock if clock is not None else default_clock(), timings=timings
     )
-    actual_latency = time.time() - start_time
-
+    return _mode_result('rag', stream, rag_context, len(relevant_docs), timings)
+
+
+def _retrieve(
+    documents: List[Dict],
+    query: str,
+    top_k: int,
+    timings: TimingRegistry,
+    memory: MemoryTracker
+) -> Tuple[List[Dict], ContextBuffer]:
+    """Top-k documents for the query and their context"""
+    with memory.phase("retrieval", len(documents)), timings.timer("retrieval"):
+        relevant_docs = simple_similarity_search(documents, query, k=top_k)
+        rag_context = ContextBuffer.from_documents(relevant_docs)
+    return relevant_docs, rag_context
+
+
+def _mode_result(
+    mode: str,
+    stream: TokenStream,
+    context: ContextBuffer,
+    num_docs: int,
+    timings: TimingRegistry
+) -> Dict:
+    """Score a mode's response and build its results dictionary"""
     # Evaluate
-    tokens_used = MetricsEvaluator.count_tokens(rag_context)
-    accuracy = MetricsEvaluator.evaluate_accuracy(
-        response=response,
-        expected="כאבי ראש",
-        threshold=0.5
-    )
+    with timings.timer("evaluation"):
+        tokens_used = context.total_tokens
+        accuracy = MetricsEvaluator.evaluate_accuracy(
+            response=stream.response,
+            expected="כאבי ראש",
+            threshold=0.5
+        )
 
     result = {
-        'mode': 'rag',
+        'mode': mode,
         'accuracy': accuracy,
-        'latency': actual_latency,
+        'latency': stream.latency,
+        'ttft': stream.ttft,
+        'inter_token_latency': stream.inter_token_latency,
         'tokens_used': tokens_used,
-        'num_docs': len(relevant_docs)
+        'num_docs': num_docs
     }
 
     logger.info(
         f"  Accuracy: {accuracy:.2f}, "
-        f"Latency: {actual_latency:.3f}s, "
+        f"Latency: {stream.latency:.3f}s (TTFT {stream.ttft:.3f}s), "
         f"Tokens: {tokens_used}"
     )
 
@@ -4,17 +4,30 @@ Compares RAG retrieval vs Full Context approach
 Author: Context Windows Lab
 """
 
-
-
-
+import asyncio
+import logging
+import json
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
 
 from utils.metrics import MetricsEvaluator
 from utils.visualization import Visualizer
-from utils.mock_llm import query_llm_mock
-from utils.rag_utils import generate_documents
-from experiments.experiment3_modes import run_full_context_mode, run_rag_mode
+from utils.rag_utils import generate_documents, rank_documents_batch
+from utils.corpus_store import CorpusReader
+from utils.rng import RNGContext, root_context
+from utils.hebrew_corpus import HebrewCorpusGenerator
+from utils.timing import TimingRegistry
+from utils.memory_profile import MemoryTracker
+from utils.clock import Clock, default_clock
+from utils.llm_backends import LLMBackend, create_backend
+from experiments.experiment3_modes import (
+    run_full_context_mode,
+    run_rag_mode,
+    run_full_context_mode_async,
+    run_rag_mode_async
+)
 
 # Configure logging
 logging.basicConfig(
@@ -30,10 +43,19 @@ class RAGImpactExperiment:
     Demonstrates benefits of targeted retrieval
     """
 
+    QUERY = "מה תופעות הלוואי של התרופה"
+
     def __init__(
         self,
         num_documents: int = 20,
-        top_k: int = 3
+        top_k: int = 3,
+        corpus_path: str = None,
+        rng: Optional[RNGContext] = None,
+        corpus_generator: Optional[HebrewCorpusGenerator] = None,
+        memory: Optional[MemoryTracker] = None,
+        clock: Optional[Clock] = None,
+        backend: Optional[LLMBackend] = None,
+        use_cache: Optional[bool] = None
     ):
         """
         Initialize experiment
@@ -41,11 +63,30 @@ class RAGImpactExperiment:
         Args:
             num_documents: Total number of documents
             top_k: Number of documents to retrieve in RAG mode
+            corpus_path: Pre-built Hebrew corpus file to read instead of generating
+            rng: Random context (default: process root context)
+            corpus_generator: Templated Hebrew corpus engine (default: the
+                fixed per-topic sentences)
+            memory: Tracker for per-phase memory keyed by num_documents
+                (default: off); share one across instances of different
+                sizes to build a scaling curve
+            clock: Clock LLM latency is measured on (default: a
+                VirtualClock for the mock LLM, the wall clock otherwise)
+            backend: LLM backend (default: create_backend())
+            use_cache: Serve repeated calls of the default backend from
+                the response cache (default: ENABLE_CACHE)
         """
         self.num_documents = num_documents
         self.top_k = top_k
+        self.corpus_path = corpus_path
+        self.rng = rng or root_context()
+        self.corpus_generator = corpus_generator
         self.documents = []
         self.results = {}
+        self.timings = TimingRegistry()
+        self.memory = memory or MemoryTracker(enabled=False)
+        self.clock = clock if clock is not None else default_clock()
+        self.backend = backend or create_backend(cache=use_cache)
 
         logger.info(
             f"Initialized RAG Impact experiment: "
@@ -66,40 +107,123 @@ class RAGImpactExperiment:
             Results dictionary
         """
         logger.info("Running RAG Impact experiment")
+        self._ensure_documents()
+
+        # Run both modes
+        full_result = run_full_context_mode(
+            self.documents, self.QUERY, rng=self.rng.trial(0), timings=self.timings,
+            memory=self.memory, clock=self.clock, backend=self.backend
+        )
+        rag_result = run_rag_mode(
+            self.documents, self.QUERY, self.top_k, rng=self.rng.trial(1),
+            timings=self.timings, memory=self.memory, clock=self.clock, backend=self.backend
+        )
+        return self._compile_results(full_result, rag_result)
 
-        if not self.documents:
-            self.documents = generate_documents(self.num_documents, ["technology", "law", "medicine"])
+    async def run_experiment_async(self, backend: Optional[LLMBackend] = None) -> Dict:
+        """
+        Execute the experiment with both modes' LLM calls overlapping
 
-        query = "מה תופעות הלוואי של התרופה"
+        Each call is timed on its own fork of the experiment clock, so the
+        reported latencies are those of run_experiment.
 
-        # Run both modes
-        full_result = run_full_context_mode(self.documents, query)
-        rag_result = run_rag_mode(self.documents, query, self.top_k)
+        Args:
+            backend: LLM backend (default: the experiment's)
 
-        # Compile results
+        Returns:
+            Results dictionary
+        """
+        logger.info("Running RAG Impact experiment (async)")
+        self._ensure_documents()
+        backend = backend or self.backend
+
+        with self.memory.phase("llm_call", len(self.documents)):
+            full_result, rag_result = await asyncio.gather(
+                run_full_context_mode_async(
+                    self.documents, self.QUERY, backend, rng=self.rng.trial(0),
+                    timings=self.timings, memory=self.memory, clock=self.clock
+                ),
+                run_rag_mode_async(
+                    self.documents, self.QUERY, self.top_k, backend, rng=self.rng.trial(1),
+                    timings=self.timings, memory=self.memory, clock=self.clock
+                )
+            )
+        return self._compile_results(full_result, rag_result)
+
+    def _ensure_documents(self) -> None:
+        """Generate or load the corpus on first use"""
+        if self.documents:
+            return
+        with self.memory.phase("generation", self.num_documents), \
+                self.timings.timer("generation"):
+            if self.corpus_path:
+                with CorpusReader(self.corpus_path) as corpus:
+                    self.documents = list(corpus)
+            else:
+                self.documents = generate_documents(
+                    self.num_documents, ["technology", "law", "medicine"],
+                    rng=self.rng.corpus(),
+                    generator=self.corpus_generator
+                )
+
+    def _compile_results(self, full_result: Dict, rag_result: Dict) -> Dict:
+        """Comparison of the two modes plus retrieval metrics"""
         self.results = {
             'full_accuracy': full_result['accuracy'],
             'full_latency': full_result['latency'],
+            'full_ttft': full_result['ttft'],
             'full_tokens': full_result['tokens_used'],
             'rag_accuracy': rag_result['accuracy'],
             'rag_latency': rag_result['latency'],
+            'rag_ttft': rag_result['ttft'],
             'rag_tokens': rag_result['tokens_used'],
             'improvement': {
                 'accuracy': rag_result['accuracy'] - full_result['accuracy'],
                 'latency_reduction': (1 - rag_result['latency'] / full_result['latency']) * 100,
+                'ttft_reduction': (1 - rag_result['ttft'] / full_result['ttft']) * 100,
                 'token_reduction': (1 - rag_result['tokens_used'] / full_result['tokens_used']) * 100
             }
         }
 
+        self.results['retrieval'] = self.evaluate_retrieval([self.QUERY])
+
         logger.info("\n" + "="*50)
         logger.info("COMPARISON RESULTS:")
         logger.info(f"  Accuracy improvement: {self.results['improvement']['accuracy']:.2%}")
         logger.info(f"  Latency reduction: {self.results['improvement']['latency_reduction']:.1f}%")
+        logger.info(f"  TTFT reduction: {self.results['improvement']['ttft_reduction']:.1f}%")
         logger.info(f"  Token reduction: {self.results['improvement']['token_reduction']:.1f}%")
+        logger.info(
+            f"  Retrieval MRR: {self.results['retrieval']['mrr']:.3f}, "
+            f"Recall@{self.top_k}: {self.results['retrieval'][f'recall@{self.top_k}']:.3f}"
+        )
         logger.info("="*50)
 
         return self.results
 
+    def evaluate_retrieval(self, queries: List[str]) -> Dict:
+        """
+        Ranking metrics of the keyword retriever over the whole corpus
+
+        Documents flagged 'contains_answer' are the relevant set for every
+        query.
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            Dictionary of recall@k, precision@k, ndcg@k, mrr and map
+        """
+        with self.timings.timer("retrieval"):
+            ranked = rank_documents_batch(self.documents, queries)
+        relevance = np.array(
+            [bool(doc.get('contains_answer', False)) for doc in self.documents]
+        )
+        with self.timings.timer("evaluation"):
+            return MetricsEvaluator.evaluate_retrieval_batch(
+                ranked, relevance, ks=sorted({1, self.top_k, 10})
+            )
+
     def visualize_results(self, output_dir: str = "src/data/results/experiment3"):
         """Create visualizations"""
         logger.info("Creating visualizations")
@@ -107,22 +231,36 @@ class RAGImpactExperiment:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        Visualizer.plot_rag_comparison(
-            results=self.results,
-            output_path=str(output_path / "rag_vs_full.png")
-        )
+        with self.memory.phase("plotting"), self.timings.timer("plotting"):
+            Visualizer.plot_rag_comparison(
+                results=self.results,
+                output_path=str(output_path / "rag_vs_full.png")
+            )
+            if self.memory.records:
+                Visualizer.plot_memory_scaling(
+                    self.memory.scaling_curve(),
+                    output_path=str(output_path / "memory_scaling.png")
+                )
 
     def save_results(self, output_dir: str = "src/data/results/experiment3"):
         """Save results to JSON"""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
+        comparison = {**self.results, 'timings': self.timings.snapshot()}
+        cache = self.backend.cache_stats()
+        if cache is not None:
+            comparison['cache'] = cache
+
         output_file = output_path / "comparison.json"
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+            json.dump(comparison, f, indent=2, ensure_ascii=False)
 
         logger.info(f"Results saved to {output_file}")
 
+        if self.memory.records:
+            self.memory.save(output_dir)
+
 
 def main():
     """Main execution function"""
@@ -4,16 +4,19 @@ Evaluates SELECT, COMPRESS, and WRITE strategies
 Author: Context Windows Lab
 """
 
+import asyncio
 import logging
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
 
 
 from utils.text_generator import TextGenerator
-from utils.metrics import MetricsEvaluator
 from utils.visualization import Visualizer
-from utils.mock_llm import query_llm_mock
+from utils.rng import RNGContext, root_context
+from utils.token_accounting import TokenLedger
+from utils.timing import TimingRegistry
+from utils.llm_backends import LLMBackend, create_backend
 from experiments.experiment4_strategies import (
     select_strategy,
     compress_strategy,
@@ -34,19 +37,36 @@ class ContextEngineeringExperiment:
     Tests SELECT, COMPRESS, and WRITE approaches
     """
 
-    def __init__(self, num_actions: int = 10, max_tokens: int = 2000):
+    # Stable trial index per strategy for random stream derivation
+    STRATEGIES = ['select', 'compress', 'write']
+
+    def __init__(
+        self,
+        num_actions: int = 10,
+        max_tokens: int = 2000,
+        rng: Optional[RNGContext] = None,
+        backend: Optional[LLMBackend] = None,
+        use_cache: Optional[bool] = None
+    ):
         """
         Initialize experiment
 
         Args:
             num_actions: Number of sequential actions to simulate
             max_tokens: Maximum tokens before compression needed
+            rng: Random context (default: process root context)
+            backend: LLM backend (default: create_backend())
+            use_cache: Serve repeated calls of the default backend from
+                the response cache (default: ENABLE_CACHE)
         """
         self.num_actions = num_actions
         self.max_tokens = max_tokens
+        self.rng = rng or root_context()
+        self.backend = backend or create_backend(cache=use_cache)
         self.history = []
         self.scratchpad = {}
         self.results = {'select': [], 'compress': [], 'write': []}
+        self.timings = TimingRegistry()
 
         logger.info(
             f"Initialized Context Engineering experiment: "
@@ -70,44 +90,113 @@ class ContextEngineeringExperiment:
         """
         logger.info(f"\nRunning {strategy_name.upper()} strategy simulation...")
 
-        strategy_history = []
         strategy_results = []
+        for step in self._strategy_steps(strategy_name):
+            # Query LLM
+            response, accuracy, _ = self.backend.query_sync(
+                step['context'], step['query'], rng=step['rng'], timings=self.timings
+            )
+            strategy_results.append(self._action_result(step, accuracy))
+
+        return self._finish_strategy(strategy_name, strategy_results)
+
+    async def run_strategy_simulation_async(
+        self,
+        strategy_name: str,
+        backend: Optional[LLMBackend] = None
+    ) -> List[Dict]:
+        """
+        Run simulation for a strategy with all actions queried concurrently
+
+        Contexts are still built action by action (each strategy reads the
+        growing history); the LLM does not feed back into the history, so
+        the queries can overlap. Results match run_strategy_simulation.
+
+        Args:
+            strategy_name: 'select', 'compress', or 'write'
+            backend: LLM backend (default: the experiment's)
+
+        Returns:
+            List of action results
+        """
+        logger.info(f"\nRunning {strategy_name.upper()} strategy simulation (async)...")
+        backend = backend or self.backend
+
+        steps = list(self._strategy_steps(strategy_name))
+        answers = await asyncio.gather(*(
+            backend.query(step['context'], step['query'], rng=step['rng'], timings=self.timings)
+            for step in steps
+        ))
+        strategy_results = [
+            self._action_result(step, accuracy)
+            for step, (_, accuracy, _) in zip(steps, answers)
+        ]
+        return self._finish_strategy(strategy_name, strategy_results)
+
+    def _strategy_steps(self, strategy_name: str) -> Iterator[Dict]:
+        """
+        Grow the action history and apply a strategy after each action
+
+        Args:
+            strategy_name: 'select', 'compress', or 'write'
+
+        Yields:
+            Dictionary with action, query, context, history_size and rng
+        """
+        if strategy_name not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy_name}")
+        strategy_idx = self.STRATEGIES.index(strategy_name)
+
+        strategy_history = TokenLedger()
 
         for action_num in range(1, self.num_actions + 1):
-            # Generate action output
-            output = TextGenerator.generate_action_output(action_num)
-            strategy_history.append(output)
+            # Generate action output (same history for every strategy)
+            with self.timings.timer("generation"):
+                output = TextGenerator.generate_action_output(
+                    action_num, rng=self.rng.corpus(action_num)
+                )
+                strategy_history.append(output)
 
             # Apply strategy
             query = f"What happened in action {action_num}?"
 
-            if strategy_name == 'select':
-                context = select_strategy(strategy_history, query, k=5)
-            elif strategy_name == 'compress':
-                context = compress_strategy(strategy_history, query, max_tokens=self.max_tokens)
-            elif strategy_name == 'write':
-                context = write_strategy(strategy_history, query, scratchpad=self.scratchpad)
-            else:
-                raise ValueError(f"Unknown strategy: {strategy_name}")
-
-            # Query LLM
-            response, accuracy = query_llm_mock(context, query)
+            with self.timings.timer("retrieval"):
+                if strategy_name == 'select':
+                    context = select_strategy(strategy_history, query, k=5)
+                elif strategy_name == 'compress':
+                    context = compress_strategy(strategy_history, query, max_tokens=self.max_tokens)
+                else:
+                    context = write_strategy(strategy_history, query, scratchpad=self.scratchpad)
 
-            # Store result
-            result = {
+            # Views stay valid as the ledger keeps growing
+            yield {
                 'action': action_num,
-                'accuracy': accuracy,
-                'context_tokens': MetricsEvaluator.count_tokens(context),
-                'history_size': len(strategy_history)
+                'query': query,
+                'context': context,
+                'history_size': len(strategy_history),
+                'rng': self.rng.trial(strategy_idx, action_num)
             }
-            strategy_results.append(result)
 
-            logger.debug(
-                f"  Action {action_num}: "
-                f"Accuracy={accuracy:.3f}, "
-                f"Tokens={result['context_tokens']}"
-            )
+    @staticmethod
+    def _action_result(step: Dict, accuracy: float) -> Dict:
+        """Result of one action"""
+        result = {
+            'action': step['action'],
+            'accuracy': accuracy,
+            'context_tokens': step['context'].total_tokens,
+            'history_size': step['history_size']
+        }
+
+        logger.debug(
+            f"  Action {step['action']}: "
+            f"Accuracy={accuracy:.3f}, "
+            f"Tokens={result['context_tokens']}"
+        )
+        return result
 
+    @staticmethod
+    def _finish_strategy(strategy_name: str, strategy_results: List[Dict]) -> List[Dict]:
+        """Log a strategy's average accuracy"""
         # Calculate average accuracy
         avg_accuracy = sum(r['accuracy'] for r in strategy_results) / len(strategy_results)
         logger.info(f"{strategy_name.upper()} average accuracy: {avg_accuracy:.3f}")
@@ -124,7 +213,7 @@ class ContextEngineeringExperiment:
         logger.info("Running Context Engineering Strategies experiment")
 
         # Run each strategy
-        for strategy in ['select', 'compress', 'write']:
+        for strategy in self.STRATEGIES:
             # Reset state for each strategy
             self.history = []
             self.scratchpad = {}
@@ -135,6 +224,32 @@ class ContextEngineeringExperiment:
         logger.info("\nExperiment completed successfully")
         return self.results
 
+    async def run_experiment_async(self, backend: Optional[LLMBackend] = None) -> Dict[str, List[Dict]]:
+        """
+        Execute the experiment with each strategy's queries in flight at once
+
+        Strategies still run one after another, since they share the
+        scratchpad.
+
+        Args:
+            backend: LLM backend (default: the experiment's)
+
+        Returns:
+            Results dictionary with all strategies
+        """
+        logger.info("Running Context Engineering Strategies experiment (async)")
+        backend = backend or self.backend
+
+        for strategy in self.STRATEGIES:
+            # Reset state for each strategy
+            self.history = []
+            self.scratchpad = {}
+
+            self.results[strategy] = await self.run_strategy_simulation_async(strategy, backend)
+
+        logger.info("\nExperiment completed successfully")
+        return self.results
+
     def visualize_results(self, output_dir: str = "src/data/results/experiment4"):
         """Create visualizations"""
         logger.info("Creating visualizations")
@@ -142,10 +257,11 @@ class ContextEngineeringExperiment:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        Visualizer.plot_strategy_performance(
-            results=self.results,
-            output_path=str(output_path / "strategy_performance.png")
-        )
+        with self.timings.timer("plotting"):
+            Visualizer.plot_strategy_performance(
+                results=self.results,
+                output_path=str(output_path / "strategy_performance.png")
+            )
 
     def save_results(self, output_dir: str = "src/data/results/experiment4"):
         """Save results to JSON"""
@@ -171,6 +287,11 @@ class ContextEngineeringExperiment:
                 'total_actions': len(results_list)
             }
 
+        summary["timings"] = self.timings.snapshot()
+        cache = self.backend.cache_stats()
+        if cache is not None:
+            summary["cache"] = cache
+
         summary_file = output_path / "summary.json"
         with open(summary_file, 'w') as f:
             json.dump(summary, f, indent=2)
@@ -1,16 +1,24 @@
 import logging
-from typing import List, Dict
-from utils.metrics import MetricsEvaluator
+from typing import List, Dict, Union
+from utils.token_accounting import TokenLedger
+from utils.context_buffer import ContextBuffer
 
 logger = logging.getLogger(__name__)
 
 
-def select_strategy(history: List[str], query: str, k: int = 5) -> str:
+def _as_ledger(history: Union[List[str], TokenLedger]) -> TokenLedger:
+    """Wrap a plain history list in a ledger (counted once)"""
+    if isinstance(history, TokenLedger):
+        return history
+    return TokenLedger(history)
+
+
+def select_strategy(history: Union[List[str], TokenLedger], query: str, k: int = 5) -> ContextBuffer:
     """
     SELECT Strategy: Use similarity search for relevant history
 
     Args:
-        history: Full history list
+        history: Full history (ledger or list)
         query: Current query
         k: Number of relevant items to keep
 
@@ -18,24 +26,24 @@ def select_strategy(history: List[str], query: str, k: int = 5) -> str:
         Selected context
     """
     logger.debug("Applying SELECT strategy")
+    history = _as_ledger(history)
 
     if len(history) <= k:
-        return "\n".join(history)
+        return history.view()
 
     # Simple relevance: return last k items (recency)
-    relevant_history = history[-k:]
-    selected_context = "\n".join(relevant_history)
+    selected_context = history.view(len(history) - k)
 
-    logger.debug(f"Selected {len(relevant_history)} most recent items")
+    logger.debug(f"Selected {k} most recent items")
     return selected_context
 
 
-def compress_strategy(history: List[str], query: str, max_tokens: int) -> str:
+def compress_strategy(history: Union[List[str], TokenLedger], query: str, max_tokens: int) -> ContextBuffer:
     """
     COMPRESS Strategy: Summarize history when too large
 
     Args:
-        history: Full history list
+        history: Full history (ledger or list)
         query: Current query
         max_tokens: Maximum tokens before compression needed
 
@@ -43,51 +51,74 @@ def compress_strategy(history: List[str], query: str, max_tokens: int) -> str:
         Compressed context
     """
     logger.debug("Applying COMPRESS strategy")
+    history = _as_ledger(history)
 
-    full_context = "\n".join(history)
-    token_count = MetricsEvaluator.count_tokens(full_context)
+    # Running total: no join or recount of the history
+    if history.total_tokens <= max_tokens:
+        return history.view()
 
-    if token_count <= max_tokens:
-        return full_context
-
-    # Simulate summarization: keep first and last parts
+    # Simulate summarization: keep first and last parts. The context is
+    # joined from views, so the ledger is neither copied nor recounted
     keep_count = len(history) // 3
-    compressed = history[:keep_count] + ["... [history compressed] ..."] + history[-keep_count:]
-    compressed_context = "\n".join(compressed)
-
-    logger.debug(f"Compressed history from {len(history)} to {len(compressed)} items")
+    tail_start = len(history) - keep_count if keep_count else 0
+    marker = ContextBuffer(["... [history compressed] ..."], history.separator)
+    compressed_context = ContextBuffer.concat(
+        [history.view(0, keep_count), marker, history.view(tail_start)],
+        history.separator
+    )
+
+    logger.debug(
+        f"Compressed history from {len(history)} to {compressed_context.num_spans} items"
+    )
     return compressed_context
 
 
-def write_strategy(history: List[str], query: str, scratchpad: Dict) -> str:
+def write_strategy(history: Union[List[str], TokenLedger], query: str, scratchpad: Dict) -> ContextBuffer:
     """
     WRITE Strategy: Extract key facts to external memory
 
+    Histories are treated as append-only: on repeated calls with the same
+    history object only the items added since the previous call are
+    scanned. A different (or shorter) history is scanned from the start;
+    facts already in the scratchpad are not stored twice.
+
     Args:
-        history: Full history list
+        history: Full history (ledger or list)
         query: Current query
-        scratchpad: External memory to store facts
+        scratchpad: External memory to store facts ("key" holds the
+            list of facts)
 
     Returns:
         Retrieved context from scratchpad
     """
     logger.debug("Applying WRITE strategy")
 
-    # Extract and store key facts
-    for idx, item in enumerate(history):
-        if "key" not in scratchpad:
-            scratchpad["key"] = []
+    facts = scratchpad.setdefault("key", [])
+    seen = scratchpad.get("_seen")
+    if seen is None or len(seen) != len(facts):
+        seen = scratchpad["_seen"] = set(facts)
 
+    # Resume after the items read last time, if this is the same history
+    scanned = 0
+    if scratchpad.get("_history") is history and scratchpad.get("_scanned", 0) <= len(history):
+        scanned = scratchpad["_scanned"]
+
+    # Extract and store key facts
+    for idx in range(scanned, len(history)):
+        item = history[idx]
         # Simple extraction: store items mentioning "Success" or "Found"
         if "Success" in item or "Found" in item:
             fact = f"Fact {idx}: {item[:100]}"
-            if fact not in scratchpad["key"]:
-                scratchpad["key"].append(fact)
+            if fact not in seen:
+                seen.add(fact)
+                facts.append(fact)
+    scratchpad["_history"] = history
+    scratchpad["_scanned"] = len(history)
 
     # Retrieve relevant facts
-    if "key" in scratchpad and scratchpad["key"]:
-        retrieved_context = "\n".join(scratchpad["key"][-5:])  # Last 5 facts
-        logger.debug(f"Retrieved {len(scratchpad['key'][-5:])} facts from scratchpad")
+    if facts:
+        retrieved_context = ContextBuffer(facts[-5:], "\n")  # Last 5 facts
+        logger.debug(f"Retrieved {retrieved_context.num_spans} facts from scratchpad")
         return retrieved_context
 
-    return "No facts stored yet"
+    return ContextBuffer(["No facts stored yet"])
@@ -1,14 +1,46 @@
+import asyncio
 import logging
-from typing import Dict
+from typing import Dict, Optional
 from experiments.experiment1_needle_haystack import NeedleHaystackExperiment
 from experiments.experiment2_context_size import ContextSizeExperiment
 from experiments.experiment3_rag_impact import RAGImpactExperiment
 from experiments.experiment4_engineering import ContextEngineeringExperiment
 from utils.cli_utils import print_header
+from utils.config import Config
+from utils.hebrew_corpus import HebrewCorpusGenerator
+from utils.corpus_cache import CORPUS_CACHE
+from utils.llm_backends import cache_enabled
+from utils.memory_profile import MemoryTracker
+from utils.response_cache import get_response_cache
 
 logger = logging.getLogger(__name__)
 
-def run_experiment_1() -> bool:
+# Corpus sizes experiment 3 is profiled at when memory tracking is on
+# (the configured 20-document run supplies one more point)
+EXPERIMENT3_MEMORY_SIZES = [5, 10, 40, 80]
+
+
+def _run(experiment, use_async: bool):
+    """Run an experiment's serial loop, or its async loop on a new event loop"""
+    if use_async:
+        results = asyncio.run(experiment.run_experiment_async())
+    else:
+        results = experiment.run_experiment()
+
+    cache = experiment.backend.cache_stats()
+    if cache is not None:
+        logger.info(
+            f"Response cache: {cache['hits']} hits, {cache['misses']} misses "
+            f"({cache['hit_ratio']:.0%}), {cache['bytes_saved'] / 1024:.1f} KiB not resent"
+        )
+    return results
+
+
+def run_experiment_1(
+    output_dir: str = "src/data/results",
+    use_async: bool = False,
+    use_cache: Optional[bool] = None
+) -> bool:
     """Run Experiment 1: Needle in Haystack"""
     print_header("EXPERIMENT 1: NEEDLE IN HAYSTACK")
     logger.info("Starting Experiment 1: Needle in Haystack")
@@ -16,11 +48,13 @@ def run_experiment_1() -> bool:
     try:
         experiment = NeedleHaystackExperiment(
             num_docs=15,
-            words_per_doc=200
+            words_per_doc=200,
+            corpus_path=Config.get_experiment1_config()['corpus_path'],
+            use_cache=use_cache
         )
-        experiment.run_experiment()
-        experiment.visualize_results()
-        experiment.save_results()
+        _run(experiment, use_async)
+        experiment.visualize_results(f"{output_dir}/experiment1")
+        experiment.save_results(f"{output_dir}/experiment1")
 
         logger.info("✓ Experiment 1 completed successfully")
         return True
@@ -29,49 +63,102 @@ def run_experiment_1() -> bool:
         return False
 
 
-def run_experiment_2() -> bool:
+def run_experiment_2(
+    output_dir: str = "src/data/results",
+    track_memory: bool = False,
+    use_async: bool = False,
+    use_cache: Optional[bool] = None
+) -> bool:
     """Run Experiment 2: Context Window Size Impact"""
     print_header("EXPERIMENT 2: CONTEXT WINDOW SIZE IMPACT")
     logger.info("Starting Experiment 2: Context Window Size Impact")
 
+    memory = MemoryTracker(enabled=track_memory)
     try:
         experiment = ContextSizeExperiment(
             doc_counts=[2, 5, 10, 20, 50],
-            words_per_doc=200
+            words_per_doc=200,
+            repetitions=Config.get_experiment2_config()['repetitions'],
+            latency_slo=Config.get_experiment2_config()['latency_slo'],
+            memory=memory,
+            use_cache=use_cache
         )
-        experiment.run_experiment()
-        experiment.visualize_results()
-        experiment.save_results()
+        _run(experiment, use_async)
+        experiment.visualize_results(f"{output_dir}/experiment2")
+        experiment.save_results(f"{output_dir}/experiment2")
 
         logger.info("✓ Experiment 2 completed successfully")
         return True
     except Exception as e:
         logger.error(f"✗ Experiment 2 failed: {e}")
         return False
+    finally:
+        # tracemalloc would otherwise slow every later experiment
+        memory.stop()
 
 
-def run_experiment_3() -> bool:
+def run_experiment_3(
+    output_dir: str = "src/data/results",
+    track_memory: bool = False,
+    use_async: bool = False,
+    use_cache: Optional[bool] = None
+) -> bool:
     """Run Experiment 3: RAG Impact"""
     print_header("EXPERIMENT 3: RAG IMPACT")
     logger.info("Starting Experiment 3: RAG Impact")
 
+    memory = MemoryTracker(enabled=track_memory)
     try:
+        config = Config.get_experiment3_config()
+        corpus_generator = None
+        if config['corpus_engine'] == 'templated':
+            corpus_generator = HebrewCorpusGenerator(
+                distribution=config['sentence_distribution'],
+                mean_sentences=config['mean_sentences'],
+                min_sentences=config['min_sentences'],
+                max_sentences=config['max_sentences'],
+                answer_density=config['answer_density']
+            )
+
+        if track_memory:
+            # Extra generated corpora sharing the tracker, so
+            # memory_scaling.json holds a curve rather than one point
+            for num_documents in EXPERIMENT3_MEMORY_SIZES:
+                logger.info(f"Profiling Experiment 3 memory at {num_documents} documents")
+                _run(RAGImpactExperiment(
+                    num_documents=num_documents,
+                    top_k=3,
+                    corpus_generator=corpus_generator,
+                    memory=memory,
+                    use_cache=use_cache
+                ), use_async)
+
         experiment = RAGImpactExperiment(
             num_documents=20,
-            top_k=3
+            top_k=3,
+            corpus_path=config['corpus_path'],
+            corpus_generator=corpus_generator,
+            memory=memory,
+            use_cache=use_cache
         )
-        experiment.run_experiment()
-        experiment.visualize_results()
-        experiment.save_results()
+        _run(experiment, use_async)
+        experiment.visualize_results(f"{output_dir}/experiment3")
+        experiment.save_results(f"{output_dir}/experiment3")
 
         logger.info("✓ Experiment 3 completed successfully")
         return True
     except Exception as e:
         logger.error(f"✗ Experiment 3 failed: {e}")
         return False
+    finally:
+        memory.stop()
 
 
-def run_experiment_4() -> bool:
+def run_experiment_4(
+    output_dir: str = "src/data/results",
+    use_async: bool = False,
+    use_cache: Optional[bool] = None
+) -> bool:
     """Run Experiment 4: Context Engineering Strategies"""
     print_header("EXPERIMENT 4: CONTEXT ENGINEERING STRATEGIES")
     logger.info("Starting Experiment 4: Context Engineering Strategies")
@@ -79,11 +166,12 @@ def run_experiment_4() -> bool:
     try:
         experiment = ContextEngineeringExperiment(
             num_actions=10,
-            max_tokens=2000
+            max_tokens=2000,
+            use_cache=use_cache
         )
-        experiment.run_experiment()
-        experiment.visualize_results()
-        experiment.save_results()
+        _run(experiment, use_async)
+        experiment.visualize_results(f"{output_dir}/experiment4")
+        experiment.save_results(f"{output_dir}/experiment4")
 
         logger.info("✓ Experiment 4 completed successfully")
         return True
@@ -92,15 +180,20 @@ def run_experiment_4() -> bool:
         return False
 
 
-def run_all_experiments() -> bool:
+def run_all_experiments(
+    output_dir: str = "src/data/results",
+    track_memory: bool = False,
+    use_async: bool = False,
+    use_cache: Optional[bool] = None
+) -> bool:
     """Run all experiments sequentially"""
     print_header("CONTEXT WINDOWS LAB - RUNNING ALL EXPERIMENTS")
 
     results = {
-        "Experiment 1": run_experiment_1(),
-        "Experiment 2": run_experiment_2(),
-        "Experiment 3": run_experiment_3(),
-        "Experiment 4": run_experiment_4()
+        "Experiment 1": run_experiment_1(output_dir, use_async, use_cache),
+        "Experiment 2": run_experiment_2(output_dir, track_memory, use_async, use_cache),
+        "Experiment 3": run_experiment_3(output_dir, track_memory, use_async, use_cache),
+        "Experiment 4": run_experiment_4(output_dir, use_async, use_cache)
     }
 
     # Print summary
@@ -113,4 +206,22 @@ def run_all_experiments() -> bool:
     total_tests = len(results)
     print(f"\n  Total: {total_passed}/{total_tests} experiments completed successfully")
 
+    cache_stats = CORPUS_CACHE.stats()
+    print(
+        f"  Corpus cache: {cache_stats['hits']} hits, "
+        f"{cache_stats['prefix_hits']} prefix hits, "
+        f"{cache_stats['extensions']} extensions, "
+        f"{cache_stats['misses']} misses, "
+        f"{cache_stats['bytes_held'] / 1024:.1f} KiB held"
+    )
+
+    if cache_enabled(use_cache):
+        response_stats = get_response_cache().stats()
+        print(
+            f"  Response cache: {response_stats['memory_hits']} memory hits, "
+            f"{response_stats['disk_hits']} disk hits, "
+            f"{response_stats['misses']} misses, "
+            f"{response_stats['disk_bytes_held'] / 1024:.1f} KiB on disk"
+        )
+
     return all(results.values())
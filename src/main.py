@@ -20,6 +20,7 @@ from experiments.experiment_runner import (
     run_all_experiments
 )
 from utils.cli_utils import print_header
+from utils.config import Config
 
 
 
@@ -49,6 +50,8 @@ Examples:
   python main.py --experiment 1              # Run experiment 1 only
   python main.py --experiment all            # Run all experiments
   python main.py --experiment 3 --verbose    # Run experiment 3 with verbose output
+  python main.py --experiment all --async    # Overlap LLM calls
+  python main.py --experiment 2 --no-cache   # Force fresh LLM calls
         """
     )
 
@@ -67,6 +70,25 @@ Examples:
         help='Output directory for results (default: src/data/results)'
     )
 
+    parser.add_argument(
+        '--track-memory',
+        action='store_true',
+        help='Record per-phase memory for experiments 2 and 3 (or set TRACK_MEMORY=true)'
+    )
+
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Issue LLM calls concurrently (up to LLM_MAX_CONCURRENCY in flight)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Bypass the LLM response cache and make every call fresh (or set ENABLE_CACHE=false)'
+    )
+
     parser.add_argument(
         '--verbose',
         action='store_true',
@@ -86,17 +108,21 @@ Examples:
     print("  © Dr. Segal Yoram - All Rights Reserved")
     print("=" * 70)
 
+    track_memory = args.track_memory or Config.track_memory()
+    # None defers to ENABLE_CACHE
+    use_cache = False if args.no_cache else None
+
     # Run requested experiment(s)
     if args.experiment == 'all':
-        success = run_all_experiments()
+        success = run_all_experiments(args.output_dir, track_memory, args.use_async, use_cache)
     elif args.experiment == '1':
-        success = run_experiment_1()
+        success = run_experiment_1(args.output_dir, args.use_async, use_cache)
     elif args.experiment == '2':
-        success = run_experiment_2()
+        success = run_experiment_2(args.output_dir, track_memory, args.use_async, use_cache)
     elif args.experiment == '3':
-        success = run_experiment_3()
+        success = run_experiment_3(args.output_dir, track_memory, args.use_async, use_cache)
     elif args.experiment == '4':
-        success = run_experiment_4()
+        success = run_experiment_4(args.output_dir, args.use_async, use_cache)
     else:
         logger.error(f"Invalid experiment: {args.experiment}")
         success = False
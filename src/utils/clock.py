@@ -0,0 +1,126 @@
+"""
+Clocks for Context Windows Lab
+Wall-clock and simulated time sources for latency measurement
+Author: Context Windows Lab
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Clock(ABC):
+    """
+    Time source used to wait for and measure LLM calls
+
+    Latency is measured as the difference of two now() readings, so code
+    that sleeps through a Clock and measures with the same Clock gets the
+    same numbers whether time is real or simulated.
+    """
+
+    def now(self) -> float:
+        """Current time in seconds"""
+        return self.now_ns() / 1e9
+
+    @abstractmethod
+    def now_ns(self) -> int:
+        """Current time in nanoseconds"""
+
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        """Wait for a duration"""
+
+    @abstractmethod
+    async def sleep_async(self, seconds: float) -> None:
+        """Wait for a duration without blocking the event loop"""
+
+    @abstractmethod
+    def fork(self) -> "Clock":
+        """
+        Clock for one of several overlapping calls
+
+        Latency read from a forked clock covers only the call that slept
+        on it, even when other calls advance their own clocks meanwhile.
+        """
+
+
+class WallClock(Clock):
+    """Real time: perf_counter readings and time.sleep"""
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def sleep_async(self, seconds: float) -> None:
+        await asyncio.sleep(max(seconds, 0))
+
+    def fork(self) -> "WallClock":
+        # Real time already moves independently for every caller
+        return self
+
+
+class VirtualClock(Clock):
+    """
+    Simulated time that only moves when something sleeps on it
+
+    sleep() returns immediately after advancing the clock, so mock LLM
+    latencies cost no real time while measured latencies stay exact.
+    """
+
+    def __init__(self, start_ns: int = 0):
+        """
+        Initialize clock
+
+        Args:
+            start_ns: Initial reading in nanoseconds
+        """
+        self._now_ns = start_ns
+        self._lock = threading.Lock()
+
+    def now_ns(self) -> int:
+        return self._now_ns
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self._now_ns += round(seconds * 1e9)
+
+    async def sleep_async(self, seconds: float) -> None:
+        self.sleep(seconds)
+        # Still yield so concurrent calls interleave as they would in real time
+        await asyncio.sleep(0)
+
+    def fork(self) -> "VirtualClock":
+        return VirtualClock(self._now_ns)
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward (alias of sleep)"""
+        self.sleep(seconds)
+
+
+# Shared wall clock; clocks hold no per-caller state
+WALL_CLOCK = WallClock()
+
+
+def default_clock() -> Clock:
+    """
+    Clock for a new experiment
+
+    The mock LLM backend runs on a fresh VirtualClock unless
+    MOCK_CLOCK=wall; real backends always use the wall clock.
+
+    Returns:
+        Clock instance
+    """
+    if Config.get_llm_backend() == "mock" and Config.get_mock_clock() == "virtual":
+        return VirtualClock()
+    return WALL_CLOCK
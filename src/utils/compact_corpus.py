@@ -0,0 +1,362 @@
+"""
+Compact Corpus Representation for Context Windows Lab
+Stores generated documents as vocabulary-index arrays instead of strings
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+from utils.text_generator import TextGenerator, _FILLER_TOKENS
+from utils.rng import default_generator
+
+logger = logging.getLogger(__name__)
+
+# Fact position codes used in the compact arrays
+POSITIONS = ["start", "middle", "end"]
+
+# Keys exposed by CompactDocument for dictionary-style access
+_DOCUMENT_KEYS = (
+    "id", "text", "fact", "fact_position", "fact_index", "word_count"
+)
+
+# Character length of every filler word, indexed by vocabulary id
+_WORD_LENGTHS = np.array(
+    [len(word) for word in TextGenerator.FILLER_WORDS], dtype=np.int64
+)
+
+
+class CompactDocument:
+    """
+    Read-only view of one document inside a CompactCorpus
+
+    Holds array slices into the parent corpus; text is only rendered
+    when the ``text`` property is accessed.
+    """
+
+    __slots__ = (
+        "id", "token_ids", "sentence_offsets", "fact",
+        "fact_position", "fact_index"
+    )
+
+    def __init__(
+        self,
+        doc_id: int,
+        token_ids: np.ndarray,
+        sentence_offsets: np.ndarray,
+        fact: str,
+        fact_position: str,
+        fact_index: int
+    ):
+        """
+        Initialize document view
+
+        Args:
+            doc_id: Document id
+            token_ids: uint16 vocabulary indices of the filler words
+            sentence_offsets: Word index where each sentence starts
+            fact: Embedded critical fact
+            fact_position: 'start', 'middle', or 'end'
+            fact_index: Sentence index the fact is inserted before
+        """
+        self.id = doc_id
+        self.token_ids = token_ids
+        self.sentence_offsets = sentence_offsets
+        self.fact = fact
+        self.fact_position = fact_position
+        self.fact_index = fact_index
+
+    @property
+    def word_count(self) -> int:
+        """Words in the rendered document, including the fact"""
+        return len(self.token_ids) + len(self.fact.split())
+
+    @property
+    def fact_word_offset(self) -> int:
+        """Number of filler words preceding the fact"""
+        if self.fact_index >= len(self.sentence_offsets):
+            return len(self.token_ids)
+        return int(self.sentence_offsets[self.fact_index])
+
+    @property
+    def fact_char_offset(self) -> int:
+        """Character offset of the fact in the rendered text"""
+        words_before = self.fact_word_offset
+        # Each preceding word is followed by a space, each sentence by a period
+        return (
+            int(_WORD_LENGTHS[self.token_ids[:words_before]].sum())
+            + words_before + self.fact_index
+        )
+
+    @property
+    def fact_token_offset(self) -> int:
+        """Token offset of the fact in the rendered text (active tokenizer)"""
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            # The rendered prefix is never built for a length-based count
+            return self.fact_char_offset // tokenizer.chars_per_token
+        return tokenizer.count(self.text[:self.fact_char_offset])
+
+    @property
+    def char_length(self) -> int:
+        """Length of the rendered text in characters"""
+        num_words = len(self.token_ids)
+        if num_words == 0:
+            return len(self.fact) + 2
+        filler = (
+            int(_WORD_LENGTHS[self.token_ids].sum())
+            + (num_words - 1) + len(self.sentence_offsets)
+        )
+        return filler + len(self.fact) + 2
+
+    def estimate_tokens(self) -> int:
+        """
+        Token count with the active tokenizer
+
+        Length-based tokenizers count from the array lengths without
+        rendering the text; others count the rendered text.
+
+        Returns:
+            Token count
+        """
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            return self.char_length // tokenizer.chars_per_token
+        return tokenizer.count(self.text)
+
+    @property
+    def text(self) -> str:
+        """Render the document text (same layout as embed_critical_fact)"""
+        num_words = len(self.token_ids)
+        if num_words == 0:
+            return self.fact + ". "
+
+        sentence_start = np.zeros(num_words, dtype=bool)
+        sentence_start[self.sentence_offsets] = True
+        sentence_end = np.zeros(num_words, dtype=bool)
+        sentence_end[self.sentence_offsets[1:] - 1] = True
+        sentence_end[-1] = True
+
+        codes = self.token_ids.astype(np.int64) * 4 + sentence_start + sentence_end * 2
+        filler = " ".join(_FILLER_TOKENS[codes].tolist())
+
+        offset = self.fact_char_offset
+        return filler[:offset] + self.fact + ". " + filler[offset:]
+
+    def __getitem__(self, key: str):
+        """Dictionary-style access so views can stand in for document dicts"""
+        if key not in _DOCUMENT_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict:
+        """
+        Convert to the document dictionary used by the experiments
+
+        Returns:
+            Document dictionary with rendered text and metadata
+        """
+        return {
+            "id": self.id,
+            "text": self.text,
+            "fact": self.fact,
+            "fact_position": self.fact_position,
+            "fact_index": self.fact_index,
+            "word_count": self.word_count
+        }
+
+
+class CompactCorpus:
+    """
+    Struct-of-arrays corpus of filler documents with one embedded fact
+
+    All documents share a flat uint16 token array and a flat sentence
+    offset array; per-document metadata lives in small NumPy columns.
+    """
+
+    def __init__(
+        self,
+        token_ids: np.ndarray,
+        doc_offsets: np.ndarray,
+        sentence_offsets: np.ndarray,
+        sentence_ptr: np.ndarray,
+        position_codes: np.ndarray,
+        fact_indices: np.ndarray,
+        fact: str
+    ):
+        """
+        Initialize corpus from its arrays
+
+        Args:
+            token_ids: Flat uint16 vocabulary indices for all documents
+            doc_offsets: Start of each document in token_ids (len n + 1)
+            sentence_offsets: Flat per-document word offsets of sentences
+            sentence_ptr: Start of each document in sentence_offsets (len n + 1)
+            position_codes: Index into POSITIONS per document
+            fact_indices: Sentence index the fact is inserted before
+            fact: Critical fact shared by all documents
+        """
+        self.token_ids = token_ids
+        self.doc_offsets = doc_offsets
+        self.sentence_offsets = sentence_offsets
+        self.sentence_ptr = sentence_ptr
+        self.position_codes = position_codes
+        self.fact_indices = fact_indices
+        self.fact = fact
+
+    @staticmethod
+    def generate(
+        num_docs: int = 5,
+        words_per_doc: int = 200,
+        fact: str = "The CEO of the company is David Cohen",
+        rng: Optional[np.random.Generator] = None
+    ) -> "CompactCorpus":
+        """
+        Generate a compact corpus with the vectorized filler generator
+
+        Args:
+            num_docs: Number of documents to create
+            words_per_doc: Words per document
+            fact: Critical fact to embed
+            rng: NumPy generator (default: shared root generator)
+
+        Returns:
+            CompactCorpus instance
+        """
+        logger.info(
+            f"Creating compact corpus of {num_docs} documents "
+            f"with {words_per_doc} words each"
+        )
+
+        rng = rng if rng is not None else default_generator()
+        word_rng, length_rng, position_rng = TextGenerator._split_streams(rng, 3)
+        word_ids, sentence_start = TextGenerator._draw_filler_indices(
+            num_docs, words_per_doc, word_rng, length_rng
+        )
+        position_codes = position_rng.integers(len(POSITIONS), size=num_docs).astype(np.int8)
+
+        rows, cols = np.nonzero(sentence_start)
+        sentence_counts = np.bincount(rows, minlength=num_docs)
+        sentence_ptr = np.concatenate([[0], np.cumsum(sentence_counts)])
+
+        # Same insertion rule as embed_critical_fact: start / middle / end
+        fact_indices = np.select(
+            [position_codes == 0, position_codes == 1],
+            [0, sentence_counts // 2],
+            default=np.maximum(sentence_counts - 1, 0)
+        ).astype(np.int32)
+
+        return CompactCorpus(
+            token_ids=word_ids.astype(np.uint16).ravel(),
+            doc_offsets=np.arange(num_docs + 1, dtype=np.int64) * words_per_doc,
+            sentence_offsets=cols.astype(np.int32),
+            sentence_ptr=sentence_ptr.astype(np.int64),
+            position_codes=position_codes,
+            fact_indices=fact_indices,
+            fact=fact
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_offsets) - 1
+
+    def __getitem__(self, index: int) -> CompactDocument:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Document index out of range: {index}")
+
+        start, end = self.doc_offsets[index], self.doc_offsets[index + 1]
+        s_start, s_end = self.sentence_ptr[index], self.sentence_ptr[index + 1]
+        return CompactDocument(
+            doc_id=index,
+            token_ids=self.token_ids[start:end],
+            sentence_offsets=self.sentence_offsets[s_start:s_end],
+            fact=self.fact,
+            fact_position=POSITIONS[self.position_codes[index]],
+            fact_index=int(self.fact_indices[index])
+        )
+
+    def __iter__(self) -> Iterator[CompactDocument]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the corpus arrays"""
+        return sum(
+            arr.nbytes for arr in (
+                self.token_ids, self.doc_offsets, self.sentence_offsets,
+                self.sentence_ptr, self.position_codes, self.fact_indices
+            )
+        )
+
+    @property
+    def fact_positions(self) -> List[str]:
+        """Fact position label per document"""
+        return [POSITIONS[code] for code in self.position_codes]
+
+    def word_counts(self) -> np.ndarray:
+        """Words per rendered document, including the fact"""
+        return np.diff(self.doc_offsets) + len(self.fact.split())
+
+    def char_lengths(self) -> np.ndarray:
+        """Rendered character length per document"""
+        word_counts = np.diff(self.doc_offsets)
+        sentence_counts = np.diff(self.sentence_ptr)
+        filler = self._doc_sums(_WORD_LENGTHS[self.token_ids])
+        filler = filler + np.maximum(word_counts - 1, 0) + sentence_counts
+        return np.where(word_counts > 0, filler, 0) + len(self.fact) + 2
+
+    def estimate_tokens(self) -> np.ndarray:
+        """Token count per document with the active tokenizer"""
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            return self.char_lengths() // tokenizer.chars_per_token
+        return np.array(tokenizer.count_batch(doc.text for doc in self), dtype=np.int64)
+
+    def fact_word_offsets(self) -> np.ndarray:
+        """Number of filler words preceding the fact in each document"""
+        word_counts = np.diff(self.doc_offsets)
+        sentence_counts = np.diff(self.sentence_ptr)
+        has_sentence = self.fact_indices < sentence_counts
+        lookup = np.minimum(
+            self.sentence_ptr[:-1] + self.fact_indices,
+            max(len(self.sentence_offsets) - 1, 0)
+        )
+        if len(self.sentence_offsets) == 0:
+            return word_counts
+        return np.where(has_sentence, self.sentence_offsets[lookup], word_counts)
+
+    def fact_char_offsets(self) -> np.ndarray:
+        """Character offset of the fact in each rendered document"""
+        # Prefix sums of (word length + following space) over the flat array
+        cumulative = np.concatenate(
+            [[0], np.cumsum(_WORD_LENGTHS[self.token_ids] + 1)]
+        )
+        starts = self.doc_offsets[:-1]
+        before = cumulative[starts + self.fact_word_offsets()] - cumulative[starts]
+        return before + self.fact_indices
+
+    def fact_token_offsets(self) -> np.ndarray:
+        """Token offset of the fact in each rendered document (active tokenizer)"""
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            return self.fact_char_offsets() // tokenizer.chars_per_token
+        return np.array([doc.fact_token_offset for doc in self], dtype=np.int64)
+
+    def to_documents(self) -> List[Dict]:
+        """
+        Render every document into the dictionary form
+
+        Returns:
+            List of document dictionaries
+        """
+        return [doc.to_dict() for doc in self]
+
+    def _doc_sums(self, values: np.ndarray) -> np.ndarray:
+        """Sum a per-token array within each document"""
+        cumulative = np.concatenate([[0], np.cumsum(values)])
+        return cumulative[self.doc_offsets[1:]] - cumulative[self.doc_offsets[:-1]]
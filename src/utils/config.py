@@ -21,7 +21,8 @@ class Config:
             'num_docs': get_env_int('EXPERIMENT1_NUM_DOCS', 15),
             'words_per_doc': get_env_int('EXPERIMENT1_WORDS_PER_DOC', 200),
             'critical_fact': get_env_str('CRITICAL_FACT',
-                'The CEO of the company is David Cohen')
+                'The CEO of the company is David Cohen'),
+            'corpus_path': get_env_str('EXPERIMENT1_CORPUS', '') or None
         }
 
     @staticmethod
@@ -31,7 +32,9 @@ class Config:
             'EXPERIMENT2_DOC_COUNTS', '2,5,10,20,50')]
         return {
             'doc_counts': doc_counts,
-            'words_per_doc': get_env_int('EXPERIMENT2_WORDS_PER_DOC', 200)
+            'words_per_doc': get_env_int('EXPERIMENT2_WORDS_PER_DOC', 200),
+            'repetitions': get_env_int('EXPERIMENT2_REPETITIONS', 1),
+            'latency_slo': get_env_float('EXPERIMENT2_LATENCY_SLO', 2.0)
         }
 
     @staticmethod
@@ -43,7 +46,15 @@ class Config:
             'query': get_env_str('HEBREW_QUERY',
                 'מה תופעות הלוואי של התרופה'),
             'topics': get_env_list('HEBREW_TOPICS',
-                'technology,law,medicine')
+                'technology,law,medicine'),
+            'corpus_path': get_env_str('EXPERIMENT3_CORPUS', '') or None,
+            'corpus_engine': get_env_str('EXPERIMENT3_CORPUS_ENGINE', 'fixed'),
+            'sentence_distribution': get_env_str(
+                'EXPERIMENT3_SENTENCE_DISTRIBUTION', 'uniform'),
+            'mean_sentences': get_env_float('EXPERIMENT3_MEAN_SENTENCES', 8.0),
+            'min_sentences': get_env_int('EXPERIMENT3_MIN_SENTENCES', 3),
+            'max_sentences': get_env_int('EXPERIMENT3_MAX_SENTENCES', 20),
+            'answer_density': get_env_float('EXPERIMENT3_ANSWER_DENSITY', 1.0)
         }
 
     @staticmethod
@@ -54,6 +65,30 @@ class Config:
             'max_tokens': get_env_int('EXPERIMENT4_MAX_TOKENS', 2000)
         }
 
+    @staticmethod
+    def get_regression_config() -> dict:
+        """Cross-run regression detection thresholds"""
+        return {
+            'latency_tolerance': get_env_float('REGRESSION_LATENCY_TOLERANCE', 0.10),
+            'min_latency_ms': get_env_float('REGRESSION_MIN_LATENCY_MS', 1.0),
+            'tokens_tolerance': get_env_float('REGRESSION_TOKENS_TOLERANCE', 0.01),
+            'accuracy_tolerance': get_env_float('REGRESSION_ACCURACY_TOLERANCE', 0.05),
+            'alpha': get_env_float('REGRESSION_ALPHA', 0.05)
+        }
+
+    @staticmethod
+    def get_llm_config() -> dict:
+        """OpenAI-compatible HTTP backend settings"""
+        return {
+            'base_url': get_env_str('LLM_BASE_URL', 'http://localhost:8000/v1'),
+            'model': get_env_str('LLM_MODEL', 'mock'),
+            'api_key': get_env_str('LLM_API_KEY', ''),
+            'pool_size': get_env_int('LLM_POOL_SIZE', 8),
+            'timeout': get_env_float('LLM_TIMEOUT', 30.0),
+            'retries': get_env_int('LLM_RETRIES', 2),
+            'backoff': get_env_float('LLM_RETRY_BACKOFF', 0.5)
+        }
+
     @staticmethod
     def get_results_dir() -> Path:
         """Get results directory path"""
@@ -70,6 +105,37 @@ class Config:
             'height': get_env_float('IMAGE_HEIGHT', 6)
         }
 
+    @staticmethod
+    def get_corpus_cache_bytes() -> int:
+        """Byte budget of the in-process corpus cache"""
+        return get_env_int('CORPUS_CACHE_MAX_MB', 256) * 1024 * 1024
+
+    @staticmethod
+    def get_cache_config() -> dict:
+        """LLM response cache settings (memory LRU and SQLite tiers)"""
+        cache_dir = get_env_str('CACHE_DIR', 'src/data/cache')
+        return {
+            'enabled': get_env_bool('ENABLE_CACHE', 'true'),
+            'path': project_root / cache_dir / 'llm_responses.sqlite',
+            'memory_bytes': get_env_int('CACHE_MEMORY_MB', 64) * 1024 * 1024,
+            'disk_bytes': get_env_int('CACHE_MAX_MB', 512) * 1024 * 1024,
+            'ttl_seconds': get_env_float('CACHE_TTL_HOURS', 168) * 3600
+        }
+
+    @staticmethod
+    def get_tokenizer_config() -> dict:
+        """Token counter configuration"""
+        tokenizer_dir = project_root / 'src/data/tokenizer'
+        return {
+            'name': get_env_str('TOKENIZER', 'heuristic'),
+            'vocab_path': project_root / get_env_str(
+                'TOKENIZER_VOCAB', str(tokenizer_dir / 'vocab.json')),
+            'merges_path': project_root / get_env_str(
+                'TOKENIZER_MERGES', str(tokenizer_dir / 'merges.txt')),
+            'cache_size': get_env_int('TOKENIZER_CACHE_SIZE', 65536),
+            'chars_per_token': Config.get_chars_per_token()
+        }
+
     @staticmethod
     def get_log_level() -> str:
         """Get logging level"""
@@ -93,6 +159,27 @@ class Config:
         """Check if mock LLM should be used"""
         return get_env_bool('USE_MOCK_LLM', 'true')
 
+    @staticmethod
+    def get_llm_backend() -> str:
+        """LLM backend name (default: mock if USE_MOCK_LLM, else http)"""
+        default = 'mock' if Config.use_mock_llm() else 'http'
+        return get_env_str('LLM_BACKEND', default).lower() or default
+
+    @staticmethod
+    def get_llm_concurrency() -> int:
+        """LLM calls in flight at once in async runs"""
+        return get_env_int('LLM_MAX_CONCURRENCY', 8)
+
+    @staticmethod
+    def get_mock_clock() -> str:
+        """Time source of the mock LLM: virtual (no sleeping) or wall"""
+        return get_env_str('MOCK_CLOCK', 'virtual').lower()
+
+    @staticmethod
+    def track_memory() -> bool:
+        """Check if per-phase memory tracking is enabled"""
+        return get_env_bool('TRACK_MEMORY', 'false')
+
     @staticmethod
     def is_test_mode() -> bool:
         """Check if running in test mode"""
@@ -145,4 +232,7 @@ class Config:
         print(f"Log Level: {Config.get_log_level()}")
         print(f"Random Seed: {Config.get_random_seed()}")
         print(f"Mock LLM: {Config.use_mock_llm()}")
+        print(f"LLM backend: {Config.get_llm_backend()}")
+        print(f"Mock clock: {Config.get_mock_clock()}")
+        print(f"Response cache: {Config.get_cache_config()['enabled']}")
         print("=" * 60 + "\n")
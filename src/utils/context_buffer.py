@@ -0,0 +1,299 @@
+"""
+Context Buffer for Context Windows Lab
+Represents a multi-document context as spans without concatenating them
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+
+logger = logging.getLogger(__name__)
+
+
+class ContextBuffer:
+    """
+    Documents joined by a separator, kept as references to their texts
+
+    Span offsets are prefix sums computed once, and per-span token counts
+    are cached on first use, so total tokens, needle lookup and document
+    boundaries never require building the combined string. The contiguous
+    string (or its UTF-8 bytes) is only materialized on demand.
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        separator: str = "\n\n",
+        token_counts: Optional[Sequence[int]] = None
+    ):
+        """
+        Initialize buffer
+
+        Args:
+            texts: Span texts in context order
+            separator: String placed between consecutive spans
+            token_counts: Optional precomputed token count per span
+        """
+        self._texts = list(texts)
+        self.separator = separator
+        self._count = len(self._texts)
+
+        lengths = np.fromiter(
+            (len(t) for t in self._texts), dtype=np.int64, count=self._count
+        )
+        # Cumulative text length before each span (len n + 1)
+        self._cum_lengths = np.concatenate([[0], np.cumsum(lengths)])
+
+        if token_counts is not None:
+            self._span_tokens = np.asarray(token_counts, dtype=np.int64).copy()
+        else:
+            self._span_tokens = np.full(self._count, -1, dtype=np.int64)
+
+        self._materialized: Optional[str] = None
+        self._encoded: Optional[bytes] = None
+        self._total_tokens: Optional[int] = None
+
+    @staticmethod
+    def _view(
+        texts: List[str],
+        separator: str,
+        cum_lengths: np.ndarray,
+        span_tokens: np.ndarray,
+        count: int,
+        total_tokens: Optional[int] = None
+    ) -> "ContextBuffer":
+        """
+        Buffer over the first `count` entries of existing span arrays
+
+        Nothing is copied; the caller guarantees the shared entries are not
+        modified while the view is in use.
+
+        Args:
+            texts: Span texts (at least `count`)
+            separator: String placed between consecutive spans
+            cum_lengths: Cumulative text lengths (at least count + 1)
+            span_tokens: Per-span token counts, -1 where unknown
+            count: Number of spans in the view
+            total_tokens: Precomputed total token count, if known
+
+        Returns:
+            ContextBuffer view
+        """
+        view = ContextBuffer.__new__(ContextBuffer)
+        view._texts = texts
+        view.separator = separator
+        view._count = count
+        view._cum_lengths = cum_lengths
+        view._span_tokens = span_tokens
+        view._materialized = None
+        view._encoded = None
+        view._total_tokens = total_tokens
+        return view
+
+    @staticmethod
+    def concat(buffers: Sequence["ContextBuffer"], separator: str = "\n\n") -> "ContextBuffer":
+        """
+        Buffer over the spans of several buffers, in order
+
+        Span texts, lengths and cached token counts are carried over; no
+        span is re-tokenized and no context string is built.
+
+        Args:
+            buffers: Buffers whose spans are joined
+            separator: String placed between consecutive spans
+
+        Returns:
+            ContextBuffer over every span of the inputs
+        """
+        texts: List[str] = []
+        lengths = []
+        span_tokens = []
+        for buffer in buffers:
+            count = buffer._count
+            texts.extend(buffer._texts[:count])
+            lengths.append(np.diff(buffer._cum_lengths[:count + 1]))
+            span_tokens.append(buffer._span_tokens[:count])
+
+        if not texts:
+            return ContextBuffer([], separator)
+        cum_lengths = np.concatenate([[0], np.cumsum(np.concatenate(lengths))])
+        return ContextBuffer._view(
+            texts, separator, cum_lengths, np.concatenate(span_tokens), len(texts)
+        )
+
+    @staticmethod
+    def from_documents(documents: Sequence[Dict], separator: str = "\n\n") -> "ContextBuffer":
+        """
+        Build a buffer over document dictionaries
+
+        Args:
+            documents: Documents with a 'text' field
+            separator: String placed between documents
+
+        Returns:
+            ContextBuffer over the document texts
+        """
+        return ContextBuffer([doc['text'] for doc in documents], separator)
+
+    @property
+    def num_spans(self) -> int:
+        """Number of spans in the buffer"""
+        return self._count
+
+    def __len__(self) -> int:
+        """Length of the combined context in characters"""
+        if self._count == 0:
+            return 0
+        return int(self._cum_lengths[self._count]) + (self._count - 1) * len(self.separator)
+
+    def span(self, index: int) -> str:
+        """Text of one span"""
+        if not 0 <= index < self._count:
+            raise IndexError(f"Span index out of range: {index}")
+        return self._texts[index]
+
+    def span_start(self, index: int) -> int:
+        """Character offset where a span starts in the combined context"""
+        return int(self._cum_lengths[index]) + index * len(self.separator)
+
+    def boundaries(self) -> List[Tuple[int, int]]:
+        """
+        Character (start, end) of every span in the combined context
+
+        Returns:
+            List of offset pairs
+        """
+        starts = self._cum_lengths[:self._count] + np.arange(self._count) * len(self.separator)
+        ends = starts + np.diff(self._cum_lengths[:self._count + 1])
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def span_token_counts(self) -> np.ndarray:
+        """Token count of each span (computed once, then cached)"""
+        counts = self._span_tokens[:self._count]
+        missing = np.flatnonzero(counts < 0)
+        if len(missing):
+            counts[missing] = MetricsEvaluator.count_tokens_batch(
+                self._texts[i] for i in missing.tolist()
+            )
+        return counts
+
+    @property
+    def total_tokens(self) -> int:
+        """Token count of the combined context"""
+        if self._total_tokens is not None:
+            return self._total_tokens
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            # Length-based estimate: the combined length is exact
+            total = len(self) // tokenizer.chars_per_token
+        elif self._count == 0:
+            total = 0
+        else:
+            # Spans are counted separately (and cached); separators add a
+            # fixed count each
+            separators = (self._count - 1) * tokenizer.count(self.separator)
+            total = int(self.span_token_counts().sum()) + separators
+        self._total_tokens = total
+        return total
+
+    def find(self, needle: str) -> Optional[Tuple[int, int]]:
+        """
+        Locate a needle without concatenating spans
+
+        Needles are matched within a single span.
+
+        Args:
+            needle: String to search for
+
+        Returns:
+            Tuple of (span index, character offset in the combined context),
+            or None if not found
+        """
+        for i in range(self._count):
+            local = self._texts[i].find(needle)
+            if local != -1:
+                return i, self.span_start(i) + local
+        return None
+
+    def token_offset(self, char_offset: int) -> int:
+        """
+        Token offset of a character offset in the combined context
+
+        Counted by the rules of total_tokens without concatenating spans:
+        whole spans before the offset use their cached counts, and only
+        the span containing it is tokenized up to the offset. An offset
+        inside a separator counts up to the end of the preceding span.
+
+        Args:
+            char_offset: Character offset in the combined context
+
+        Returns:
+            Number of tokens before char_offset
+        """
+        if not 0 <= char_offset <= len(self):
+            raise ValueError(f"Character offset out of range: {char_offset}")
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            return char_offset // tokenizer.chars_per_token
+        if self._count == 0:
+            return 0
+
+        # Last span starting at or before the offset
+        starts = self._cum_lengths[:self._count] + np.arange(self._count) * len(self.separator)
+        index = int(np.searchsorted(starts, char_offset, side="right")) - 1
+        before = 0
+        if index:
+            before = self.prefix(index).total_tokens + tokenizer.count(self.separator)
+        local = min(char_offset - int(starts[index]), len(self._texts[index]))
+        return before + MetricsEvaluator.token_offset(self._texts[index], local)
+
+    def __contains__(self, needle: str) -> bool:
+        return self.find(needle) is not None
+
+    def prefix(self, count: int) -> "ContextBuffer":
+        """
+        View of the first `count` spans
+
+        Shares the span list, offsets and token-count cache with this buffer.
+
+        Args:
+            count: Number of spans to keep
+
+        Returns:
+            ContextBuffer view
+        """
+        if not 0 <= count <= self._count:
+            raise ValueError(f"Prefix size out of range: {count}")
+
+        return ContextBuffer._view(
+            self._texts, self.separator, self._cum_lengths, self._span_tokens, count
+        )
+
+    def materialize(self) -> str:
+        """
+        Build the contiguous context string (cached)
+
+        Returns:
+            Combined context
+        """
+        if self._materialized is None:
+            self._materialized = self.separator.join(self._texts[:self._count])
+        return self._materialized
+
+    def __str__(self) -> str:
+        return self.materialize()
+
+    def as_memoryview(self) -> memoryview:
+        """
+        Zero-copy view over the UTF-8 encoded context (encoded once)
+
+        Returns:
+            memoryview of the encoded bytes
+        """
+        if self._encoded is None:
+            self._encoded = self.materialize().encode("utf-8")
+        return memoryview(self._encoded)
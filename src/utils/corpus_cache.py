@@ -0,0 +1,191 @@
+"""
+In-Process Corpus Cache for Context Windows Lab
+Shares generated corpora between experiments in a single run
+Author: Context Windows Lab
+"""
+
+import logging
+import sys
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from utils.config import Config
+from utils.rng import RNGContext, root_context, CORPUS_STREAM
+from utils.text_generator import TextGenerator
+from utils.document_table import DocumentTable
+
+logger = logging.getLogger(__name__)
+
+# Cache key: (generator name, frozen parameters, RNG stream key)
+CacheKey = Tuple[str, Tuple, Hashable]
+
+
+def _documents_nbytes(documents: List[Dict]) -> int:
+    """Approximate memory held by a list of document dictionaries"""
+    total = sys.getsizeof(documents)
+    for doc in documents:
+        total += sys.getsizeof(doc) + sys.getsizeof(doc.get('text', ''))
+    return total
+
+
+class CorpusCache:
+    """
+    LRU cache of generated corpora, bounded by total bytes
+
+    Entries are keyed by generator, parameters (excluding the document
+    count) and seed. A request for fewer documents than a cached entry is
+    served as a prefix of it, and a request for more extends the entry by
+    generating only the missing documents; generators must therefore be
+    prefix-stable, which TextGenerator's document generators are. Returned
+    documents are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize cache
+
+        Args:
+            max_bytes: Maximum approximate bytes held before evicting
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[List[Dict], int]]" = OrderedDict()
+        self.bytes_held = 0
+        self.hits = 0
+        self.prefix_hits = 0
+        self.extensions = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(
+        self,
+        generator: str,
+        count: int,
+        params: Dict,
+        seed: Hashable,
+        factory: Callable[[int, int], List[Dict]]
+    ) -> List[Dict]:
+        """
+        Return a cached corpus (or prefix of one), generating on a miss
+
+        A cached entry smaller than `count` is extended with the missing
+        documents instead of being regenerated.
+
+        Args:
+            generator: Generator name
+            count: Number of documents required
+            params: Generator parameters other than the count
+            seed: Identity of the random stream used by the factory
+            factory: Callable (start, count) generating documents
+                start..count-1 of the corpus
+
+        Returns:
+            List of `count` documents
+        """
+        key = (generator, tuple(sorted(params.items())), seed)
+
+        entry = self._entries.get(key)
+        if entry is not None and len(entry[0]) >= count:
+            self._entries.move_to_end(key)
+            if len(entry[0]) == count:
+                self.hits += 1
+            else:
+                self.prefix_hits += 1
+            logger.debug(f"Corpus cache hit: {generator} x{count}")
+            return entry[0][:count]
+
+        if entry is not None:
+            self.extensions += 1
+            logger.debug(f"Corpus cache extend: {generator} x{len(entry[0])} -> x{count}")
+            documents = entry[0] + factory(len(entry[0]), count)
+        else:
+            self.misses += 1
+            documents = factory(0, count)
+        self._store(key, documents)
+        return documents[:count]
+
+    def _store(self, key: CacheKey, documents: List[Dict]) -> None:
+        """Insert an entry and evict least recently used ones over budget"""
+        nbytes = _documents_nbytes(documents)
+        if nbytes > self.max_bytes:
+            logger.debug(f"Corpus of {nbytes} bytes exceeds cache budget, not cached")
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes_held -= old[1]
+
+        self._entries[key] = (documents, nbytes)
+        self.bytes_held += nbytes
+
+        while self.bytes_held > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.bytes_held -= evicted_bytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry (statistics are kept)"""
+        self._entries.clear()
+        self.bytes_held = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Cache statistics
+
+        Returns:
+            Dictionary with hit/miss counts and bytes held
+        """
+        return {
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "extensions": self.extensions,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes_held": self.bytes_held
+        }
+
+
+# Process-wide cache shared by the experiments
+CORPUS_CACHE = CorpusCache(max_bytes=Config.get_corpus_cache_bytes())
+
+
+def get_documents(
+    num_docs: int,
+    words_per_doc: int,
+    fact: str,
+    rng: Optional[RNGContext] = None,
+    cache: Optional[CorpusCache] = None,
+    as_table: bool = False
+) -> Union[List[Dict], DocumentTable]:
+    """
+    Cached equivalent of TextGenerator.create_documents
+
+    Args:
+        num_docs: Number of documents
+        words_per_doc: Words per document
+        fact: Critical fact to embed
+        rng: Corpus random context (default: root corpus stream)
+        cache: Cache to use (default: CORPUS_CACHE)
+        as_table: Return a DocumentTable built from the cached dicts
+            (both forms share one cache entry)
+
+    Returns:
+        List of document dictionaries or DocumentTable (shared, read-only)
+    """
+    rng = rng or root_context().derive(CORPUS_STREAM)
+    cache = cache if cache is not None else CORPUS_CACHE
+
+    documents = cache.get_or_create(
+        generator="create_documents",
+        count=num_docs,
+        params={"words_per_doc": words_per_doc, "fact": fact},
+        seed=rng.key,
+        factory=lambda start, count: list(TextGenerator.iter_documents(
+            num_docs=count,
+            words_per_doc=words_per_doc,
+            fact=fact,
+            rng=RNGContext(rng.entropy, rng.spawn_key).generator,
+            start=start
+        ))
+    )
+    return DocumentTable.from_documents(documents) if as_table else documents
@@ -0,0 +1,326 @@
+"""
+On-Disk Corpus Store for Context Windows Lab
+Writes generated corpora to a binary file and reads them back via mmap
+Author: Context Windows Lab
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.document_table import label_code
+from utils.text_generator import TextGenerator
+
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   MAGIC | header length (uint64 LE) | header JSON | pad
+#   offsets (uint64[count + 1]) | metadata table | text blob (UTF-8)
+MAGIC = b"CWLCORP1"
+ALIGNMENT = 8
+
+# Per-document metadata; string fields are stored as codes into header tables
+METADATA_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("word_count", "<i4"),
+    ("fact_index", "<i4"),
+    ("fact_position", "<i2"),
+    ("topic", "<i2"),
+    ("fact", "<i2"),
+    ("contains_answer", "i1"),
+])
+
+
+def _align(offset: int) -> int:
+    """Round offset up to the section alignment"""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_corpus(path: str, documents: Iterable[Dict], kind: str = "generic") -> int:
+    """
+    Write documents to a corpus file
+
+    Documents are streamed: text is spooled to a temporary file while the
+    offsets and metadata columns are collected, so the input can be a lazy
+    iterator of any size.
+
+    Args:
+        path: Output file path
+        documents: Document dictionaries (English or Hebrew layout)
+        kind: Corpus label stored in the header
+
+    Returns:
+        Number of documents written
+    """
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tables = {"fact_position": [], "topic": [], "fact": []}
+    offsets = [0]
+    records = []
+
+    with tempfile.TemporaryFile() as blob:
+        for doc in documents:
+            encoded = doc["text"].encode("utf-8")
+            blob.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+
+            contains_answer = doc.get("contains_answer")
+            records.append((
+                doc.get("id", len(records)),
+                doc.get("word_count", len(doc["text"].split())),
+                doc.get("fact_index", -1),
+                label_code(tables["fact_position"], doc.get("fact_position")),
+                label_code(tables["topic"], doc.get("topic")),
+                label_code(tables["fact"], doc.get("fact")),
+                -1 if contains_answer is None else int(contains_answer),
+            ))
+
+        count = len(records)
+        offsets_arr = np.asarray(offsets, dtype="<u8")
+        metadata = np.array(records, dtype=METADATA_DTYPE)
+
+        # Header size depends on the section offsets it records; iterate
+        # until the encoded length stops changing
+        header = {"kind": kind, "count": count, "tables": tables}
+        header_bytes = b""
+        while True:
+            offsets_start = _align(len(MAGIC) + 8 + len(header_bytes))
+            metadata_start = _align(offsets_start + offsets_arr.nbytes)
+            text_start = _align(metadata_start + metadata.nbytes)
+            header.update({
+                "offsets_start": offsets_start,
+                "metadata_start": metadata_start,
+                "text_start": text_start,
+                "text_length": int(offsets[-1]),
+            })
+            encoded_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            if len(encoded_header) == len(header_bytes):
+                break
+            header_bytes = encoded_header
+
+        with open(output_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (offsets_start - f.tell()))
+            f.write(offsets_arr.tobytes())
+            f.write(b"\0" * (metadata_start - f.tell()))
+            f.write(metadata.tobytes())
+            f.write(b"\0" * (text_start - f.tell()))
+            blob.seek(0)
+            shutil.copyfileobj(blob, f)
+
+    logger.info(f"Wrote {count} {kind} documents to {output_path}")
+    return count
+
+
+class CorpusReader:
+    """
+    Memory-mapped, read-only view of a corpus file
+
+    Offsets and metadata are NumPy views over the mapping and document
+    bytes are memoryview slices, so opening is O(1) and worker processes
+    share pages through the OS page cache.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open and map a corpus file
+
+        Args:
+            path: Corpus file path
+        """
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a corpus file: {self.path}")
+
+        (header_len,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(
+            self._mmap[header_start:header_start + header_len].decode("utf-8")
+        )
+        self.kind = self.header["kind"]
+        self._tables = self.header["tables"]
+
+        count = self.header["count"]
+        self.offsets = np.frombuffer(
+            self._mmap, dtype="<u8", count=count + 1,
+            offset=self.header["offsets_start"]
+        )
+        self.metadata = np.frombuffer(
+            self._mmap, dtype=METADATA_DTYPE, count=count,
+            offset=self.header["metadata_start"]
+        )
+        self._text_start = self.header["text_start"]
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def __enter__(self) -> "CorpusReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release the mapping and the file handle
+
+        The file handle is always closed. If a caller still holds the
+        offsets or metadata arrays or a text_bytes() view, the mapping
+        cannot be closed yet and is left to be freed with those.
+        """
+        # NumPy views pin the mmap buffer; drop them before closing
+        self.offsets = self.metadata = None
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+                self._view = None
+            if getattr(self, "_mmap", None) is not None:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    logger.debug(f"{self.path}: mapping still exported, left to garbage collection")
+                self._mmap = None
+        finally:
+            if getattr(self, "_file", None) is not None:
+                self._file.close()
+                self._file = None
+
+    def text_bytes(self, index: int) -> memoryview:
+        """
+        Zero-copy UTF-8 bytes of one document
+
+        Args:
+            index: Document index
+
+        Returns:
+            memoryview over the mapped text blob
+        """
+        start = self._text_start + int(self.offsets[index])
+        end = self._text_start + int(self.offsets[index + 1])
+        return self._view[start:end]
+
+    def text(self, index: int) -> str:
+        """Decoded text of one document"""
+        return str(self.text_bytes(index), "utf-8")
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Document index out of range: {index}")
+
+        row = self.metadata[index]
+        doc = {
+            "id": int(row["id"]),
+            "text": self.text(index),
+            "word_count": int(row["word_count"]),
+        }
+        for field in ("fact_position", "topic", "fact"):
+            if row[field] >= 0:
+                doc[field] = self._tables[field][row[field]]
+        if row["fact_index"] >= 0:
+            doc["fact_index"] = int(row["fact_index"])
+        if row["contains_answer"] >= 0:
+            doc["contains_answer"] = bool(row["contains_answer"])
+        return doc
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def build_english_corpus(
+    path: str,
+    num_docs: int,
+    words_per_doc: int = 200,
+    fact: str = "The CEO of the company is David Cohen"
+) -> int:
+    """
+    Pre-build an English filler corpus with embedded facts
+
+    Args:
+        path: Output file path
+        num_docs: Number of documents
+        words_per_doc: Words per document
+        fact: Critical fact to embed
+
+    Returns:
+        Number of documents written
+    """
+    documents = TextGenerator.iter_documents(num_docs, words_per_doc, fact)
+    return write_corpus(path, documents, kind="english")
+
+
+def build_hebrew_corpus(
+    path: str,
+    count: int,
+    topics: List[str] = None,
+    templated: bool = False
+) -> int:
+    """
+    Pre-build a Hebrew topic corpus for RAG experiments
+
+    Args:
+        path: Output file path
+        count: Number of documents
+        topics: List of topics (default: all topics)
+        templated: Use the templated corpus engine instead of the fixed
+            per-topic sentences
+
+    Returns:
+        Number of documents written
+    """
+    # Imported here to keep the store usable without the RAG helpers
+    from utils.rag_utils import annotate_answers
+    from utils.hebrew_corpus import HebrewCorpusGenerator
+
+    if templated:
+        documents = HebrewCorpusGenerator().iter_documents(count, topics)
+    else:
+        documents = annotate_answers(TextGenerator.iter_hebrew_documents(count, topics))
+    return write_corpus(path, documents, kind="hebrew")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(
+        description='Pre-build a haystack corpus file for the experiments'
+    )
+    parser.add_argument('kind', choices=['english', 'hebrew'])
+    parser.add_argument('output', type=str, help='Output corpus file')
+    parser.add_argument('--num-docs', type=int, default=1000)
+    parser.add_argument('--words-per-doc', type=int, default=200)
+    parser.add_argument('--topics', type=str, default=None,
+                        help='Comma-separated Hebrew topics')
+    parser.add_argument('--templated', action='store_true',
+                        help='Use the templated Hebrew corpus engine')
+    args = parser.parse_args()
+
+    if args.kind == 'english':
+        build_english_corpus(args.output, args.num_docs, args.words_per_doc)
+    else:
+        topics = args.topics.split(',') if args.topics else None
+        build_hebrew_corpus(args.output, args.num_docs, topics, args.templated)
+
+
+if __name__ == "__main__":
+    main()
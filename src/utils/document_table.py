@@ -0,0 +1,369 @@
+"""
+Columnar Document Table for Context Windows Lab
+Holds document metadata as NumPy columns with vectorized group-by
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+
+logger = logging.getLogger(__name__)
+
+# Fact positions get fixed codes; other labels are coded in order of appearance
+POSITIONS = ("start", "middle", "end")
+
+# Group-by keys and the column each one reads
+GROUP_COLUMNS = {
+    "position": "position_codes",
+    "topic": "topic_codes",
+    "fact": "fact_codes",
+    "fact_index": "fact_indices",
+    "size": "word_counts",
+    "word_count": "word_counts",
+    "token_count": "token_counts",
+}
+
+
+def _field(doc, key: str):
+    """Field of a document dict (or dict-like view), None if absent"""
+    try:
+        return doc[key]
+    except KeyError:
+        return None
+
+
+def label_code(table: List[str], value: Optional[str]) -> int:
+    """Return the code of value in table, appending it if new (-1 for None)"""
+    if value is None:
+        return -1
+    try:
+        return table.index(value)
+    except ValueError:
+        table.append(value)
+        return len(table) - 1
+
+
+class DocumentTable:
+    """
+    Struct-of-arrays corpus: texts plus one NumPy column per metadata field
+
+    String metadata (fact position, topic, fact) is stored as int8/int16
+    codes into small label lists, so a fact shared by every document is
+    held once. Missing fields are coded -1 (NaN for depth_ratios).
+
+    Indexing with an integer returns the document dictionary the
+    generators used to produce, so a table can be passed wherever a list
+    of documents is expected; slicing returns a table sharing the columns.
+    Token counts are computed with the active tokenizer on first access.
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        ids: np.ndarray,
+        position_codes: np.ndarray,
+        fact_indices: np.ndarray,
+        depth_ratios: np.ndarray,
+        word_counts: np.ndarray,
+        topic_codes: np.ndarray,
+        fact_codes: np.ndarray,
+        contains_answer: np.ndarray,
+        topics: Sequence[str] = (),
+        facts: Sequence[str] = (),
+        token_counts: Optional[np.ndarray] = None
+    ):
+        """
+        Initialize table from its columns
+
+        Args:
+            texts: Document texts
+            ids: Document ids (int64)
+            position_codes: Index into POSITIONS, -1 without a fact (int8)
+            fact_indices: Sentence index of the fact, -1 without one (int32)
+            depth_ratios: Fact character offset / text length, NaN without
+                a fact (float64)
+            word_counts: Words per document (int32)
+            topic_codes: Index into topics, -1 without a topic (int16)
+            fact_codes: Index into facts, -1 without a fact (int16)
+            contains_answer: 1/0 answer flag, -1 when not annotated (int8)
+            topics: Topic labels
+            facts: Fact strings
+            token_counts: Token count per document (computed lazily if None)
+        """
+        self.texts = texts
+        self.ids = ids
+        self.position_codes = position_codes
+        self.fact_indices = fact_indices
+        self.depth_ratios = depth_ratios
+        self.word_counts = word_counts
+        self.topic_codes = topic_codes
+        self.fact_codes = fact_codes
+        self.contains_answer = contains_answer
+        self.topics = list(topics)
+        self.facts = list(facts)
+        self._token_counts = token_counts
+
+    @staticmethod
+    def from_documents(documents: Iterable[Dict]) -> "DocumentTable":
+        """
+        Build a table from document dictionaries
+
+        Accepts anything yielding dict-like documents (lists, generators,
+        CompactCorpus, CorpusReader); each document is read once.
+
+        Args:
+            documents: Documents with a 'text' field and optional metadata
+
+        Returns:
+            DocumentTable
+        """
+        positions = list(POSITIONS)
+        topics: List[str] = []
+        facts: List[str] = []
+        texts = []
+        records = []
+
+        for doc in documents:
+            text = doc['text']
+            fact = _field(doc, 'fact')
+            word_count = _field(doc, 'word_count')
+            fact_index = _field(doc, 'fact_index')
+            contains_answer = _field(doc, 'contains_answer')
+
+            depth = np.nan
+            if fact is not None and text:
+                offset = text.find(fact)
+                if offset >= 0:
+                    depth = offset / len(text)
+
+            texts.append(text)
+            records.append((
+                _field(doc, 'id') if _field(doc, 'id') is not None else len(records),
+                label_code(positions, _field(doc, 'fact_position')),
+                -1 if fact_index is None else fact_index,
+                depth,
+                len(text.split()) if word_count is None else word_count,
+                label_code(topics, _field(doc, 'topic')),
+                label_code(facts, fact),
+                -1 if contains_answer is None else int(contains_answer),
+            ))
+
+        if len(positions) > len(POSITIONS):
+            raise ValueError(f"Unknown fact positions: {positions[len(POSITIONS):]}")
+
+        columns = list(zip(*records)) if records else [()] * 8
+        dtypes = (np.int64, np.int8, np.int32, np.float64, np.int32, np.int16, np.int16, np.int8)
+        arrays = [np.asarray(col, dtype=dtype) for col, dtype in zip(columns, dtypes)]
+
+        return DocumentTable(texts, *arrays, topics=topics, facts=facts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict, "DocumentTable"]:
+        if isinstance(index, slice):
+            return self._take(index)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Document index out of range: {index}")
+
+        doc = {"id": int(self.ids[index]), "text": self.texts[index]}
+        if self.fact_codes[index] >= 0:
+            doc["fact"] = self.facts[self.fact_codes[index]]
+        if self.position_codes[index] >= 0:
+            doc["fact_position"] = POSITIONS[self.position_codes[index]]
+        if self.fact_indices[index] >= 0:
+            doc["fact_index"] = int(self.fact_indices[index])
+        if self.topic_codes[index] >= 0:
+            doc["topic"] = self.topics[self.topic_codes[index]]
+        doc["word_count"] = int(self.word_counts[index])
+        if self.contains_answer[index] >= 0:
+            doc["contains_answer"] = bool(self.contains_answer[index])
+        return doc
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def _take(self, rows: slice) -> "DocumentTable":
+        """Table over a slice of rows; the columns are views"""
+        return DocumentTable(
+            self.texts[rows],
+            self.ids[rows],
+            self.position_codes[rows],
+            self.fact_indices[rows],
+            self.depth_ratios[rows],
+            self.word_counts[rows],
+            self.topic_codes[rows],
+            self.fact_codes[rows],
+            self.contains_answer[rows],
+            topics=self.topics,
+            facts=self.facts,
+            token_counts=None if self._token_counts is None else self._token_counts[rows]
+        )
+
+    @property
+    def token_counts(self) -> np.ndarray:
+        """Token count per document with the active tokenizer"""
+        if self._token_counts is None:
+            self._token_counts = np.asarray(
+                MetricsEvaluator.count_tokens_batch(self.texts), dtype=np.int64
+            )
+        return self._token_counts
+
+    @property
+    def fact_positions(self) -> List[Optional[str]]:
+        """Fact position label per document"""
+        return [POSITIONS[code] if code >= 0 else None for code in self.position_codes.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by texts and columns"""
+        columns = (
+            self.ids, self.position_codes, self.fact_indices, self.depth_ratios,
+            self.word_counts, self.topic_codes, self.fact_codes, self.contains_answer
+        )
+        total = sum(col.nbytes for col in columns)
+        if self._token_counts is not None:
+            total += self._token_counts.nbytes
+        return total + sum(len(text) for text in self.texts)
+
+    def to_documents(self) -> List[Dict]:
+        """
+        Convert back to document dictionaries
+
+        Returns:
+            List of document dictionaries
+        """
+        return list(self)
+
+    def group_codes(
+        self,
+        key: str,
+        bins: Optional[Sequence[float]] = None
+    ) -> Tuple[np.ndarray, List]:
+        """
+        Group code per document for a grouping key
+
+        Categorical keys (position, topic, fact) use their label codes.
+        Numeric keys use their distinct values, or the half-open intervals
+        between consecutive bin edges when bins are given.
+
+        Args:
+            key: One of GROUP_COLUMNS ('size' is the word count)
+            bins: Ascending bin edges for numeric keys
+
+        Returns:
+            Tuple of (code per document, -1 where ungrouped; group labels)
+        """
+        if key not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown group key: {key}")
+        column = getattr(self, GROUP_COLUMNS[key])
+
+        if key == "position":
+            return column.astype(np.int64), list(POSITIONS)
+        if key == "topic":
+            return column.astype(np.int64), list(self.topics)
+        if key == "fact":
+            return column.astype(np.int64), list(self.facts)
+
+        if bins is not None:
+            edges = np.asarray(bins)
+            codes = np.searchsorted(edges, column, side="right") - 1
+            codes[codes >= len(edges) - 1] = -1
+            labels = [f"{lo:g}-{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])]
+            return codes, labels
+
+        values, codes = np.unique(column, return_inverse=True)
+        if key == "fact_index":
+            # -1 marks documents without a fact
+            codes = np.where(column >= 0, codes, -1)
+        return codes.astype(np.int64), values.tolist()
+
+    def group_by(
+        self,
+        key: str,
+        values: Sequence[float],
+        bins: Optional[Sequence[float]] = None
+    ) -> Dict:
+        """
+        Per-group statistics of a per-document value (e.g. accuracy)
+
+        Counts and moments come from np.bincount over the group codes, so
+        the cost is one pass regardless of the number of groups.
+
+        Args:
+            key: Grouping key, see group_codes
+            values: One value per document, in table order
+            bins: Ascending bin edges for numeric keys
+
+        Returns:
+            Group label -> {count, mean, std, min, max}; empty groups omitted
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self):
+            raise ValueError(f"Expected {len(self)} values, got {len(values)}")
+
+        codes, labels = self.group_codes(key, bins)
+        grouped = codes >= 0
+        codes, values = codes[grouped], values[grouped]
+
+        size = len(labels)
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=values, minlength=size)
+        squares = np.bincount(codes, weights=values * values, minlength=size)
+        present = counts > 0
+        means = np.divide(sums, counts, out=np.zeros(size), where=present)
+        variances = np.divide(squares, counts, out=np.zeros(size), where=present) - means ** 2
+
+        minima = np.full(size, np.inf)
+        maxima = np.full(size, -np.inf)
+        np.minimum.at(minima, codes, values)
+        np.maximum.at(maxima, codes, values)
+
+        return {
+            labels[g]: {
+                "count": int(counts[g]),
+                "mean": float(means[g]),
+                "std": float(np.sqrt(max(variances[g], 0.0))),
+                "min": float(minima[g]),
+                "max": float(maxima[g])
+            }
+            for g in np.flatnonzero(present).tolist()
+        }
+
+    def split_by(
+        self,
+        key: str,
+        values: Sequence[float],
+        bins: Optional[Sequence[float]] = None
+    ) -> Dict:
+        """
+        Partition a per-document value by group, keeping document order
+
+        Args:
+            key: Grouping key, see group_codes
+            values: One value per document, in table order
+            bins: Ascending bin edges for numeric keys
+
+        Returns:
+            Group label -> array of that group's values; empty groups omitted
+        """
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"Expected {len(self)} values, got {len(values)}")
+
+        codes, labels = self.group_codes(key, bins)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(labels) + 1))
+        return {
+            labels[g]: values[order[bounds[g + 1]:bounds[g + 2]]]
+            for g in range(len(labels))
+            if bounds[g + 2] > bounds[g + 1]
+        }
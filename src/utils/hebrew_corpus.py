@@ -0,0 +1,274 @@
+"""
+Templated Hebrew Corpus Generator for Context Windows Lab
+Builds large, low-duplication Hebrew corpora from sentence grammars
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.rng import default_generator
+
+logger = logging.getLogger(__name__)
+
+# Slots every topic vocabulary must provide
+SLOTS = ("subject", "verb", "object", "modifier")
+
+# Sentence grammars; each slot is filled from the document's topic vocabulary
+DEFAULT_TEMPLATES = [
+    "{subject} {verb} {object} {modifier}.",
+    "{modifier}, {subject} {verb} {object}.",
+    "לדברי המומחים, {subject} {verb} {object}.",
+    "{subject} {verb} {object}.",
+    "בדוח האחרון נמסר כי {subject} {verb} {object} {modifier}.",
+]
+
+DEFAULT_VOCABULARIES = {
+    "technology": {
+        "subject": ["המערכת", "השרת", "הממשק", "האלגוריתם", "מסד הנתונים",
+                    "הרכיב החדש", "צוות הפיתוח", "התשתית"],
+        "verb": ["משפר", "מאיץ", "מנתח", "מעבד", "מאחסן", "מנטר", "מאבטח", "מסנכרן"],
+        "object": ["את הנתונים", "את הביצועים", "את התעבורה", "את הבקשות",
+                   "את הגיבויים", "את ההרשאות", "את הקוד", "את המשאבים"],
+        "modifier": ["באופן משמעותי", "בזמן אמת", "בצורה מאובטחת", "ללא השבתה",
+                     "בענן", "בכל שעות היממה", "במהירות גבוהה", "באופן אוטומטי"],
+    },
+    "law": {
+        "subject": ["בית המשפט", "השופט", "עורך הדין", "הוועדה", "הרגולטור",
+                    "בית הדין", "המחוקק", "התובע"],
+        "verb": ["דחה", "אישר", "קבע", "ביטל", "בחן", "פרסם", "הגיש", "תיקן"],
+        "object": ["את התביעה", "את ההסכם", "את התקנות", "את הערעור",
+                   "את הפסיקה", "את החוזה", "את העתירה", "את הצו"],
+        "modifier": ["בתחילת השנה", "מחוסר סמכות", "לאחר דיון ממושך", "בהתאם לחוק",
+                     "באופן חלקי", "ללא הוצאות", "פה אחד", "בדיון החוזר"],
+    },
+    "medicine": {
+        "subject": ["הרופא", "המחקר הקליני", "הטיפול החדש", "בית החולים",
+                    "משרד הבריאות", "הצוות הרפואי", "התרופה", "החיסון"],
+        "verb": ["מפחית", "משפר", "בוחן", "מנטר", "מאזן", "מחזק", "מעריך", "מתעד"],
+        "object": ["את לחץ הדם", "את איכות החיים", "את רמת הסוכר", "את מערכת החיסון",
+                   "את תפקודי הכבד", "את קצב הלב", "את תוצאות הבדיקות", "את מצב המטופלים"],
+        "modifier": ["פעמיים ביום", "לאחר הארוחה", "במשך שלושה חודשים", "במינון נמוך",
+                     "תחת השגחה רפואית", "באופן הדרגתי", "בניסוי מבוקר", "בקרב מבוגרים"],
+    },
+}
+
+# Sentence-count distributions supported by the generator
+DISTRIBUTIONS = ("uniform", "poisson", "lognormal")
+
+
+class HebrewCorpusGenerator:
+    """
+    Generates Hebrew documents from templated sentence grammars
+
+    Topic vocabularies are pluggable, sentence counts follow a configurable
+    distribution, and the share of answer-topic documents that carry the
+    answer sentence is controlled by ``answer_density``. Random draws are
+    made for a whole batch at once.
+    """
+
+    def __init__(
+        self,
+        vocabularies: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        templates: Optional[List[str]] = None,
+        distribution: str = "uniform",
+        mean_sentences: float = 8.0,
+        min_sentences: int = 3,
+        max_sentences: int = 20,
+        answer_topic: str = "medicine",
+        answer_sentence: str = "תופעות הלוואי כוללות כאבי ראש וסחרחורת.",
+        answer_density: float = 1.0
+    ):
+        """
+        Initialize generator
+
+        Args:
+            vocabularies: Topic -> slot -> words (default: built-in topics)
+            templates: Sentence templates using the slot names
+            distribution: Sentence-count distribution ('uniform', 'poisson',
+                or 'lognormal')
+            mean_sentences: Mean sentences per document (poisson/lognormal)
+            min_sentences: Minimum sentences per document
+            max_sentences: Maximum sentences per document
+            answer_topic: Topic whose documents may carry the answer
+            answer_sentence: Sentence inserted as the answer
+            answer_density: Probability an answer-topic document carries it
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution: {distribution}")
+        if not 1 <= min_sentences <= max_sentences:
+            raise ValueError("Require 1 <= min_sentences <= max_sentences")
+        if not 0.0 <= answer_density <= 1.0:
+            raise ValueError(f"answer_density must be within [0, 1], got {answer_density}")
+
+        self.vocabularies: Dict[str, Dict[str, List[str]]] = {}
+        for topic, vocabulary in (vocabularies or DEFAULT_VOCABULARIES).items():
+            self.register_topic(topic, vocabulary)
+
+        self.templates = list(templates or DEFAULT_TEMPLATES)
+        self.distribution = distribution
+        self.mean_sentences = mean_sentences
+        self.min_sentences = min_sentences
+        self.max_sentences = max_sentences
+        self.answer_topic = answer_topic
+        self.answer_sentence = answer_sentence
+        self.answer_density = answer_density
+
+    def register_topic(self, topic: str, vocabulary: Dict[str, List[str]]) -> None:
+        """
+        Add or replace a topic vocabulary
+
+        Args:
+            topic: Topic name
+            vocabulary: Slot name -> candidate words; must cover every slot
+        """
+        missing = [slot for slot in SLOTS if not vocabulary.get(slot)]
+        if missing:
+            raise ValueError(f"Vocabulary for '{topic}' is missing slots: {missing}")
+        self.vocabularies[topic] = {slot: list(vocabulary[slot]) for slot in SLOTS}
+
+    @property
+    def topics(self) -> List[str]:
+        """Registered topic names"""
+        return list(self.vocabularies.keys())
+
+    def _draw_sentence_counts(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw sentences per document from the configured distribution"""
+        if self.distribution == "uniform":
+            counts = rng.integers(self.min_sentences, self.max_sentences + 1, size=size)
+        elif self.distribution == "poisson":
+            counts = rng.poisson(self.mean_sentences, size=size)
+        else:
+            sigma = 0.5
+            mu = np.log(self.mean_sentences) - sigma ** 2 / 2
+            counts = np.rint(rng.lognormal(mu, sigma, size=size)).astype(np.int64)
+        return np.clip(counts, self.min_sentences, self.max_sentences)
+
+    def iter_batches(
+        self,
+        count: int,
+        topics: Optional[List[str]] = None,
+        batch_size: int = 10000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Lazily generate documents in fixed-size batches
+
+        Args:
+            count: Total number of documents
+            topics: Topics to sample from (default: all registered)
+            batch_size: Documents per yielded batch
+            rng: NumPy generator (default: shared root generator)
+
+        Yields:
+            Lists of document dictionaries with 'contains_answer' flags
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+        topics = topics or self.topics
+        unknown = [topic for topic in topics if topic not in self.vocabularies]
+        if unknown:
+            raise ValueError(f"Unknown topics: {unknown}")
+
+        rng = rng if rng is not None else default_generator()
+        slot_sizes = np.array(
+            [[len(self.vocabularies[topic][slot]) for slot in SLOTS] for topic in topics]
+        )
+        vocab_rows = [[self.vocabularies[topic][slot] for slot in SLOTS] for topic in topics]
+        answer_code = topics.index(self.answer_topic) if self.answer_topic in topics else -1
+
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+
+            # Per-document draws
+            topic_ids = rng.integers(len(topics), size=size)
+            sentence_counts = self._draw_sentence_counts(size, rng)
+            has_answer = (topic_ids == answer_code) & (rng.random(size) < self.answer_density)
+            answer_slots = rng.integers(0, sentence_counts + 1)
+
+            # Per-sentence draws for the whole batch
+            sentence_topics = np.repeat(topic_ids, sentence_counts)
+            total = len(sentence_topics)
+            template_ids = rng.integers(len(self.templates), size=total)
+            word_ids = (rng.random((total, len(SLOTS))) * slot_sizes[sentence_topics]).astype(np.int64)
+
+            templates = self.templates
+            sentences = []
+            for topic_id, template_id, words in zip(
+                sentence_topics.tolist(), template_ids.tolist(), word_ids.tolist()
+            ):
+                row = vocab_rows[topic_id]
+                sentences.append(templates[template_id].format(
+                    subject=row[0][words[0]], verb=row[1][words[1]],
+                    object=row[2][words[2]], modifier=row[3][words[3]]
+                ))
+
+            batch = []
+            cursor = 0
+            for i in range(size):
+                n = int(sentence_counts[i])
+                doc_sentences = sentences[cursor:cursor + n]
+                cursor += n
+                if has_answer[i]:
+                    doc_sentences.insert(int(answer_slots[i]), self.answer_sentence)
+
+                doc_text = " ".join(doc_sentences)
+                batch.append({
+                    "id": offset + i,
+                    "text": doc_text,
+                    "topic": topics[topic_ids[i]],
+                    "word_count": len(doc_text.split()),
+                    "contains_answer": bool(has_answer[i])
+                })
+
+            yield batch
+
+    def iter_documents(
+        self,
+        count: int,
+        topics: Optional[List[str]] = None,
+        batch_size: int = 10000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Iterator[Dict]:
+        """
+        Lazily generate documents one at a time
+
+        Args:
+            count: Total number of documents
+            topics: Topics to sample from (default: all registered)
+            batch_size: Documents generated per internal batch
+            rng: NumPy generator (default: shared root generator)
+
+        Yields:
+            Document dictionaries
+        """
+        for batch in self.iter_batches(count, topics, batch_size, rng):
+            yield from batch
+
+    def generate(
+        self,
+        count: int,
+        topics: Optional[List[str]] = None,
+        rng: Optional[np.random.Generator] = None
+    ) -> List[Dict]:
+        """
+        Generate a full corpus
+
+        Args:
+            count: Number of documents
+            topics: Topics to sample from (default: all registered)
+            rng: NumPy generator (default: shared root generator)
+
+        Returns:
+            List of document dictionaries
+        """
+        logger.info(f"Generating {count} templated Hebrew documents")
+        documents = list(self.iter_documents(count, topics, rng=rng))
+        logger.info(
+            f"Generated {len(documents)} documents, "
+            f"{sum(doc['contains_answer'] for doc in documents)} with answer"
+        )
+        return documents
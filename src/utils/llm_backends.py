@@ -0,0 +1,906 @@
+"""
+LLM Backends for Context Windows Lab
+Backend registry, bounded-concurrency async interface and pooled HTTP client
+Author: Context Windows Lab
+"""
+
+import asyncio
+import http.client
+import json
+import logging
+import math
+import queue
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from utils.clock import Clock, WALL_CLOCK
+from utils.config import Config
+from utils.context_buffer import ContextBuffer
+from utils.mock_llm import MOCK_MODEL, simulate_llm_mock, simulate_llm_stream, token_waits
+from utils.response_cache import (
+    ResponseCache, cache_key, get_response_cache, restore_rng_state, rng_fingerprint, rng_state
+)
+from utils.timing import TimingRegistry
+
+logger = logging.getLogger(__name__)
+
+# Concurrent calls per backend unless configured otherwise
+DEFAULT_MAX_CONCURRENCY = 8
+
+# HTTP statuses worth retrying (rate limiting, transient server errors)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMBackendError(RuntimeError):
+    """A backend call failed (after any retries)"""
+
+
+class TokenStream:
+    """
+    One streamed LLM call: iterate (``for`` or ``async for``) to receive
+    response tokens as they arrive
+
+    Arrival times are read on the call's clock from the moment the call
+    holds its concurrency slot, as for LLMBackend.query (async iteration
+    forks the clock). Once the last token is in, the stream holds the
+    response, the backend value and the latency breakdown, has recorded
+    "ttft", "inter_token" and "llm_call" in its timings registry, and
+    calls on_complete(stream). A stream can be consumed once.
+    """
+
+    def __init__(
+        self,
+        backend: "LLMBackend",
+        context: Union[str, ContextBuffer],
+        query: str,
+        mode: Optional[str] = None,
+        rng: Optional[np.random.Generator] = None,
+        clock: Optional[Clock] = None,
+        timings: Optional[TimingRegistry] = None,
+        recorded: Optional[Sequence[Tuple[str, int]]] = None
+    ):
+        """
+        Initialize stream (nothing is sent until iteration starts)
+
+        Args:
+            backend: Backend producing the tokens
+            context: Context string or ContextBuffer
+            query: Query string
+            mode: Experiment mode, as for query_llm_mock
+            rng: NumPy generator for this trial
+            clock: Clock to time the call on (default: wall clock)
+            timings: Registry to record the latency breakdown in
+            recorded: (token, arrival ns) pairs to replay instantly
+                instead of calling the backend
+        """
+        self.backend = backend
+        self.context = context
+        self.query = query
+        self.mode = mode
+        self.rng = rng
+        self.clock = clock if clock is not None else WALL_CLOCK
+        self.timings = timings
+        self.recorded = recorded
+        self.on_complete: Optional[Callable[["TokenStream"], None]] = None
+        self.tokens: List[str] = []
+        # Arrival of each token, in ns since the call started
+        self.arrivals_ns: List[int] = []
+        self.latency_ns = 0
+        self.value = math.nan
+        self.done = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self.recorded is not None:
+            yield from self._replay()
+            return
+        clock = self.clock
+        start_ns = clock.now_ns()
+        for token in self.backend._stream_sync(
+            self.context, self.query, self.mode, self.rng, clock, self
+        ):
+            self.tokens.append(token)
+            self.arrivals_ns.append(clock.now_ns() - start_ns)
+            yield token
+        self._complete(clock.now_ns() - start_ns)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if self.recorded is not None:
+            for token in self._replay():
+                yield token
+            return
+        clock = self.clock.fork()
+        async with self.backend._semaphore():
+            start_ns = clock.now_ns()
+            async for token in self.backend._stream(
+                self.context, self.query, self.mode, self.rng, clock, self
+            ):
+                self.tokens.append(token)
+                self.arrivals_ns.append(clock.now_ns() - start_ns)
+                yield token
+            elapsed_ns = clock.now_ns() - start_ns
+        self._complete(elapsed_ns)
+
+    def _replay(self) -> Iterator[str]:
+        """Recorded tokens with their recorded arrival times"""
+        for token, arrival_ns in self.recorded:
+            self.tokens.append(token)
+            self.arrivals_ns.append(arrival_ns)
+            yield token
+        self._complete(self.arrivals_ns[-1] if self.arrivals_ns else 0)
+
+    def _complete(self, latency_ns: int) -> None:
+        """Record the latency breakdown once the last token is in"""
+        self.latency_ns = latency_ns
+        self.done = True
+        if self.timings is not None:
+            if self.arrivals_ns:
+                self.timings.record("ttft", self.arrivals_ns[0])
+            for previous, current in zip(self.arrivals_ns, self.arrivals_ns[1:]):
+                self.timings.record("inter_token", current - previous)
+            self.timings.record("llm_call", latency_ns)
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+    @property
+    def response(self) -> str:
+        """Tokens received so far, concatenated"""
+        return "".join(self.tokens)
+
+    @property
+    def latency(self) -> float:
+        """Total latency (seconds)"""
+        return self.latency_ns / 1e9
+
+    @property
+    def ttft(self) -> float:
+        """Time to first token (seconds; NaN without tokens)"""
+        return self.arrivals_ns[0] / 1e9 if self.arrivals_ns else math.nan
+
+    @property
+    def inter_token_latencies(self) -> List[float]:
+        """Gaps between consecutive tokens (seconds)"""
+        return [
+            (current - previous) / 1e9
+            for previous, current in zip(self.arrivals_ns, self.arrivals_ns[1:])
+        ]
+
+    @property
+    def inter_token_latency(self) -> float:
+        """Mean gap between consecutive tokens (seconds; NaN below two tokens)"""
+        if len(self.arrivals_ns) < 2:
+            return math.nan
+        return (self.arrivals_ns[-1] - self.arrivals_ns[0]) / (len(self.arrivals_ns) - 1) / 1e9
+
+    @property
+    def decode_rate(self) -> float:
+        """Tokens per second after the first (NaN below two tokens)"""
+        gap = self.inter_token_latency
+        return 1.0 / gap if gap > 0 else math.nan
+
+
+class LLMBackend(ABC):
+    """
+    LLM client with a synchronous and an async query path
+
+    ``response, value, latency = backend.query_sync(...)`` or
+    ``... = await backend.query(...)``. Async calls are limited to
+    max_concurrency in flight per event loop; further callers wait on a
+    semaphore. Latency is measured after a call gets its slot and on a
+    clock forked for that call, so it covers only the call itself: time
+    spent queueing, and time other overlapping calls spend on a shared
+    VirtualClock, are never attributed to it.
+
+    ``backend.stream(...)`` returns a TokenStream that yields the response
+    token by token and measures time to first token and inter-token
+    latency; ``query_stream`` / ``query_stream_sync`` consume one.
+
+    Subclasses implement _query (async) and _query_sync, and _stream /
+    _stream_sync when they can stream; otherwise a stream delivers the
+    whole response as one token.
+    """
+
+    name = "base"
+    # Identifies what answers a call, together with name (cache keys)
+    model = ""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Initialize backend
+
+        Args:
+            max_concurrency: Async calls allowed in flight at once
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be positive, got {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        # One semaphore per event loop (asyncio primitives bind to a loop)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limit of the running event loop"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def query(
+        self,
+        context: Union[str, ContextBuffer],
+        query: str,
+        mode: Optional[str] = None,
+        rng: Optional[np.random.Generator] = None,
+        clock: Optional[Clock] = None,
+        timings: Optional[TimingRegistry] = None
+    ) -> Tuple[str, float, float]:
+        """
+        Query the model once
+
+        Args:
+            context: Context string or ContextBuffer
+            query: Query string
+            mode: Experiment mode, as for query_llm_mock
+            rng: NumPy generator for this trial
+            clock: Clock to time the call on; it is forked per call
+                (default: wall clock)
+            timings: Registry to record the call under "llm_call"
+
+        Returns:
+            Tuple of (response, value, latency seconds), where value is
+            what query_llm_mock returns for the mode (accuracy or
+            simulated latency), or NaN if the backend cannot report it
+        """
+        clock = (clock if clock is not None else WALL_CLOCK).fork()
+        async with self._semaphore():
+            start_ns = clock.now_ns()
+            response, value = await self._query(context, query, mode, rng, clock)
+            elapsed_ns = clock.now_ns() - start_ns
+
+        if timings is not None:
+            timings.record("llm_call", elapsed_ns)
+        return response, value, elapsed_ns / 1e9
+
+    def query_sync(
+        self,
+        context: Union[str, ContextBuffer],
+        query: str,
+        mode: Optional[str] = None,
+        rng: Optional[np.random.Generator] = None,
+        clock: Optional[Clock] = None,
+        timings: Optional[TimingRegistry] = None
+    ) -> Tuple[str, float, float]:
+        """Blocking query(); same arguments and return value"""
+        clock = clock if clock is not None else WALL_CLOCK
+        start_ns = clock.now_ns()
+        response, value = self._query_sync(context, query, mode, rng, clock)
+        elapsed_ns = clock.now_ns() - start_ns
+
+        if timings is not None:
+            timings.record("llm_call", elapsed_ns)
+        return response, value, elapsed_ns / 1e9
+
+    def stream(
+        self,
+        context: Union[str, ContextBuffer],
+        query: str,
+        mode: Optional[str] = None,
+        rng: Optional[np.random.Generator] = None,
+        clock: Optional[Clock] = None,
+        timings: Optional[TimingRegistry] = None
+    ) -> TokenStream:
+        """
+        Query the model, streaming the response
+
+        Args:
+            context: Context string or ContextBuffer
+            query: Query string
+            mode: Experiment mode, as for query_llm_mock
+            rng: NumPy generator for this trial
+            clock: Clock to time the call on (default: wall clock)
+            timings: Registry to record "ttft", "inter_token" and
+                "llm_call" in
+
+        Returns:
+            TokenStream; iterate it with ``for`` or ``async for``
+        """
+        return TokenStream(self, context, query, mode, rng, clock, timings)
+
+    async def query_stream(self, context, query, mode=None, rng=None, clock=None, timings=None) -> TokenStream:
+        """Consume stream() in the event loop; same arguments, finished stream"""
+        stream = self.stream(context, query, mode, rng, clock, timings)
+        async for _ in stream:
+            pass
+        return stream
+
+    def query_stream_sync(self, context, query, mode=None, rng=None, clock=None, timings=None) -> TokenStream:
+        """Consume stream() blocking; same arguments, finished stream"""
+        stream = self.stream(context, query, mode, rng, clock, timings)
+        for _ in stream:
+            pass
+        return stream
+
+    @abstractmethod
+    async def _query(self, context, query, mode, rng, clock) -> Tuple[str, float]:
+        """Backend-specific async call; waits only through clock"""
+
+    @abstractmethod
+    def _query_sync(self, context, query, mode, rng, clock) -> Tuple[str, float]:
+        """Backend-specific blocking call; waits only through clock"""
+
+    async def _stream(self, context, query, mode, rng, clock, stream: TokenStream) -> AsyncIterator[str]:
+        """Backend-specific async token stream; sets stream.value"""
+        response, stream.value = await self._query(context, query, mode, rng, clock)
+        yield response
+
+    def _stream_sync(self, context, query, mode, rng, clock, stream: TokenStream) -> Iterator[str]:
+        """Backend-specific blocking token stream; sets stream.value"""
+        response, stream.value = self._query_sync(context, query, mode, rng, clock)
+        yield response
+
+    def cache_stats(self) -> Optional[Dict[str, float]]:
+        """Response cache statistics (None when calls are not cached)"""
+        return None
+
+    def close(self) -> None:
+        """Release connections or other resources"""
+
+
+class MockBackend(LLMBackend):
+    """query_llm_mock behind the backend interface"""
+
+    name = "mock"
+    model = MOCK_MODEL
+
+    async def _query(self, context, query, mode, rng, clock):
+        response, value, wait = simulate_llm_mock(context, query, mode, rng)
+        await clock.sleep_async(wait)
+        return response, value
+
+    def _query_sync(self, context, query, mode, rng, clock):
+        response, value, wait = simulate_llm_mock(context, query, mode, rng)
+        clock.sleep(wait)
+        return response, value
+
+    async def _stream(self, context, query, mode, rng, clock, stream):
+        tokens, stream.value, ttft, inter_token = simulate_llm_stream(context, query, mode, rng)
+        # Prefill before the first token, one decode step before each later one
+        for token, wait in zip(tokens, token_waits(ttft, inter_token, len(tokens))):
+            await clock.sleep_async(wait)
+            yield token
+
+    def _stream_sync(self, context, query, mode, rng, clock, stream):
+        tokens, stream.value, ttft, inter_token = simulate_llm_stream(context, query, mode, rng)
+        for token, wait in zip(tokens, token_waits(ttft, inter_token, len(tokens))):
+            clock.sleep(wait)
+            yield token
+
+
+class CallableBackend(LLMBackend):
+    """
+    Synchronous function behind the backend interface
+
+    For in-process simulations such as experiment 1's position-aware mock.
+    The function runs on the event loop, so it must not block.
+    """
+
+    name = "callable"
+
+    def __init__(
+        self,
+        function: Callable[..., Tuple[str, float]],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        """
+        Initialize backend
+
+        Args:
+            function: Called as function(context, query, mode, rng);
+                returns (response, value)
+            max_concurrency: Async calls allowed in flight at once
+        """
+        super().__init__(max_concurrency)
+        self.function = function
+        self.model = f"{function.__module__}.{function.__qualname__}"
+
+    async def _query(self, context, query, mode, rng, clock):
+        return self.function(context, query, mode, rng)
+
+    def _query_sync(self, context, query, mode, rng, clock):
+        return self.function(context, query, mode, rng)
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections to one host
+
+    At most `size` connections exist at once; callers beyond that block
+    until one is returned. Idle connections are reused most-recent first,
+    and a connection that fails mid-request is closed, not returned.
+    """
+
+    def __init__(self, base_url: str, size: int = 8, timeout: float = 30.0):
+        """
+        Initialize pool (connections are opened lazily)
+
+        Args:
+            base_url: Server URL, e.g. http://localhost:8000/v1
+            size: Maximum open connections
+            timeout: Connect and read timeout per request (seconds)
+        """
+        if size < 1:
+            raise ValueError(f"Pool size must be positive, got {size}")
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        """Open a new connection"""
+        connection_class = (
+            http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        )
+        with self._lock:
+            self.created += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    @contextmanager
+    def connection(self) -> Iterator[http.client.HTTPConnection]:
+        """Borrow a connection: ``with pool.connection() as conn: ...``"""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                with self._lock:
+                    self.reused += 1
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        """Connections opened and reused so far"""
+        return {"size": self.size, "created": self.created, "reused": self.reused}
+
+
+class HTTPBackend(LLMBackend):
+    """
+    OpenAI-compatible chat completions over pooled keep-alive connections
+
+    The context is sent as the system message and the query as the user
+    message. The lab's mode and a per-trial seed travel as extra request
+    fields, which real servers ignore and utils.mock_server uses to
+    reproduce the mock. Connection errors, timeouts and 429/5xx responses
+    are retried with exponential backoff; streams ("stream": true,
+    server-sent events) only until their first token arrives.
+
+    Async calls run the blocking request on the backend's own threads,
+    one per pooled connection. max_concurrency is capped at the pool
+    size so a call never waits for a thread or connection after its
+    latency clock has started.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000/v1",
+        model: str = "mock",
+        api_key: str = "",
+        pool_size: int = 8,
+        timeout: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_tokens: int = 256,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        """
+        Initialize backend
+
+        Args:
+            base_url: API root, e.g. http://localhost:8000/v1
+            model: Model name sent with every request
+            api_key: Bearer token (omitted when empty)
+            pool_size: Keep-alive connections kept per backend
+            timeout: Connect and read timeout per attempt (seconds)
+            retries: Extra attempts after a retryable failure
+            backoff: First retry delay (seconds); doubles per attempt
+            max_tokens: Completion length limit
+            max_concurrency: Async calls allowed in flight at once (at
+                most pool_size)
+        """
+        super().__init__(min(max_concurrency, pool_size))
+        if retries < 0:
+            raise ValueError(f"retries must be non-negative, got {retries}")
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self.model = model
+        self.retries = retries
+        self.backoff = backoff
+        self.max_tokens = max_tokens
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-http")
+        self._headers = {"Content-Type": "application/json"}
+        if api_key:
+            self._headers["Authorization"] = f"Bearer {api_key}"
+
+    def _payload(self, context, query, mode, rng, stream: bool = False) -> bytes:
+        """Request body of one call"""
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": str(context)},
+                {"role": "user", "content": query}
+            ],
+            "max_tokens": self.max_tokens,
+            "temperature": 0
+        }
+        if rng is not None:
+            body["seed"] = int(rng.integers(2 ** 31))
+        if mode is not None:
+            body["mode"] = mode
+        if stream:
+            body["stream"] = True
+        return json.dumps(body).encode("utf-8")
+
+    def _post(self, path: str, payload: bytes) -> Dict:
+        """POST with retries; parsed JSON response"""
+        url = f"{self.pool.path}{path}"
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.connection() as conn:
+                    conn.request("POST", url, body=payload, headers=self._headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                if response.status == 200:
+                    return json.loads(data)
+                error = LLMBackendError(
+                    f"{self.name} backend: HTTP {response.status}: {data[:200]!r}"
+                )
+                if response.status not in RETRY_STATUSES:
+                    raise error
+            except (OSError, http.client.HTTPException) as e:
+                error = LLMBackendError(f"{self.name} backend: {type(e).__name__}: {e}")
+            self._retry(error, attempt)
+
+    def _retry(self, error: LLMBackendError, attempt: int) -> None:
+        """Back off before the next attempt, or raise after the last"""
+        if attempt >= self.retries:
+            raise error
+        delay = self.backoff * 2 ** attempt
+        logger.debug(f"{error}; retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+    @staticmethod
+    def _events(response: http.client.HTTPResponse) -> Iterator[Dict]:
+        """Server-sent events of a streamed completion, up to [DONE]"""
+        for line in response:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            yield json.loads(data)
+        # Drain the body so the connection can be reused
+        response.read()
+
+    def _query_sync(self, context, query, mode, rng, clock):
+        result = self._post("/chat/completions", self._payload(context, query, mode, rng))
+        try:
+            response = result["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMBackendError(f"{self.name} backend: malformed response: {result!r:.200}")
+        return response, float(result.get("lab_value", float("nan")))
+
+    async def _query(self, context, query, mode, rng, clock):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._query_sync, context, query, mode, rng, clock
+        )
+
+    def _stream_sync(self, context, query, mode, rng, clock, stream):
+        payload = self._payload(context, query, mode, rng, stream=True)
+        url = f"{self.pool.path}/chat/completions"
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.connection() as conn:
+                    conn.request("POST", url, body=payload, headers=self._headers)
+                    response = conn.getresponse()
+                    if response.status == 200:
+                        for event in self._events(response):
+                            if "lab_value" in event:
+                                stream.value = float(event["lab_value"])
+                            choices = event.get("choices") or [{}]
+                            token = choices[0].get("delta", {}).get("content")
+                            if token:
+                                yield token
+                        return
+                    data = response.read()
+                error = LLMBackendError(
+                    f"{self.name} backend: HTTP {response.status}: {data[:200]!r}"
+                )
+                if response.status not in RETRY_STATUSES:
+                    raise error
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                error = LLMBackendError(f"{self.name} backend: {type(e).__name__}: {e}")
+                if stream.tokens:
+                    # Tokens were delivered; a retry would repeat them
+                    raise error from e
+            self._retry(error, attempt)
+
+    async def _stream(self, context, query, mode, rng, clock, stream):
+        loop = asyncio.get_running_loop()
+        tokens = self._stream_sync(context, query, mode, rng, clock, stream)
+        end = object()
+        while True:
+            # One pooled thread per in-flight stream reads the next event
+            token = await loop.run_in_executor(self._executor, next, tokens, end)
+            if token is end:
+                return
+            yield token
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.pool.close()
+
+
+class CachedBackend(LLMBackend):
+    """
+    Any backend behind a content-addressed response cache
+
+    Calls are keyed by backend, model, context, query, mode and the
+    trial generator's state, so a hit is exactly the call a miss would
+    have made: it returns the stored response, value and latency,
+    records that latency under "llm_call", and leaves the generator in
+    the state the call left it. Streamed calls are cached apart from
+    unstreamed ones and also store their token arrival times, which a
+    hit replays. Calls without a generator are not reproducible and
+    always go to the backend.
+
+    Hit ratio and bytes saved (request and response bytes not sent) are
+    counted per CachedBackend, i.e. per experiment, while the
+    ResponseCache itself is usually shared process-wide.
+    """
+
+    name = "cached"
+
+    def __init__(self, backend: LLMBackend, cache: Optional[ResponseCache] = None):
+        """
+        Initialize backend
+
+        Args:
+            backend: Backend answering misses
+            cache: Response cache (default: get_response_cache())
+        """
+        super().__init__(backend.max_concurrency)
+        self.backend = backend
+        self.cache = cache if cache is not None else get_response_cache()
+        self.model = backend.model
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self.bytes_saved = 0
+
+    def _lookup(self, context, query, mode, rng, streamed=False) -> Tuple[Optional[str], int, Optional[tuple]]:
+        """Cache key, request bytes and cached entry (None on a miss)"""
+        seed = rng_fingerprint(rng)
+        if seed is None:
+            self.uncached += 1
+            return None, 0, None
+        backend = f"{self.backend.name}+stream" if streamed else self.backend.name
+        key, request_bytes = cache_key(backend, self.model, context, query, mode, seed)
+        entry = self.cache.get(key)
+        if entry is None:
+            self.misses += 1
+        return key, request_bytes, entry
+
+    def _hit(self, entry: tuple, rng) -> None:
+        """Count a cache hit and restore the generator it left behind"""
+        response, _, _, request_bytes, state, _ = entry
+        restore_rng_state(rng, state)
+        self.hits += 1
+        self.bytes_saved += request_bytes + len(response.encode("utf-8"))
+
+    def _replay(self, entry: tuple, rng, timings) -> Tuple[str, float, float]:
+        """Result of a cache hit"""
+        self._hit(entry, rng)
+        response, value, latency = entry[:3]
+        if timings is not None:
+            timings.record("llm_call", round(latency * 1e9))
+        return response, value, latency
+
+    def _store(self, key, request_bytes, result, rng, arrivals=None) -> None:
+        """Cache the result of a miss"""
+        if key is not None:
+            response, value, latency = result
+            self.cache.put(key, response, value, latency, request_bytes, rng_state(rng), arrivals)
+
+    async def query(self, context, query, mode=None, rng=None, clock=None, timings=None):
+        key, request_bytes, entry = self._lookup(context, query, mode, rng)
+        if entry is not None:
+            return self._replay(entry, rng, timings)
+        result = await self.backend.query(context, query, mode, rng, clock, timings)
+        self._store(key, request_bytes, result, rng)
+        return result
+
+    def query_sync(self, context, query, mode=None, rng=None, clock=None, timings=None):
+        key, request_bytes, entry = self._lookup(context, query, mode, rng)
+        if entry is not None:
+            return self._replay(entry, rng, timings)
+        result = self.backend.query_sync(context, query, mode, rng, clock, timings)
+        self._store(key, request_bytes, result, rng)
+        return result
+
+    # Uncached calls of the wrapped backend; query/stream above add the cache
+    async def _query(self, context, query, mode, rng, clock):
+        return await self.backend._query(context, query, mode, rng, clock)
+
+    def _query_sync(self, context, query, mode, rng, clock):
+        return self.backend._query_sync(context, query, mode, rng, clock)
+
+    def stream(self, context, query, mode=None, rng=None, clock=None, timings=None) -> TokenStream:
+        key, request_bytes, entry = self._lookup(context, query, mode, rng, streamed=True)
+        if entry is not None:
+            self._hit(entry, rng)
+            response, value, latency, _, _, arrivals = entry
+            stream = TokenStream(
+                self, context, query, mode, rng, clock, timings,
+                recorded=arrivals or [(response, round(latency * 1e9))]
+            )
+            stream.value = value
+            return stream
+
+        stream = self.backend.stream(context, query, mode, rng, clock, timings)
+        stream.on_complete = lambda done: self._store(
+            key, request_bytes, (done.response, done.value, done.latency), rng,
+            list(zip(done.tokens, done.arrivals_ns))
+        )
+        return stream
+
+    def cache_stats(self) -> Dict[str, float]:
+        """
+        Cache statistics of this backend's calls
+
+        Returns:
+            Dictionary with hits, misses, uncached calls, hit ratio and
+            bytes saved
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved
+        }
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+_UNSEEDED_LOGGED = False
+
+
+def cache_enabled(enabled: Optional[bool] = None) -> bool:
+    """
+    Whether backend calls go through the response cache
+
+    Keys include the trial generator's state, so without RANDOM_SEED
+    every run draws fresh entropy and no entry could ever be hit again;
+    the cache is then bypassed instead of filled with unreachable entries.
+
+    Args:
+        enabled: Requested setting (default: ENABLE_CACHE)
+
+    Returns:
+        True if calls should be cached
+    """
+    global _UNSEEDED_LOGGED
+    if enabled is None:
+        enabled = Config.get_cache_config()['enabled']
+    if not enabled:
+        return False
+    if Config.get_random_seed() is None:
+        if not _UNSEEDED_LOGGED:
+            logger.info("RANDOM_SEED is not set: response cache bypassed (runs are not reproducible)")
+            _UNSEEDED_LOGGED = True
+        return False
+    return True
+
+
+def with_cache(backend: LLMBackend, enabled: Optional[bool] = None) -> LLMBackend:
+    """
+    Wrap a backend in the process-wide response cache
+
+    Args:
+        backend: Backend to wrap
+        enabled: Cache calls (default: ENABLE_CACHE; see cache_enabled)
+
+    Returns:
+        CachedBackend, or backend itself when caching is off
+    """
+    if not cache_enabled(enabled) or isinstance(backend, CachedBackend):
+        return backend
+    return CachedBackend(backend)
+
+
+# Backends selectable by name (LLM_BACKEND)
+BACKENDS: Dict[str, Type[LLMBackend]] = {
+    "mock": MockBackend,
+    "http": HTTPBackend
+}
+
+
+def register_backend(name: str, backend_class: Type[LLMBackend]) -> None:
+    """
+    Make a backend selectable by name
+
+    Args:
+        name: Registry key (LLM_BACKEND value)
+        backend_class: LLMBackend subclass
+    """
+    BACKENDS[name] = backend_class
+
+
+def create_backend(name: Optional[str] = None, cache: Optional[bool] = None, **kwargs) -> LLMBackend:
+    """
+    Backend from the registry, configured from the environment
+
+    Args:
+        name: Registry key (default: Config.get_llm_backend())
+        cache: Serve repeated calls from the response cache (default:
+            ENABLE_CACHE)
+        **kwargs: Constructor arguments overriding the configuration
+
+    Returns:
+        LLMBackend instance
+    """
+    name = name or Config.get_llm_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (available: {', '.join(sorted(BACKENDS))})")
+
+    settings = {"max_concurrency": Config.get_llm_concurrency()}
+    if name == "http":
+        config = Config.get_llm_config()
+        settings.update({
+            "base_url": config['base_url'],
+            "model": config['model'],
+            "api_key": config['api_key'],
+            "pool_size": config['pool_size'],
+            "timeout": config['timeout'],
+            "retries": config['retries'],
+            "backoff": config['backoff']
+        })
+    settings.update(kwargs)
+    logger.debug(f"Creating {name} LLM backend")
+    return with_cache(BACKENDS[name](**settings), cache)
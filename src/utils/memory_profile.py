@@ -0,0 +1,192 @@
+"""
+Memory Profiling for Context Windows Lab
+Per-phase tracemalloc peaks, top allocators and process peak RSS
+Author: Context Windows Lab
+"""
+
+import json
+import logging
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Frames kept per traced allocation (1 attributes each block to one line)
+TRACE_FRAMES = 1
+
+# Leave tracemalloc's own bookkeeping out of the allocator lists
+_IGNORE_TRACEMALLOC = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of this process
+
+    Returns:
+        Bytes, or None where getrusage is unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryTracker:
+    """
+    Records memory use of named phases, keyed by experiment size
+
+    Each phase reports the tracemalloc peak above the memory traced when
+    it started, the net change it left behind, the largest allocation
+    sites it added, and the process peak RSS at its end. Phases may nest;
+    an inner phase's peak is folded into the outer one.
+
+    tracemalloc slows allocation-heavy code noticeably, so trackers are
+    created disabled unless asked for; a disabled tracker's phase() is a
+    no-op.
+    """
+
+    def __init__(self, enabled: bool = True, top_n: int = 5):
+        """
+        Initialize tracker
+
+        Args:
+            enabled: Record phases (tracemalloc starts on the first one)
+            top_n: Allocation sites reported per phase
+        """
+        self.enabled = enabled
+        self.top_n = top_n
+        self.records: List[Dict] = []
+        self._stack: List[Dict] = []
+        self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str, size: Optional[int] = None) -> Iterator[None]:
+        """
+        Track one phase: ``with tracker.phase("llm_call", size=num_docs): ...``
+
+        Args:
+            name: Phase name (generation, context_build, retrieval,
+                llm_call, plotting, ...)
+            size: Experiment size the phase ran at (e.g. document count)
+        """
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracing = True
+
+        # Snapshot first so its own memory is not charged to the phase
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORE_TRACEMALLOC)
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # reset_peak below would drop the enclosing phase's peak so far
+            parent = self._stack[-1]
+            parent["peak_seen"] = max(parent["peak_seen"], peak)
+        frame = {"start": current, "peak_seen": current, "snapshot": snapshot}
+        self._stack.append(frame)
+        tracemalloc.reset_peak()
+
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame["peak_seen"])
+            if self._stack:
+                parent = self._stack[-1]
+                parent["peak_seen"] = max(parent["peak_seen"], peak)
+
+            growth = tracemalloc.take_snapshot().filter_traces(
+                _IGNORE_TRACEMALLOC
+            ).compare_to(frame["snapshot"], "lineno")
+            top = [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_bytes": stat.size_diff,
+                    "count": stat.count_diff
+                }
+                for stat in sorted(growth, key=lambda s: s.size_diff, reverse=True)[:self.top_n]
+                if stat.size_diff > 0
+            ]
+            record = {
+                "phase": name,
+                "size": size,
+                "peak_bytes": peak - frame["start"],
+                "net_bytes": current - frame["start"],
+                "peak_rss_bytes": peak_rss_bytes(),
+                "top_allocators": top
+            }
+            self.records.append(record)
+            logger.debug(
+                f"Memory {name} (size={size}): peak +{record['peak_bytes'] / 1024:.1f} KiB, "
+                f"net {record['net_bytes'] / 1024:+.1f} KiB"
+            )
+
+    def stop(self) -> None:
+        """Stop tracemalloc if this tracker started it"""
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+
+    def scaling_curve(self) -> Dict[str, List[Dict]]:
+        """
+        Bytes-vs-size curve per phase
+
+        Repeated phases at the same size keep their largest peak.
+
+        Returns:
+            Phase -> list of {size, peak_bytes, net_bytes, peak_rss_bytes}
+            sorted by size (phases recorded without a size are left out)
+        """
+        points: Dict[str, Dict[int, Dict]] = {}
+        for record in self.records:
+            if record["size"] is None:
+                continue
+            by_size = points.setdefault(record["phase"], {})
+            best = by_size.get(record["size"])
+            if best is None or record["peak_bytes"] > best["peak_bytes"]:
+                by_size[record["size"]] = {
+                    "size": record["size"],
+                    "peak_bytes": record["peak_bytes"],
+                    "net_bytes": record["net_bytes"],
+                    "peak_rss_bytes": record["peak_rss_bytes"]
+                }
+        return {
+            phase: [by_size[size] for size in sorted(by_size)]
+            for phase, by_size in points.items()
+        }
+
+    def save(self, output_dir: str, filename: str = "memory_scaling.json") -> Path:
+        """
+        Write the phase records and scaling curve as JSON
+
+        Args:
+            output_dir: Directory to save the report
+            filename: Report file name
+
+        Returns:
+            Path of the written file
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        output_file = output_path / filename
+        with open(output_file, 'w') as f:
+            json.dump({
+                "peak_rss_bytes": peak_rss_bytes(),
+                "scaling": self.scaling_curve(),
+                "phases": self.records
+            }, f, indent=2)
+
+        logger.info(f"Memory profile saved to {output_file}")
+        return output_file
@@ -4,12 +4,18 @@ Measures accuracy, latency, token usage, and other performance metrics
 Author: Context Windows Lab
 """
 
-import time
 import logging
-from typing import Callable, Any, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Any, Dict, Iterable, List, Optional, Sequence, Union
 from functools import wraps
 from difflib import SequenceMatcher
 
+import numpy as np
+
+from utils.tokenizers import Tokenizer, create_tokenizer
+from utils.timing import TIMINGS
+from utils.running_stats import RunningStats
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +24,70 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _score_accuracy_chunk(
+    responses: Sequence[str],
+    expected: Sequence[str],
+    threshold: float
+) -> List[float]:
+    """
+    Score a chunk of responses exactly as evaluate_accuracy would
+
+    Expected answers are normalized once and each gets one SequenceMatcher
+    whose second sequence (the indexed side) is analysed once. Responses
+    are rejected early when an upper bound on the similarity ratio (length
+    bound, then quick_ratio) is already below the threshold, so the full
+    ratio() is only computed for plausible matches.
+
+    Args:
+        responses: LLM response texts
+        expected: Expected answers, aligned with responses
+        threshold: Minimum similarity threshold (0-1)
+
+    Returns:
+        Accuracy score per response
+    """
+    normalized: Dict[str, str] = {}
+    matchers: Dict[str, SequenceMatcher] = {}
+    scores = []
+    empty = 0
+
+    for response, answer in zip(responses, expected):
+        if not response or not answer:
+            empty += 1
+            scores.append(0.0)
+            continue
+
+        expected_norm = normalized.get(answer)
+        if expected_norm is None:
+            expected_norm = normalized[answer] = answer.lower().strip()
+        response_norm = response.lower().strip()
+
+        # Exact / substring match
+        if expected_norm in response_norm:
+            scores.append(1.0)
+            continue
+
+        # ratio() <= 2 * min(len) / total; skip hopeless pairs outright
+        total = len(response_norm) + len(expected_norm)
+        if 2.0 * min(len(response_norm), len(expected_norm)) / total < threshold:
+            scores.append(0.0)
+            continue
+
+        matcher = matchers.get(expected_norm)
+        if matcher is None:
+            matcher = matchers[expected_norm] = SequenceMatcher(None, "", expected_norm)
+        matcher.set_seq1(response_norm)
+
+        if matcher.quick_ratio() < threshold:
+            scores.append(0.0)
+        else:
+            scores.append(1.0 if matcher.ratio() >= threshold else 0.0)
+
+    if empty:
+        logger.warning(f"{empty} empty response or expected values")
+    return scores
+
+
 class MetricsEvaluator:
     """Evaluates performance metrics for LLM experiments"""
 
@@ -25,6 +95,39 @@ class MetricsEvaluator:
     CHARS_PER_TOKEN = 4
     COST_PER_1K_TOKENS = 0.0001  # Example cost
 
+    # Active token counter (built from config on first use)
+    _tokenizer: Optional[Tokenizer] = None
+
+    @staticmethod
+    def get_tokenizer() -> Tokenizer:
+        """
+        Token counter used by count_tokens
+
+        Returns:
+            Tokenizer (configured via TOKENIZER, heuristic by default)
+        """
+        if MetricsEvaluator._tokenizer is None:
+            MetricsEvaluator._tokenizer = create_tokenizer()
+        return MetricsEvaluator._tokenizer
+
+    @staticmethod
+    def set_tokenizer(tokenizer: Union[Tokenizer, str, None]) -> Tokenizer:
+        """
+        Replace the token counter
+
+        Args:
+            tokenizer: Tokenizer instance, tokenizer name, or None to
+                rebuild from config
+
+        Returns:
+            The active tokenizer
+        """
+        if tokenizer is None or isinstance(tokenizer, str):
+            tokenizer = create_tokenizer(tokenizer)
+        MetricsEvaluator._tokenizer = tokenizer
+        logger.info(f"Token counter set to {tokenizer.name}")
+        return tokenizer
+
     @staticmethod
     def evaluate_accuracy(response: str, expected: str, threshold: float = 0.6) -> float:
         """
@@ -65,11 +168,61 @@ class MetricsEvaluator:
 
         return accuracy
 
+    @staticmethod
+    def evaluate_accuracy_batch(
+        responses: Sequence[str],
+        expected: Union[str, Sequence[str]],
+        threshold: float = 0.6,
+        workers: int = 1,
+        chunk_size: int = 10000
+    ) -> List[float]:
+        """
+        Calculate accuracy for many responses at once
+
+        Produces the same scores as evaluate_accuracy for every pair.
+
+        Args:
+            responses: LLM response texts
+            expected: One expected answer for all responses, or one per response
+            threshold: Minimum similarity threshold (0-1)
+            workers: Processes used for result sets larger than chunk_size
+            chunk_size: Responses scored per process task
+
+        Returns:
+            List of accuracy scores (0-1)
+        """
+        responses = list(responses)
+        if isinstance(expected, str):
+            expected = [expected] * len(responses)
+        else:
+            expected = list(expected)
+            if len(expected) != len(responses):
+                raise ValueError("responses and expected must have the same length")
+
+        if workers <= 1 or len(responses) <= chunk_size:
+            return _score_accuracy_chunk(responses, expected, threshold)
+
+        starts = range(0, len(responses), chunk_size)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(
+                _score_accuracy_chunk,
+                [responses[i:i + chunk_size] for i in starts],
+                [expected[i:i + chunk_size] for i in starts],
+                [threshold] * len(starts)
+            )
+            scores = [score for chunk in chunks for score in chunk]
+
+        logger.debug(f"Scored {len(scores)} responses with {workers} workers")
+        return scores
+
     @staticmethod
     def measure_latency(func: Callable) -> Callable:
         """
         Decorator to measure function execution time
 
+        Samples are also recorded in the process-wide TIMINGS registry
+        under the function name.
+
         Args:
             func: Function to measure
 
@@ -78,13 +231,11 @@ class MetricsEvaluator:
         """
         @wraps(func)
         def wrapper(*args, **kwargs) -> tuple:
-            logger.debug(f"Measuring latency for {func.__name__}")
-            start_time = time.time()
-
-            result = func(*args, **kwargs)
+            with TIMINGS.timer(func.__name__) as timer:
+                result = func(*args, **kwargs)
 
-            latency = time.time() - start_time
-            logger.info(f"{func.__name__} completed in {latency:.3f}s")
+            latency = timer.elapsed
+            logger.debug(f"{func.__name__} completed in {latency:.6f}s")
 
             return result, latency
 
@@ -93,23 +244,55 @@ class MetricsEvaluator:
     @staticmethod
     def count_tokens(text: str) -> int:
         """
-        Estimate token count from text
+        Count tokens in text with the active tokenizer
 
         Args:
             text: Input text
 
         Returns:
-            Estimated token count
+            Token count
         """
         if not text:
             return 0
 
-        # Rough estimation: ~4 characters per token
-        token_count = len(text) // MetricsEvaluator.CHARS_PER_TOKEN
+        token_count = MetricsEvaluator.get_tokenizer().count(text)
 
-        logger.debug(f"Estimated {token_count} tokens from {len(text)} characters")
+        logger.debug(f"Counted {token_count} tokens from {len(text)} characters")
         return token_count
 
+    @staticmethod
+    def count_tokens_batch(texts: Iterable[str]) -> List[int]:
+        """
+        Count tokens for many texts with the active tokenizer
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Token count per text
+        """
+        return MetricsEvaluator.get_tokenizer().count_batch(texts)
+
+    @staticmethod
+    def token_offset(text: str, char_offset: int) -> int:
+        """
+        Token offset of a character offset with the active tokenizer
+
+        Length-based tokenizers convert the offset directly; others count
+        the tokens of the text before it.
+
+        Args:
+            text: Text the offset points into
+            char_offset: Character offset in text
+
+        Returns:
+            Number of tokens before char_offset
+        """
+        tokenizer = MetricsEvaluator.get_tokenizer()
+        if tokenizer.length_based:
+            return char_offset // tokenizer.chars_per_token
+        return tokenizer.count(text[:char_offset])
+
     @staticmethod
     def calculate_cost(tokens: int, model: str = "default") -> float:
         """
@@ -186,44 +369,136 @@ class MetricsEvaluator:
         return metrics
 
     @staticmethod
-    def aggregate_results(results: list, metric_key: str = "accuracy") -> Dict[str, float]:
+    def evaluate_retrieval_batch(
+        ranked_ids: np.ndarray,
+        relevant: Union[np.ndarray, Sequence[Iterable[int]]],
+        ks: Sequence[int] = (1, 3, 5, 10),
+        per_query: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Ranking metrics for many queries in one vectorized pass
+
+        Relevance is binary. Queries without any relevant document are
+        excluded from the means (their metrics are undefined).
+
+        Args:
+            ranked_ids: (queries, depth) matrix of document IDs in rank
+                order; -1 pads short rankings
+            relevant: Either a boolean matrix (queries, num_docs), a boolean
+                vector (num_docs,) shared by every query, or one collection
+                of relevant IDs per query
+            ks: Cutoffs for recall@k, precision@k and nDCG@k
+            per_query: Also return the per-query metric arrays
+
+        Returns:
+            Dictionary with recall@k, precision@k, ndcg@k, mrr, map and
+            num_queries (plus 'per_query' arrays if requested)
+        """
+        ranked = np.atleast_2d(np.asarray(ranked_ids, dtype=np.int64))
+        num_queries, depth = ranked.shape
+        if depth == 0:
+            # Nothing ranked (empty corpus): one padding slot scores every
+            # metric as 0
+            ranked = np.full((num_queries, 1), -1, dtype=np.int64)
+            depth = 1
+
+        if isinstance(relevant, np.ndarray) and relevant.dtype == bool:
+            relevance = relevant if relevant.ndim == 2 else np.broadcast_to(
+                relevant, (num_queries, len(relevant)))
+        else:
+            id_lists = [np.fromiter(ids, dtype=np.int64) for ids in relevant]
+            if len(id_lists) != num_queries:
+                raise ValueError("Need one relevant-ID collection per query")
+            num_docs = max(
+                int(ranked.max()) + 1,
+                max((int(ids.max()) + 1 for ids in id_lists if len(ids)), default=0)
+            )
+            relevance = np.zeros((num_queries, num_docs), dtype=bool)
+            rows = np.repeat(np.arange(num_queries), [len(ids) for ids in id_lists])
+            relevance[rows, np.concatenate(id_lists) if id_lists else []] = True
+
+        if relevance.shape[1] == 0:
+            relevance = np.zeros((num_queries, 1), dtype=bool)
+
+        # hits[q, r]: the document at rank r is relevant to query q
+        valid = ranked >= 0
+        hits = np.take_along_axis(relevance, np.where(valid, ranked, 0), axis=1) & valid
+        num_relevant = relevance.sum(axis=1)
+        has_relevant = num_relevant > 0
+        safe_relevant = np.maximum(num_relevant, 1)
+
+        cum_hits = np.cumsum(hits, axis=1)
+        discounts = 1.0 / np.log2(np.arange(2, depth + 2))
+        cum_dcg = np.cumsum(hits * discounts, axis=1)
+        cum_ideal = np.cumsum(discounts)
+        ranks = np.arange(1, depth + 1)
+
+        per = {}
+        for k in ks:
+            cut = min(k, depth) - 1
+            per[f"recall@{k}"] = cum_hits[:, cut] / safe_relevant
+            per[f"precision@{k}"] = cum_hits[:, cut] / k
+            ideal = cum_ideal[np.minimum(num_relevant, min(k, depth)) - 1]
+            per[f"ndcg@{k}"] = cum_dcg[:, cut] / np.where(has_relevant, ideal, 1.0)
+
+        first_hit = np.argmax(hits, axis=1)
+        per["mrr"] = np.where(hits.any(axis=1), 1.0 / (first_hit + 1), 0.0)
+        per["map"] = (hits * (cum_hits / ranks)).sum(axis=1) / safe_relevant
+
+        evaluated = int(has_relevant.sum())
+        metrics: Dict[str, Any] = {
+            name: float(values[has_relevant].mean()) if evaluated else 0.0
+            for name, values in per.items()
+        }
+        metrics["num_queries"] = evaluated
+        if per_query:
+            metrics["per_query"] = per
+
+        logger.debug(
+            f"Ranking metrics over {evaluated}/{num_queries} queries - "
+            f"MRR: {metrics['mrr']:.3f}, MAP: {metrics['map']:.3f}"
+        )
+        return metrics
+
+    @staticmethod
+    def aggregate_results(
+        results: Iterable[Dict],
+        metric_key: str = "accuracy",
+        confidence: float = 0.95,
+        resamples: int = 10000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, float]:
         """
         Aggregate multiple experiment results
 
+        Results are consumed one at a time, so a generator works as well as
+        a list.
+
         Args:
-            results: List of result dictionaries
+            results: Result dictionaries (any iterable)
             metric_key: Key of metric to aggregate
+            confidence: Coverage of the bootstrap interval (0-1)
+            resamples: Number of bootstrap resamples
+            rng: NumPy generator for the bootstrap (default: shared root)
 
         Returns:
-            Dictionary with aggregated statistics
+            Dictionary with aggregated statistics and ci_low/ci_high
         """
-        if not results:
+        stats = RunningStats()
+        for r in results:
+            stats.update(r.get(metric_key, 0.0))
+
+        if not stats.count:
             logger.warning("No results to aggregate")
             return {"mean": 0.0, "min": 0.0, "max": 0.0, "std": 0.0}
 
-        values = [r.get(metric_key, 0.0) for r in results]
-
-        # Calculate statistics
-        mean_val = sum(values) / len(values)
-        min_val = min(values)
-        max_val = max(values)
-
-        # Standard deviation
-        variance = sum((x - mean_val) ** 2 for x in values) / len(values)
-        std_val = variance ** 0.5
-
-        stats = {
-            "mean": mean_val,
-            "min": min_val,
-            "max": max_val,
-            "std": std_val,
-            "count": len(values)
-        }
+        summary = stats.to_dict(confidence, resamples, rng)
 
         logger.info(
-            f"Aggregated {len(values)} results - "
-            f"Mean: {mean_val:.3f}, "
-            f"Std: {std_val:.3f}"
+            f"Aggregated {stats.count} results - "
+            f"Mean: {stats.mean:.3f}, "
+            f"Std: {stats.std:.3f}, "
+            f"{confidence:.0%} CI: [{summary['ci_low']:.3f}, {summary['ci_high']:.3f}]"
         )
 
-        return stats
+        return summary
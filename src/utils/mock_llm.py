@@ -2,79 +2,244 @@
 Mock LLM for experiment simulations.
 """
 
-import random
-from typing import Tuple
+import re
+from typing import List, Tuple, Optional, Union
+
+import numpy as np
+
 from utils.metrics import MetricsEvaluator
+from utils.context_buffer import ContextBuffer
+from utils.rng import default_generator
+from utils.clock import Clock, WALL_CLOCK
+
+# Identifies the simulation below (response cache keys); change it when
+# the simulated responses or timings change
+MOCK_MODEL = "mock-prefill-decode-2"
+
+# Simulated serving model: a fixed scheduling overhead, one prefill pass
+# over the context, then one decode step per response token. With these
+# rates experiment 2's expected answer (8 tokens) takes the original
+# 0.1s + 2s per 10K context tokens.
+FIRST_TOKEN_OVERHEAD = 0.02
+PREFILL_TOKENS_PER_SECOND = 5000.0
+DECODE_TOKENS_PER_SECOND = 100.0
+
+# Experiment 3 modes keep their original latency model: 0.1s per response
+# plus 1.5s per 5K context tokens, whatever the response length. The 0.1s
+# is the first-token overhead plus a decode budget split evenly between
+# the response tokens.
+RAG_PREFILL_TOKENS_PER_SECOND = 5000.0 / 1.5
+RAG_RESPONSE_SECONDS = 0.1
+
+# Experiment 3 modes wait a tenth of the simulated latency: speed up for testing
+RAG_TIME_SCALE = 0.1
+
+_TOKEN_PATTERN = re.compile(r"\s*\S+|\s+")
+
 
+def split_tokens(text: str) -> List[str]:
+    """
+    Split a response into streamed tokens (words with leading whitespace)
+
+    Args:
+        text: Response text
+
+    Returns:
+        Tokens; they concatenate back to text
+    """
+    return _TOKEN_PATTERN.findall(text)
 
-def query_llm_mock(context: str, query: str, mode: str = None) -> Tuple[str, float]:
+
+def mock_timeline(
+    context_tokens: int,
+    output_tokens: int,
+    mode: Optional[str] = None
+) -> Tuple[float, float]:
+    """
+    Simulated time to first token and per-token decode time
+
+    Args:
+        context_tokens: Tokens the prefill pass reads
+        output_tokens: Tokens decoded
+        mode: 'full_context'/'rag' select experiment 3's rates; any other
+            mode uses the shared serving model
+
+    Returns:
+        Tuple of (seconds to first token, seconds between later tokens);
+        the full response takes ttft + (output_tokens - 1) * inter_token
+    """
+    if mode in ('full_context', 'rag'):
+        ttft = FIRST_TOKEN_OVERHEAD + context_tokens / RAG_PREFILL_TOKENS_PER_SECOND
+        decode = RAG_RESPONSE_SECONDS - FIRST_TOKEN_OVERHEAD
+        if output_tokens == 0:
+            return ttft + decode, 0.0
+        inter_token = decode / output_tokens
+        return ttft + inter_token, inter_token
+
+    inter_token = 1.0 / DECODE_TOKENS_PER_SECOND
+    ttft = FIRST_TOKEN_OVERHEAD + context_tokens / PREFILL_TOKENS_PER_SECOND
+    if output_tokens:
+        ttft += inter_token
+    return ttft, inter_token
+
+
+def token_waits(ttft: float, inter_token: float, count: int) -> List[float]:
+    """
+    Seconds to wait before each streamed token
+
+    Waits are taken between nanosecond-rounded arrival times, so a clock
+    that rounds each sleep to the nanosecond still ends the stream at the
+    same time as one sleep of the whole response.
+
+    Args:
+        ttft: Seconds to the first token
+        inter_token: Seconds between later tokens
+        count: Number of tokens
+
+    Returns:
+        One wait per token
+    """
+    waits = []
+    previous = 0
+    for index in range(count):
+        arrival = round((ttft + inter_token * index) * 1e9)
+        waits.append((arrival - previous) / 1e9)
+        previous = arrival
+    return waits
+
+
+def query_llm_mock(
+    context: Union[str, ContextBuffer],
+    query: str,
+    mode: str = None,
+    rng: Optional[np.random.Generator] = None,
+    clock: Optional[Clock] = None
+) -> Tuple[str, float]:
     """
     Mock LLM query
 
     Args:
-        context: Context string
+        context: Context string or ContextBuffer
         query: Query string
         mode: 'full_context' or 'rag' (for experiment 3)
+        rng: NumPy generator for this trial (default: shared root generator)
+        clock: Clock the simulated latency is spent on; a VirtualClock
+            advances instead of sleeping (default: wall clock)
 
     Returns:
         Tuple of (response, accuracy)
     """
-    token_count = MetricsEvaluator.count_tokens(context)
+    response, value, wait = simulate_llm_mock(context, query, mode, rng)
+    clock = clock if clock is not None else WALL_CLOCK
+    clock.sleep(wait)
+    return response, value
+
+
+def simulate_llm_mock(
+    context: Union[str, ContextBuffer],
+    query: str,
+    mode: str = None,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[str, float, float]:
+    """
+    Mock LLM outcome without waiting for it
+
+    Shared by query_llm_mock and the mock backends, which spend the
+    returned wait on their clocks.
+
+    Args:
+        context: Context string or ContextBuffer
+        query: Query string
+        mode: None (experiment 4), 'full_context'/'rag' (experiment 3) or
+            'context_size' (experiment 2)
+        rng: NumPy generator for this trial (default: shared root generator)
+
+    Returns:
+        Tuple of (response, accuracy or simulated latency, seconds to wait)
+    """
+    tokens, value, ttft, inter_token = simulate_llm_stream(context, query, mode, rng)
+    return "".join(tokens), value, ttft + inter_token * max(len(tokens) - 1, 0)
+
+
+def simulate_llm_stream(
+    context: Union[str, ContextBuffer],
+    query: str,
+    mode: str = None,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[List[str], float, float, float]:
+    """
+    Mock LLM outcome as a token stream, without waiting for it
+
+    Args:
+        context: Context string or ContextBuffer
+        query: Query string
+        mode: None (experiment 4), 'full_context'/'rag' (experiment 3) or
+            'context_size' (experiment 2)
+        rng: NumPy generator for this trial (default: shared root generator)
+
+    Returns:
+        Tuple of (response tokens, accuracy or simulated latency, seconds
+        to wait for the first token, seconds to wait for each later one)
+    """
+    rng = rng if rng is not None else default_generator()
+    if isinstance(context, ContextBuffer):
+        token_count = context.total_tokens
+    else:
+        token_count = MetricsEvaluator.count_tokens(context)
 
     # Experiment 4 (Context Engineering) accuracy simulation
     if mode is None:
         if token_count < 500:
-            accuracy = random.uniform(0.85, 0.95)
+            accuracy = rng.uniform(0.85, 0.95)
         elif token_count < 1000:
-            accuracy = random.uniform(0.70, 0.85)
+            accuracy = rng.uniform(0.70, 0.85)
         else:
-            accuracy = random.uniform(0.50, 0.70)
+            accuracy = rng.uniform(0.50, 0.70)
         response = f"Query processed with context of {token_count} tokens"
-                return response, accuracy
-            # Experiment 3 (RAG Impact) accuracy simulation
-            elif mode in ['full_context', 'rag']:
-                expected_answer = "כאבי ראש וסחרחורת"
-                contains_answer = expected_answer in context
-        
-                if mode == 'rag':
-                    accuracy_prob = 0.95 if contains_answer else 0.1
-                else:  # full context
-                    accuracy_prob = 0.70 if contains_answer else 0.1
-        
-                if random.random() < accuracy_prob:
-                    response = f"תופעות הלוואי כוללות {expected_answer}"
-                else:
-                    response = "לא נמצא מידע"
-        
-                # Simulate latency - moved from experiment3_rag_impact.py
-                import time
-                simulated_latency = 0.1 + (token_count / 5000) * 1.5
-                time.sleep(simulated_latency / 10) # Speed up for testing
-        
-                return response, simulated_latency
-            # Experiment 2 (Context Size Impact) accuracy simulation
-            elif mode == 'context_size':
-                simulated_latency = 0.1 + (token_count / 10000) * 2  # Linear growth
-                import time
-                time.sleep(simulated_latency)
-        
-                # Simulate accuracy degradation with larger contexts
-                # Accuracy decreases as token count increases
-                if token_count < 1000:
-                    accuracy_prob = 0.95
-                elif token_count < 5000:
-                    accuracy_prob = 0.80
-                elif token_count < 10000:
-                    accuracy_prob = 0.65
-                else:
-                    accuracy_prob = 0.50
-                
-                expected_answer = "The CEO of the company is David Cohen" # Specific for Experiment 2
-        
-                if random.random() < accuracy_prob:
-                    response = expected_answer
-                else:
-                    response = "I'm not sure who the CEO is"
-                
-                return response, simulated_latency    else:
+        # Not timed
+        return split_tokens(response), accuracy, 0.0, 0.0
+    # Experiment 3 (RAG Impact) accuracy simulation
+    elif mode in ['full_context', 'rag']:
+        expected_answer = "כאבי ראש וסחרחורת"
+        contains_answer = expected_answer in context
+
+        if mode == 'rag':
+            accuracy_prob = 0.95 if contains_answer else 0.1
+        else:  # full context
+            accuracy_prob = 0.70 if contains_answer else 0.1
+
+        if rng.random() < accuracy_prob:
+            response = f"תופעות הלוואי כוללות {expected_answer}"
+        else:
+            response = "לא נמצא מידע"
+
+        tokens = split_tokens(response)
+        ttft, inter_token = mock_timeline(token_count, len(tokens), mode)
+        simulated_latency = ttft + inter_token * (len(tokens) - 1)
+        return tokens, simulated_latency, ttft * RAG_TIME_SCALE, inter_token * RAG_TIME_SCALE
+    # Experiment 2 (Context Size Impact) accuracy simulation
+    elif mode == 'context_size':
+        # Simulate accuracy degradation with larger contexts
+        # Accuracy decreases as token count increases
+        if token_count < 1000:
+            accuracy_prob = 0.95
+        elif token_count < 5000:
+            accuracy_prob = 0.80
+        elif token_count < 10000:
+            accuracy_prob = 0.65
+        else:
+            accuracy_prob = 0.50
+
+        expected_answer = "The CEO of the company is David Cohen"  # Specific for Experiment 2
+
+        if rng.random() < accuracy_prob:
+            response = expected_answer
+        else:
+            response = "I'm not sure who the CEO is"
+
+        # Prefill grows linearly with the context; decode does not
+        tokens = split_tokens(response)
+        ttft, inter_token = mock_timeline(token_count, len(tokens))
+        return tokens, ttft + inter_token * (len(tokens) - 1), ttft, inter_token
+    else:
         raise ValueError(f"Unknown mock LLM mode: {mode}")
@@ -0,0 +1,238 @@
+"""
+Mock LLM Server for Context Windows Lab
+OpenAI-compatible HTTP stand-in that answers with the mock LLM
+Author: Context Windows Lab
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.clock import Clock, VirtualClock, WALL_CLOCK
+from utils.metrics import MetricsEvaluator
+from utils.mock_llm import simulate_llm_stream, token_waits
+
+logger = logging.getLogger(__name__)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """
+    POST {prefix}/chat/completions and GET {prefix}/models
+
+    Requests are answered by the mock LLM: the system message is the
+    context, the last user message the query, and the optional 'mode' and
+    'seed' fields select the experiment and the random stream. The mock's
+    latency is spent on the server clock before responding, or, with
+    "stream": true, token by token as chunked server-sent events.
+    """
+
+    # Keep-alive: one connection serves many requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY every
+    # response waits out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    server: "MockLLMServer"
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": self.server.model, "object": "model", "owned_by": "context-windows-lab"}]
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Not found: {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Not found: {self.path}"}})
+            return
+        try:
+            request = json.loads(body)
+            context, query = self._messages(request)
+            mode = request.get("mode")
+            seed = request.get("seed")
+            tokens, value, ttft, inter_token = simulate_llm_stream(
+                context, query, mode, np.random.default_rng(seed)
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": {"message": str(e)}})
+            return
+
+        if request.get("stream"):
+            self._send_stream(request, tokens, value, ttft, inter_token)
+            return
+
+        self.server.clock.sleep(ttft + inter_token * max(len(tokens) - 1, 0))
+        response = "".join(tokens)
+        prompt_tokens = MetricsEvaluator.count_tokens(context) + MetricsEvaluator.count_tokens(query)
+        completion_tokens = MetricsEvaluator.count_tokens(response)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", self.server.model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": response},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            },
+            # Mock accuracy / simulated latency, read by HTTPBackend
+            "lab_value": float(value)
+        })
+
+    @staticmethod
+    def _messages(request: dict) -> Tuple[str, str]:
+        """Context (system messages) and query (last user message)"""
+        messages = request["messages"]
+        context = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        users = [m["content"] for m in messages if m["role"] == "user"]
+        if not users:
+            raise ValueError("No user message")
+        return context, users[-1]
+
+    def _send_stream(self, request: dict, tokens, value: float, ttft: float, inter_token: float) -> None:
+        """Stream tokens as chat.completion.chunk events, waiting between them"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        chunk = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", self.server.model)
+        }
+        waits = token_waits(ttft, inter_token, len(tokens))
+        for index, token in enumerate(tokens):
+            self.server.clock.sleep(waits[index])
+            delta = {"content": token} if index else {"role": "assistant", "content": token}
+            self._send_event({**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._send_event({
+            **chunk,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            # Mock accuracy / simulated latency, read by HTTPBackend
+            "lab_value": float(value)
+        })
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, payload: dict) -> None:
+        self._send_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data: bytes) -> None:
+        """One chunk of a chunked response (empty data ends the body)"""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            # Tell the client not to reuse the socket
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server with the mock's clock and model name"""
+
+    daemon_threads = True
+    # Pending-connection backlog; the socketserver default of 5 resets
+    # connections when a large client pool opens new ones per request
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], clock: Clock = WALL_CLOCK, model: str = "mock"):
+        """
+        Initialize server
+
+        Args:
+            address: (host, port); port 0 picks a free port
+            clock: Clock the mock latency is spent on (a VirtualClock
+                answers immediately, leaving only the network path)
+            model: Model name listed under /models
+        """
+        super().__init__(address, MockLLMHandler)
+        self.clock = clock
+        self.model = model
+
+    @property
+    def base_url(self) -> str:
+        """API root for HTTPBackend (http://host:port/v1)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    clock: Optional[Clock] = None
+) -> MockLLMServer:
+    """
+    Serve in a background thread (stop with server.shutdown())
+
+    Args:
+        host: Interface to bind
+        port: Port (0 picks a free one; see server.base_url)
+        clock: Clock the mock latency is spent on (default: wall clock)
+
+    Returns:
+        Running MockLLMServer
+    """
+    server = MockLLMServer((host, port), clock or WALL_CLOCK)
+    thread = threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True)
+    thread.start()
+    logger.info(f"Mock LLM server listening on {server.base_url}")
+    return server
+
+
+def main():
+    """Run the stand-in server in the foreground"""
+    parser = argparse.ArgumentParser(description='OpenAI-compatible mock LLM server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--clock', choices=['wall', 'virtual'], default='wall',
+                        help='wall: sleep the mock latency; virtual: answer immediately')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    clock = VirtualClock() if args.clock == 'virtual' else WALL_CLOCK
+    server = MockLLMServer((args.host, args.port), clock)
+    logger.info(f"Mock LLM server listening on {server.base_url} (clock: {args.clock})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Needle Embedding Engine for Context Windows Lab
+Inserts facts at fractional depths using a piece table over the base text
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+
+logger = logging.getLogger(__name__)
+
+# Piece = (buffer, start, end); the base text is never copied into pieces
+Piece = Tuple[str, int, int]
+
+
+def depth_grid(step: float = 0.05) -> np.ndarray:
+    """
+    Evenly spaced insertion depths from 0.0 to 1.0 inclusive
+
+    Args:
+        step: Spacing between depths (0.05 gives 21 depths)
+
+    Returns:
+        Array of depths
+    """
+    count = int(round(1.0 / step)) + 1
+    return np.linspace(0.0, 1.0, count)
+
+
+class EmbeddedText:
+    """
+    Piece table describing a base text with needles spliced in
+
+    Holds references into the base text and the needle strings; the
+    combined string is only built by ``render()``.
+    """
+
+    def __init__(self, pieces: List[Piece], needles: List[Dict]):
+        """
+        Initialize embedded text
+
+        Args:
+            pieces: Ordered (buffer, start, end) pieces
+            needles: Placement record per needle, in input order
+        """
+        self.pieces = pieces
+        self.needles = needles
+        self._length = sum(end - start for _, start, end in pieces)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def render(self) -> str:
+        """
+        Materialize the combined text
+
+        Returns:
+            Base text with every needle inserted
+        """
+        return "".join(buffer[start:end] for buffer, start, end in self.pieces)
+
+    @property
+    def char_offsets(self) -> List[int]:
+        """Character offset of each needle in the rendered text"""
+        return [needle["char_offset"] for needle in self.needles]
+
+    @property
+    def token_offsets(self) -> List[int]:
+        """Token offset of each needle in the rendered text (active tokenizer)"""
+        if MetricsEvaluator.get_tokenizer().length_based:
+            # Offsets convert directly; the text is not rendered
+            text = ""
+        else:
+            text = self.render()
+        return [
+            MetricsEvaluator.token_offset(text, offset) for offset in self.char_offsets
+        ]
+
+
+class NeedleEmbedder:
+    """
+    Splices needles into a base text at sentence boundaries
+
+    Sentence boundaries are located once per base text, so sweeping
+    many depths or needle sets over the same haystack is cheap.
+    """
+
+    SEPARATOR = ". "
+
+    def __init__(self, text: str):
+        """
+        Index the sentence boundaries of a base text
+
+        Args:
+            text: Base text (sentences separated by ". ")
+        """
+        self.text = text
+        self.boundaries = self._find_boundaries(text)
+
+    @staticmethod
+    def _find_boundaries(text: str) -> List[int]:
+        """Character offset where each sentence starts"""
+        boundaries = [0]
+        sep = NeedleEmbedder.SEPARATOR
+        idx = text.find(sep)
+        while idx != -1:
+            boundaries.append(idx + len(sep))
+            idx = text.find(sep, idx + len(sep))
+        return boundaries
+
+    @property
+    def num_sentences(self) -> int:
+        """Number of sentences in the base text"""
+        return len(self.boundaries)
+
+    def index_for_depth(self, depth: float) -> int:
+        """
+        Map a fractional depth to a sentence boundary
+
+        Args:
+            depth: 0.0 (before the first sentence) to 1.0 (after the last)
+
+        Returns:
+            Sentence index the needle is inserted before; equal to
+            num_sentences when inserting after the last sentence
+        """
+        if not 0.0 <= depth <= 1.0:
+            raise ValueError(f"Depth must be within [0, 1], got {depth}")
+        return int(round(depth * self.num_sentences))
+
+    def embed_at(
+        self,
+        needles: Sequence[str],
+        indices: Sequence[int]
+    ) -> EmbeddedText:
+        """
+        Insert needles before the given sentence indices
+
+        Args:
+            needles: Needle strings
+            indices: Sentence index per needle (0..num_sentences)
+
+        Returns:
+            EmbeddedText with exact needle offsets
+        """
+        if len(needles) != len(indices):
+            raise ValueError("needles and indices must have the same length")
+
+        text = self.text
+        num_sentences = self.num_sentences
+        order = sorted(range(len(needles)), key=lambda j: indices[j])
+
+        pieces: List[Piece] = []
+        placements: List[Dict] = [None] * len(needles)
+        cursor = 0
+        shift = 0
+
+        for j in order:
+            index = indices[j]
+            if not 0 <= index <= num_sentences:
+                raise ValueError(f"Invalid sentence index: {index}")
+
+            needle = needles[j]
+            if index < num_sentences:
+                boundary = self.boundaries[index]
+                prefix, suffix = "", self.SEPARATOR
+            else:
+                boundary = len(text)
+                prefix, suffix = " ", "."
+
+            if boundary > cursor:
+                pieces.append((text, cursor, boundary))
+                cursor = boundary
+
+            char_offset = boundary + shift + len(prefix)
+            if prefix:
+                pieces.append((prefix, 0, len(prefix)))
+            pieces.append((needle, 0, len(needle)))
+            pieces.append((suffix, 0, len(suffix)))
+            shift += len(prefix) + len(needle) + len(suffix)
+
+            placements[j] = {
+                "needle": needle,
+                "sentence_index": index,
+                "depth": index / num_sentences,
+                "char_offset": char_offset
+            }
+
+        if cursor < len(text):
+            pieces.append((text, cursor, len(text)))
+
+        return EmbeddedText(pieces, placements)
+
+    def embed(
+        self,
+        needles: Union[str, Sequence[str]],
+        depths: Union[float, Sequence[float]]
+    ) -> EmbeddedText:
+        """
+        Insert one or many needles at fractional depths
+
+        Args:
+            needles: Needle string, or one needle per depth
+            depths: Depth or sequence of depths in [0, 1]
+
+        Returns:
+            EmbeddedText with exact needle offsets
+        """
+        if isinstance(depths, (int, float)):
+            depths = [depths]
+        if isinstance(needles, str):
+            needles = [needles] * len(depths)
+
+        indices = [self.index_for_depth(depth) for depth in depths]
+        logger.debug(f"Embedding {len(needles)} needles at indices {indices}")
+        return self.embed_at(needles, indices)
@@ -1,41 +1,121 @@
 import logging
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+
+import numpy as np
+
 from utils.text_generator import TextGenerator
+from utils.hebrew_corpus import HebrewCorpusGenerator
 
 logger = logging.getLogger(__name__)
 
+# Answer sentence appended to medicine documents
+MEDICINE_FACT = "תופעות הלוואי כוללות כאבי ראש וסחרחורת"
+
 
-def generate_documents(num_documents: int, topics: List[str]) -> List[Dict]:
+def annotate_answers(documents: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Append the answer to medicine documents and flag which contain it
+
+    Args:
+        documents: Hebrew document dictionaries (consumed lazily)
+
+    Yields:
+        Documents with a 'contains_answer' flag
+    """
+    for doc in documents:
+        if doc['topic'] == 'medicine':
+            doc['text'] += f" {MEDICINE_FACT}"
+            doc['contains_answer'] = True
+        else:
+            doc['contains_answer'] = False
+        yield doc
+
+
+def generate_documents(
+    num_documents: int,
+    topics: List[str],
+    rng: Optional[np.random.Generator] = None,
+    generator: Optional[HebrewCorpusGenerator] = None
+) -> List[Dict]:
     """
     Generate Hebrew documents with topics
 
     Args:
         num_documents: Total number of documents
         topics: List of topics for document generation
+        rng: NumPy generator (default: shared root generator)
+        generator: Templated corpus engine; when omitted the fixed
+            per-topic sentences are used
 
     Returns:
         List of document dictionaries
     """
     logger.info("Generating Hebrew documents")
 
+    if generator is not None:
+        # The engine places answers itself according to its answer density
+        return generator.generate(num_documents, topics, rng=rng)
+
     documents = TextGenerator.create_hebrew_documents(
         count=num_documents,
-        topics=topics
+        topics=topics,
+        rng=rng
     )
 
     # Add a specific answer to medicine documents
-    medicine_fact = "תופעות הלוואי כוללות כאבי ראש וסחרחורת"
-    for doc in documents:
-        if doc['topic'] == 'medicine':
-            doc['text'] += f" {medicine_fact}"
-            doc['contains_answer'] = True
-        else:
-            doc['contains_answer'] = False
+    documents = list(annotate_answers(documents))
 
     logger.info(f"Generated {len(documents)} documents")
     return documents
 
 
+def rank_documents_batch(
+    documents: List[Dict],
+    queries: List[str],
+    k: Optional[int] = None,
+    chunk_size: int = 1024
+) -> np.ndarray:
+    """
+    Rank documents for many queries by keyword overlap
+
+    Scores match simple_similarity_search: the number of distinct query
+    words present in the document, ties kept in corpus order. An inverted
+    index is built once and scores for a chunk of queries are ranked with
+    one argsort.
+
+    Args:
+        documents: Documents with a 'text' field
+        queries: Search queries
+        k: Ranking depth (default: all documents)
+        chunk_size: Queries scored per score matrix
+
+    Returns:
+        (len(queries), k) matrix of document indices in rank order
+    """
+    num_docs = len(documents)
+    k = num_docs if k is None else min(k, num_docs)
+
+    postings: Dict[str, List[int]] = {}
+    for index, doc in enumerate(documents):
+        for word in set(doc['text'].lower().split()):
+            postings.setdefault(word, []).append(index)
+    postings_arrays = {word: np.asarray(ids) for word, ids in postings.items()}
+
+    ranked = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries[start:start + chunk_size]
+        scores = np.zeros((len(chunk), num_docs), dtype=np.int32)
+        for row, query in enumerate(chunk):
+            for word in set(query.lower().split()):
+                ids = postings_arrays.get(word)
+                if ids is not None:
+                    scores[row, ids] += 1
+        order = np.argsort(-scores, axis=1, kind='stable')
+        ranked[start:start + len(chunk)] = order[:, :k]
+
+    return ranked
+
+
 def simple_similarity_search(documents: List[Dict], query: str, k: int = 3) -> List[Dict]:
     """
     Simple keyword-based similarity search (mock RAG)
@@ -50,18 +130,8 @@ def simple_similarity_search(documents: List[Dict], query: str, k: int = 3) -> L
     """
     logger.debug(f"Performing similarity search for: {query}")
 
-    # Simple keyword matching
-    query_words = set(query.lower().split())
-    scored_docs = []
-
-    for doc in documents:
-        doc_words = set(doc['text'].lower().split())
-        overlap = len(query_words & doc_words)
-        scored_docs.append((overlap, doc))
-
-    # Sort by score and return top-k
-    scored_docs.sort(reverse=True, key=lambda x: x[0])
-    top_docs = [doc for score, doc in scored_docs[:k]]
+    top_indices = rank_documents_batch(documents, [query], k=k)[0]
+    top_docs = [documents[i] for i in top_indices]
 
     logger.debug(f"Retrieved {len(top_docs)} relevant documents")
     return top_docs
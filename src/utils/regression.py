@@ -0,0 +1,312 @@
+"""
+Cross-Run Regression Detection for Context Windows Lab
+Compares experiment result directories metric by metric
+Author: Context Windows Lab
+"""
+
+import json
+import logging
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.running_stats import MAX_BOOTSTRAP_CELLS
+from utils.rng import default_generator
+
+logger = logging.getLogger(__name__)
+
+# Metric kinds: which direction is worse and how the tolerance applies
+#   latency/tokens: relative increase, accuracy: absolute decrease
+KIND_DIRECTIONS = {"latency": 1, "tokens": 1, "accuracy": -1}
+
+# Retrieval metrics compared as accuracy
+_RANKING_PREFIXES = ("recall@", "precision@", "ndcg@", "mrr", "map")
+
+# Timing statistics compared for every phase
+_TIMING_FIELDS = ("mean_ms", "p50_ms", "p90_ms")
+
+
+def metric_kind(name: str) -> Optional[str]:
+    """
+    Kind of a metric from its name
+
+    Args:
+        name: Dotted metric name
+
+    Returns:
+        'latency', 'tokens', 'accuracy', or None if not compared
+    """
+    leaf = name.rsplit(".", 1)[-1]
+    if "latency" in name or leaf.endswith("_ms"):
+        return "latency"
+    if "tokens" in name:
+        return "tokens"
+    if "accuracy" in name or leaf.startswith(_RANKING_PREFIXES):
+        return "accuracy"
+    return None
+
+
+def _rate_samples(stats: Dict) -> np.ndarray:
+    """
+    Observations behind a summary of 0/1 outcomes, or its mean alone
+
+    Binary results are fully described by their count and mean, so the
+    individual outcomes are rebuilt for the significance tests.
+    """
+    count = int(stats.get('count', 0))
+    mean = float(stats['mean'])
+    successes = mean * count
+    binary = stats.get('min', 0.0) >= 0.0 and stats.get('max', 1.0) <= 1.0
+    if count and binary and abs(successes - round(successes)) < 1e-6:
+        successes = int(round(successes))
+        return np.repeat([1.0, 0.0], [successes, count - successes])
+    return np.array([mean])
+
+
+def _read_json(path: Path):
+    """Parsed JSON file, or None if it does not exist"""
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_run(results_dir: str) -> Dict[str, np.ndarray]:
+    """
+    Metric observations of one run
+
+    Per-trial outcomes are used where the result files keep them (or
+    imply them, for binary accuracy); other metrics contribute a single
+    observation per run.
+
+    Args:
+        results_dir: Results root containing experiment1..experiment4
+
+    Returns:
+        Dotted metric name -> observations
+    """
+    root = Path(results_dir)
+    metrics: Dict[str, np.ndarray] = {}
+
+    def add_timings(prefix: str, timings: Optional[Dict]):
+        for phase, stats in (timings or {}).items():
+            for field in _TIMING_FIELDS:
+                metrics[f"{prefix}.timings.{phase}.{field}"] = np.array([stats[field]])
+
+    summary = _read_json(root / "experiment1" / "summary.json")
+    if summary:
+        for position, stats in summary.items():
+            if position not in ("timings", "cache"):
+                metrics[f"experiment1.accuracy.{position}"] = _rate_samples(stats)
+        add_timings("experiment1", summary.get("timings"))
+
+    sizes = _read_json(root / "experiment2" / "metrics.json")
+    for result in sizes or []:
+        size = f"{result['num_docs']}docs"
+        metrics[f"experiment2.latency.{size}"] = np.array([result['latency']])
+        metrics[f"experiment2.accuracy.{size}"] = np.array([result['accuracy']])
+        metrics[f"experiment2.tokens.{size}"] = np.array([result['tokens_used']])
+    summary = _read_json(root / "experiment2" / "summary.json")
+    if summary:
+        metrics["experiment2.average_latency"] = np.array([summary['average_latency']])
+        metrics["experiment2.average_accuracy"] = np.array([summary['average_accuracy']])
+        add_timings("experiment2", summary.get("timings"))
+
+    comparison = _read_json(root / "experiment3" / "comparison.json")
+    if comparison:
+        for mode in ("full", "rag"):
+            for field in ("accuracy", "latency", "tokens"):
+                key = f"{mode}_{field}"
+                if key in comparison:
+                    metrics[f"experiment3.{mode}.{field}"] = np.array([comparison[key]])
+        for name, value in comparison.get("retrieval", {}).items():
+            if name != "num_queries":
+                metrics[f"experiment3.retrieval.{name}"] = np.array([value])
+        add_timings("experiment3", comparison.get("timings"))
+
+    strategies = _read_json(root / "experiment4" / "strategies.json")
+    for strategy, steps in (strategies or {}).items():
+        metrics[f"experiment4.{strategy}.accuracy"] = np.array([s['accuracy'] for s in steps])
+        metrics[f"experiment4.{strategy}.context_tokens"] = np.array([s['context_tokens'] for s in steps])
+    summary = _read_json(root / "experiment4" / "summary.json")
+    if summary:
+        add_timings("experiment4", summary.get("timings"))
+
+    logger.debug(f"Loaded {len(metrics)} metrics from {root}")
+    return metrics
+
+
+def load_runs(results_dirs: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Pooled observations of several runs of the same configuration
+
+    Args:
+        results_dirs: Results roots
+
+    Returns:
+        Metric name -> observations concatenated across runs
+    """
+    pooled: Dict[str, List[np.ndarray]] = {}
+    for results_dir in results_dirs:
+        for name, values in load_run(results_dir).items():
+            pooled.setdefault(name, []).append(values)
+    return {name: np.concatenate(parts) for name, parts in pooled.items()}
+
+
+def permutation_test(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    resamples: int = 10000,
+    rng: Optional[np.random.Generator] = None
+) -> float:
+    """
+    Two-sided permutation test of the difference in means
+
+    All permutations are drawn as one matrix (chunked only when it would
+    exceed MAX_BOOTSTRAP_CELLS) and split at the baseline size.
+
+    Args:
+        baseline: Baseline observations
+        candidate: Candidate observations
+        resamples: Number of random permutations
+        rng: NumPy generator (default: shared root generator)
+
+    Returns:
+        p-value
+    """
+    rng = rng if rng is not None else default_generator()
+    pooled = np.concatenate([baseline, candidate]).astype(np.float64)
+    n, split = len(pooled), len(baseline)
+    observed = abs(candidate.mean() - baseline.mean())
+
+    rows = max(1, MAX_BOOTSTRAP_CELLS // n)
+    extreme = 0
+    for start in range(0, resamples, rows):
+        size = min(rows, resamples - start)
+        shuffled = rng.permuted(np.broadcast_to(pooled, (size, n)), axis=1)
+        deltas = shuffled[:, split:].mean(axis=1) - shuffled[:, :split].mean(axis=1)
+        extreme += int(np.count_nonzero(np.abs(deltas) >= observed - 1e-12))
+    return (extreme + 1) / (resamples + 1)
+
+
+def bootstrap_test(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    resamples: int = 10000,
+    rng: Optional[np.random.Generator] = None
+) -> float:
+    """
+    Two-sided bootstrap test of the difference in means
+
+    Each group is resampled with replacement as one index matrix; the
+    p-value is twice the smaller tail of the resampled deltas around 0.
+
+    Args:
+        baseline: Baseline observations
+        candidate: Candidate observations
+        resamples: Number of bootstrap resamples
+        rng: NumPy generator (default: shared root generator)
+
+    Returns:
+        p-value
+    """
+    rng = rng if rng is not None else default_generator()
+    rows = max(1, MAX_BOOTSTRAP_CELLS // (len(baseline) + len(candidate)))
+    deltas = np.empty(resamples)
+    for start in range(0, resamples, rows):
+        size = min(rows, resamples - start)
+        base = baseline[rng.integers(0, len(baseline), size=(size, len(baseline)))]
+        cand = candidate[rng.integers(0, len(candidate), size=(size, len(candidate)))]
+        deltas[start:start + size] = cand.mean(axis=1) - base.mean(axis=1)
+
+    tail = min(np.mean(deltas <= 0), np.mean(deltas >= 0))
+    return float(min(1.0, 2 * tail))
+
+
+SIGNIFICANCE_TESTS = {"permutation": permutation_test, "bootstrap": bootstrap_test}
+
+
+def compare_runs(
+    baseline: Dict[str, np.ndarray],
+    candidate: Dict[str, np.ndarray],
+    tolerances: Dict[str, float],
+    alpha: float = 0.05,
+    method: str = "permutation",
+    resamples: int = 10000,
+    patterns: Sequence[str] = ("*",),
+    ignore: Sequence[str] = (),
+    min_latency_ms: float = 0.0,
+    rng: Optional[np.random.Generator] = None
+) -> List[Dict]:
+    """
+    Per-metric deltas between two sets of runs, with regressions flagged
+
+    A metric regresses when it moves in its bad direction by more than
+    its kind's tolerance (relative for latency and tokens, absolute for
+    accuracy). When both sides have at least two observations that are
+    not all equal, the change must also be significant at alpha; with
+    single observations the tolerance alone decides. Latency changes
+    smaller than min_latency_ms are treated as timer noise.
+
+    Args:
+        baseline: Baseline metric observations (load_runs)
+        candidate: Candidate metric observations (load_runs)
+        tolerances: Kind -> tolerance
+        alpha: Significance level
+        method: 'permutation' or 'bootstrap'
+        resamples: Resamples per significance test
+        patterns: fnmatch patterns selecting metric names
+        ignore: fnmatch patterns of metric names to skip
+        min_latency_ms: Smallest absolute latency increase that can regress
+        rng: NumPy generator (default: shared root generator)
+
+    Returns:
+        List of comparison dictionaries, one per shared metric
+    """
+    if method not in SIGNIFICANCE_TESTS:
+        raise ValueError(f"Unknown significance test: {method}")
+    test = SIGNIFICANCE_TESTS[method]
+
+    comparisons = []
+    for name in sorted(set(baseline) & set(candidate)):
+        kind = metric_kind(name)
+        if kind is None or not any(fnmatch(name, p) for p in patterns):
+            continue
+        if any(fnmatch(name, p) for p in ignore):
+            continue
+
+        base, cand = baseline[name], candidate[name]
+        base_mean, cand_mean = float(base.mean()), float(cand.mean())
+        delta = cand_mean - base_mean
+        relative = delta / abs(base_mean) if base_mean else (0.0 if not delta else float("inf"))
+
+        p_value = None
+        testable = min(len(base), len(cand)) >= 2 and np.ptp(np.concatenate([base, cand])) > 0
+        if testable:
+            p_value = test(base, cand, resamples, rng)
+
+        direction = KIND_DIRECTIONS[kind]
+        change = relative if kind in ("latency", "tokens") else delta
+        regression = change * direction > tolerances[kind] and (p_value is None or p_value < alpha)
+        if kind == "latency":
+            # Timing fields are in ms, experiment latencies in seconds
+            delta_ms = delta if name.endswith("_ms") else delta * 1000
+            regression = regression and delta_ms >= min_latency_ms
+
+        comparisons.append({
+            "metric": name,
+            "kind": kind,
+            "baseline_mean": base_mean,
+            "candidate_mean": cand_mean,
+            "delta": delta,
+            "relative_delta": relative,
+            "baseline_n": len(base),
+            "candidate_n": len(cand),
+            "p_value": p_value,
+            "tolerance": tolerances[kind],
+            "regression": bool(regression)
+        })
+
+    return comparisons
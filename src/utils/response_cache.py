@@ -0,0 +1,398 @@
+"""
+LLM Response Cache for Context Windows Lab
+Content-addressed memory LRU and SQLite tiers for backend responses
+Author: Context Windows Lab
+"""
+
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.config import Config
+from utils.context_buffer import ContextBuffer
+
+logger = logging.getLogger(__name__)
+
+# Cached call: (response, value, latency seconds, request bytes,
+# generator state after the call or None, (token, arrival ns) pairs of a
+# streamed call or None)
+Entry = Tuple[str, float, float, int, Optional[str], Optional[List[Tuple[str, int]]]]
+
+# Approximate per-entry overhead of the memory tier (key, tuple, floats)
+ENTRY_OVERHEAD = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    value REAL,
+    latency REAL NOT NULL,
+    request_bytes INTEGER NOT NULL,
+    rng_state TEXT,
+    tokens TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def rng_state(rng: Optional[np.random.Generator]) -> Optional[str]:
+    """
+    Serialized generator state (restore with restore_rng_state)
+
+    Args:
+        rng: NumPy generator, or None
+
+    Returns:
+        JSON string, or None for no generator
+    """
+    if rng is None:
+        return None
+    return json.dumps(rng.bit_generator.state, sort_keys=True)
+
+
+def restore_rng_state(rng: Optional[np.random.Generator], state: Optional[str]) -> None:
+    """Put a generator back into a state saved by rng_state"""
+    if rng is not None and state is not None:
+        rng.bit_generator.state = json.loads(state)
+
+
+def rng_fingerprint(rng: Optional[np.random.Generator]) -> Optional[str]:
+    """
+    Identity of a generator's current state
+
+    Two generators with the same fingerprint produce the same draws, so a
+    response computed from one can stand in for the other.
+
+    Args:
+        rng: NumPy generator, or None
+
+    Returns:
+        Hex digest, or None for no generator (not reproducible)
+    """
+    state = rng_state(rng)
+    if state is None:
+        return None
+    return hashlib.sha256(state.encode("utf-8")).hexdigest()
+
+
+def _encoded_spans(context: Union[str, ContextBuffer]) -> Iterator[bytes]:
+    """UTF-8 bytes of a context, span by span for a ContextBuffer"""
+    if not isinstance(context, ContextBuffer):
+        yield context.encode("utf-8")
+        return
+    separator = context.separator.encode("utf-8")
+    for i in range(context.num_spans):
+        if i:
+            yield separator
+        yield context.span(i).encode("utf-8")
+
+
+def cache_key(
+    backend: str,
+    model: str,
+    context: Union[str, ContextBuffer],
+    query: str,
+    mode: Optional[str],
+    seed: Optional[str]
+) -> Tuple[str, int]:
+    """
+    Content address of one LLM call
+
+    Fields are hashed length-prefixed, so no two field combinations
+    collide by concatenation. The context is prefixed with its length in
+    characters (which fixes its UTF-8 extent) and hashed span by span, so
+    a ContextBuffer is never joined; a string and a buffer with the same
+    text get the same key.
+
+    Args:
+        backend: Backend name
+        model: Model identifier
+        context: Context string or ContextBuffer
+        query: Query string
+        mode: Experiment mode
+        seed: Random stream fingerprint (rng_fingerprint)
+
+    Returns:
+        Tuple of (hex key, request bytes)
+    """
+    digest = hashlib.sha256()
+
+    def update(field: bytes) -> None:
+        digest.update(len(field).to_bytes(8, "little"))
+        digest.update(field)
+
+    update(backend.encode("utf-8"))
+    update(model.encode("utf-8"))
+
+    digest.update(len(context).to_bytes(8, "little"))
+    context_bytes = 0
+    for chunk in _encoded_spans(context):
+        digest.update(chunk)
+        context_bytes += len(chunk)
+
+    query_bytes = query.encode("utf-8")
+    for field in (query_bytes, (mode or "").encode("utf-8"), (seed or "").encode("utf-8")):
+        update(field)
+    return digest.hexdigest(), context_bytes + len(query_bytes)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses keyed by cache_key
+
+    The memory tier is an LRU bounded by approximate bytes. The optional
+    SQLite tier persists across runs: it is bounded by the bytes of its
+    stored responses (least recently read rows are evicted first) and
+    entries older than the TTL are ignored and purged. Disk hits are
+    promoted to memory. Safe to share between threads.
+
+    The disk byte count is tracked in-process, so the cap is enforced
+    per process when several share one file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        memory_bytes: int = 64 * 1024 * 1024,
+        disk_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600
+    ):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite file (None for memory only)
+            memory_bytes: Budget of the memory tier
+            disk_bytes: Budget of the SQLite tier
+            ttl_seconds: Age after which disk entries expire
+        """
+        self.path = Path(path) if path else None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[Entry, int]]" = OrderedDict()
+        self.memory_held = 0
+        self.disk_held = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path is not None:
+            self._open()
+
+    def _open(self) -> None:
+        """Open the SQLite tier and drop expired rows"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "tokens" not in columns:
+            # Caches written before streaming support
+            self._db.execute("ALTER TABLE responses ADD COLUMN tokens TEXT")
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        self._db.commit()
+        self.disk_held = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        logger.debug(
+            f"Response cache {self.path}: {self.disk_held / 1024:.1f} KiB, "
+            f"{expired} expired entries dropped"
+        )
+
+    def get(self, key: str) -> Optional[Entry]:
+        """
+        Cached call for a key
+
+        Args:
+            key: cache_key digest
+
+        Returns:
+            Entry, or None on a miss
+        """
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return item[0]
+
+            if self._db is not None:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT response, value, latency, request_bytes, rng_state, tokens FROM responses "
+                    "WHERE key = ? AND created >= ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    entry = (
+                        row[0], math.nan if row[1] is None else row[1], row[2], row[3], row[4],
+                        None if row[5] is None else [tuple(pair) for pair in json.loads(row[5])]
+                    )
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        key: str,
+        response: str,
+        value: float,
+        latency: float,
+        request_bytes: int,
+        rng_state: Optional[str] = None,
+        tokens: Optional[Sequence[Tuple[str, int]]] = None
+    ) -> None:
+        """
+        Store a call in both tiers
+
+        Args:
+            key: cache_key digest
+            response: Response text
+            value: Backend value (accuracy or simulated latency; may be NaN)
+            latency: Measured latency (seconds)
+            request_bytes: Size of the request the entry saves
+            rng_state: Generator state after the call (rng_state()), so
+                a hit leaves the generator where the call would have
+            tokens: (token, arrival ns) pairs of a streamed call
+        """
+        tokens = None if tokens is None else [(token, int(arrival)) for token, arrival in tokens]
+        entry = (response, float(value), float(latency), int(request_bytes), rng_state, tokens)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is None:
+                return
+
+            tokens_json = None if tokens is None else json.dumps(tokens, ensure_ascii=False)
+            size = (
+                len(response.encode("utf-8")) + len(key) + len(rng_state or "")
+                + len((tokens_json or "").encode("utf-8"))
+            )
+            now = time.time()
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, response, value, latency, request_bytes, rng_state, tokens, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response, None if math.isnan(entry[1]) else entry[1],
+                 entry[2], entry[3], rng_state, tokens_json, size, now, now)
+            )
+            self.disk_held += size - (old[0] if old else 0)
+            self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key: str, entry: Entry) -> None:
+        """Insert into the memory tier, evicting least recently used entries"""
+        nbytes = len(entry[0]) + len(key) + len(entry[4] or "") + ENTRY_OVERHEAD
+        if entry[5] is not None:
+            nbytes += sum(len(token) + ENTRY_OVERHEAD // 4 for token, _ in entry[5])
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.memory_held -= old[1]
+        if nbytes > self.memory_bytes:
+            return
+        self._memory[key] = (entry, nbytes)
+        self.memory_held += nbytes
+        while self.memory_held > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self.memory_held -= evicted
+            self.evictions += 1
+
+    def _evict_disk(self) -> None:
+        """Delete least recently read rows until the disk tier fits"""
+        while self.disk_held > self.disk_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.disk_held = 0
+                return
+            for key, size in rows:
+                if self.disk_held <= self.disk_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.disk_held -= size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry in both tiers (statistics are kept)"""
+        with self._lock:
+            self._memory.clear()
+            self.memory_held = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self.disk_held = 0
+
+    def close(self) -> None:
+        """Close the SQLite tier"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache statistics
+
+        Returns:
+            Dictionary with per-tier hits, misses, hit ratio and bytes held
+        """
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries_in_memory": len(self._memory),
+            "memory_bytes_held": self.memory_held,
+            "disk_bytes_held": self.disk_held
+        }
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Process-wide response cache, opened on first use
+
+    Returns:
+        ResponseCache configured from CACHE_* settings
+    """
+    global _RESPONSE_CACHE
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            config = Config.get_cache_config()
+            _RESPONSE_CACHE = ResponseCache(
+                path=config['path'],
+                memory_bytes=config['memory_bytes'],
+                disk_bytes=config['disk_bytes'],
+                ttl_seconds=config['ttl_seconds']
+            )
+        return _RESPONSE_CACHE
@@ -0,0 +1,146 @@
+"""
+Random Number Generation Context for Context Windows Lab
+Derives independent, order-free random streams from a single seed
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Stream identifiers used as the first element of derived spawn keys
+CORPUS_STREAM = 0
+TRIAL_STREAM = 1
+BOOTSTRAP_STREAM = 2
+
+
+class RNGContext:
+    """
+    Explicit random state passed through generators, mocks and strategies
+
+    Child contexts are derived from the seed and a key path rather than
+    from shared mutable state, so a trial's random stream depends only on
+    its index: results are identical whatever order or number of workers
+    the trials run on.
+    """
+
+    def __init__(self, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = ()):
+        """
+        Initialize context
+
+        Args:
+            seed: Root seed (None draws fresh OS entropy once)
+            spawn_key: Key path identifying this stream below the root
+        """
+        self.seed_sequence = np.random.SeedSequence(seed, spawn_key=spawn_key)
+        self._generator = None
+
+    @staticmethod
+    def from_config() -> "RNGContext":
+        """Create a root context seeded from RANDOM_SEED"""
+        return RNGContext(Config.get_random_seed())
+
+    @property
+    def entropy(self) -> int:
+        """Root entropy shared by every derived context"""
+        return self.seed_sequence.entropy
+
+    @property
+    def spawn_key(self) -> Tuple[int, ...]:
+        """Key path of this context below the root"""
+        return tuple(self.seed_sequence.spawn_key)
+
+    @property
+    def key(self) -> Tuple[int, Tuple[int, ...]]:
+        """Hashable identity of this stream"""
+        return self.entropy, self.spawn_key
+
+    @property
+    def generator(self) -> np.random.Generator:
+        """NumPy generator for this stream (created on first use)"""
+        if self._generator is None:
+            self._generator = np.random.default_rng(self.seed_sequence)
+        return self._generator
+
+    def derive(self, *keys: int) -> "RNGContext":
+        """
+        Derive a child context addressed by a key path
+
+        Args:
+            keys: Integers appended to this context's spawn key
+
+        Returns:
+            Child RNGContext; the same keys always give the same stream
+        """
+        return RNGContext(self.entropy, self.spawn_key + tuple(keys))
+
+    def trial(self, *index: int) -> np.random.Generator:
+        """
+        Generator for one trial, independent of every other trial
+
+        Args:
+            index: Trial index (or index path, e.g. strategy and action)
+
+        Returns:
+            NumPy generator for the trial
+        """
+        return self.derive(TRIAL_STREAM, *index).generator
+
+    def corpus(self, *index: int) -> np.random.Generator:
+        """
+        Generator for corpus construction
+
+        Args:
+            index: Optional corpus index path
+
+        Returns:
+            NumPy generator for the corpus
+        """
+        return self.derive(CORPUS_STREAM, *index).generator
+
+    def bootstrap(self, *index: int) -> np.random.Generator:
+        """
+        Generator for bootstrap resampling of results
+
+        Args:
+            index: Optional index path (e.g. context size)
+
+        Returns:
+            NumPy generator for the bootstrap
+        """
+        return self.derive(BOOTSTRAP_STREAM, *index).generator
+
+    def spawn(self, n: int) -> List["RNGContext"]:
+        """
+        Derive n consecutive child contexts
+
+        Args:
+            n: Number of children
+
+        Returns:
+            List of child contexts, addressed by position
+        """
+        return [self.derive(i) for i in range(n)]
+
+
+# Process-wide root context, created on first use
+_root: Optional[RNGContext] = None
+
+
+def root_context() -> RNGContext:
+    """Return the process-wide root context seeded from RANDOM_SEED"""
+    global _root
+    if _root is None:
+        _root = RNGContext.from_config()
+        logger.debug(f"Root RNG context entropy: {_root.entropy}")
+    return _root
+
+
+def default_generator() -> np.random.Generator:
+    """Shared fallback generator for callers that pass no explicit rng"""
+    return root_context().generator
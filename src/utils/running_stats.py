@@ -0,0 +1,291 @@
+"""
+Streaming Statistics for Context Windows Lab
+Online moments with merging, and vectorized bootstrap confidence intervals
+Author: Context Windows Lab
+"""
+
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.rng import default_generator
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on resample-matrix cells generated in one NumPy call
+MAX_BOOTSTRAP_CELLS = 1 << 24
+
+
+def _as_array(values: Iterable[float]) -> np.ndarray:
+    """Float64 array from an array, sequence or iterator"""
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.fromiter(values, dtype=np.float64)
+
+
+def bootstrap_ci(
+    values: Iterable[float],
+    confidence: float = 0.95,
+    resamples: int = 10000,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[float, float]:
+    """
+    Percentile bootstrap confidence interval of the mean
+
+    All resamples are drawn as one index matrix (chunked only when it
+    would exceed MAX_BOOTSTRAP_CELLS) and averaged along one axis.
+
+    Args:
+        values: Observations
+        confidence: Interval coverage (0-1)
+        resamples: Number of bootstrap resamples
+        rng: NumPy generator (default: shared root generator)
+
+    Returns:
+        Tuple of (low, high)
+    """
+    values = _as_array(values)
+    if len(values) == 0:
+        return 0.0, 0.0
+    rng = rng if rng is not None else default_generator()
+
+    n = len(values)
+    rows = max(1, MAX_BOOTSTRAP_CELLS // n)
+    means = np.empty(resamples)
+    for start in range(0, resamples, rows):
+        size = min(rows, resamples - start)
+        indices = rng.integers(0, n, size=(size, n))
+        means[start:start + size] = values[indices].mean(axis=1)
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def bootstrap_proportion_ci(
+    successes: int,
+    count: int,
+    confidence: float = 0.95,
+    resamples: int = 10000,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[float, float]:
+    """
+    Bootstrap confidence interval of a success rate from counts alone
+
+    Resampling n binary outcomes with replacement gives Binomial(n, p)
+    successes, so the bootstrap distribution is drawn directly without
+    the individual trials.
+
+    Args:
+        successes: Number of successes
+        count: Number of trials
+        confidence: Interval coverage (0-1)
+        resamples: Number of bootstrap resamples
+        rng: NumPy generator (default: shared root generator)
+
+    Returns:
+        Tuple of (low, high)
+    """
+    if count == 0:
+        return 0.0, 0.0
+    rng = rng if rng is not None else default_generator()
+
+    rates = rng.binomial(count, successes / count, size=resamples) / count
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(rates, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+class RunningStats:
+    """
+    Online mean/variance/min/max (Welford) that can be merged
+
+    Feed values one at a time or in batches, and combine instances built
+    in other threads or processes with merge(). A bounded reservoir sample
+    is kept for bootstrap intervals of non-binary metrics (exact while the
+    reservoir holds every value, rescaled to the full count beyond that);
+    binary metrics (accuracy) are bootstrapped from the success count alone.
+    """
+
+    def __init__(self, reservoir_size: int = 4096, seed: int = 0):
+        """
+        Initialize statistics
+
+        Args:
+            reservoir_size: Values kept for bootstrapping non-binary data
+            seed: Seed of the reservoir sampler
+        """
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.binary = True
+        self.reservoir_size = reservoir_size
+        self._reservoir: List[float] = []
+        self._sampler = random.Random(seed)
+
+    def update(self, value: float) -> None:
+        """
+        Add one observation
+
+        Args:
+            value: Observation
+        """
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value != 0.0 and value != 1.0:
+            self.binary = False
+
+        # Reservoir sampling (Algorithm R)
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir.append(value)
+        else:
+            slot = self._sampler.randrange(self.count)
+            if slot < self.reservoir_size:
+                self._reservoir[slot] = value
+
+    def update_batch(self, values: Iterable[float]) -> None:
+        """
+        Add many observations
+
+        Args:
+            values: Observations
+        """
+        values = _as_array(values)
+        if len(values) == 0:
+            return
+
+        batch = RunningStats(self.reservoir_size, self._sampler.randrange(1 << 30))
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch._m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.binary = bool(np.all((values == 0.0) | (values == 1.0)))
+        if len(values) <= self.reservoir_size:
+            batch._reservoir = values.tolist()
+        else:
+            batch._reservoir = batch._sampler.sample(values.tolist(), self.reservoir_size)
+        self.merge(batch)
+
+    def merge(self, other: "RunningStats") -> None:
+        """
+        Combine another instance's observations into this one
+
+        Uses the pairwise update of Chan et al. for the moments.
+
+        Args:
+            other: Statistics over a disjoint set of observations
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max, self.binary = other.min, other.max, other.binary
+            self._reservoir = list(other._reservoir)
+            return
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+
+        # Keep reservoir shares proportional to the observation counts
+        combined = self._reservoir + other._reservoir
+        if len(combined) > self.reservoir_size:
+            own = round(self.reservoir_size * self.count / total)
+            own = min(own, len(self._reservoir))
+            theirs = min(self.reservoir_size - own, len(other._reservoir))
+            combined = (self._sampler.sample(self._reservoir, own)
+                        + self._sampler.sample(other._reservoir, theirs))
+        self._reservoir = combined
+
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.binary = self.binary and other.binary
+
+    @property
+    def variance(self) -> float:
+        """Population variance"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation"""
+        return self.variance ** 0.5
+
+    @property
+    def sample_variance(self) -> float:
+        """Unbiased sample variance"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def confidence_interval(
+        self,
+        confidence: float = 0.95,
+        resamples: int = 10000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[float, float]:
+        """
+        Bootstrap confidence interval of the mean
+
+        Args:
+            confidence: Interval coverage (0-1)
+            resamples: Number of bootstrap resamples
+            rng: NumPy generator (default: shared root generator)
+
+        Returns:
+            Tuple of (low, high)
+        """
+        if self.binary:
+            successes = int(round(self.mean * self.count))
+            return bootstrap_proportion_ci(successes, self.count, confidence, resamples, rng)
+        sample = np.asarray(self._reservoir)
+        low, high = bootstrap_ci(sample, confidence, resamples, rng)
+        if len(sample) == self.count:
+            return low, high
+
+        # Reservoir is a subsample: rescale the spread of its resampled
+        # means from m to n observations around the exact running mean
+        scale = (len(sample) / self.count) ** 0.5
+        center = float(sample.mean())
+        return self.mean + (low - center) * scale, self.mean + (high - center) * scale
+
+    def to_dict(
+        self,
+        confidence: float = 0.95,
+        resamples: int = 10000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, float]:
+        """
+        Summary statistics with a bootstrap confidence interval
+
+        Returns:
+            Dictionary with mean, min, max, std, count, ci_low, ci_high
+            and confidence
+        """
+        if self.count == 0:
+            return {"mean": 0.0, "min": 0.0, "max": 0.0, "std": 0.0, "count": 0}
+
+        ci_low, ci_high = self.confidence_interval(confidence, resamples, rng)
+        return {
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "std": self.std,
+            "count": self.count,
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+            "confidence": confidence
+        }
@@ -4,9 +4,15 @@ Generates synthetic documents and Hebrew text for experiments
 Author: Context Windows Lab
 """
 
-import random
 import logging
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Iterator, Union
+
+import numpy as np
+
+from utils.rng import default_generator
+from utils.needle_embedding import NeedleEmbedder, EmbeddedText
+from utils.context_buffer import ContextBuffer
+from utils.document_table import DocumentTable
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +34,10 @@ class TextGenerator:
         "integration", "deployment", "monitoring", "validation", "testing"
     ]
 
+    # Sentence length bounds (inclusive) for synthetic filler text
+    MIN_SENTENCE_WORDS = 10
+    MAX_SENTENCE_WORDS = 15
+
     # Hebrew filler text samples by topic
     HEBREW_TOPICS = {
         "technology": [
@@ -54,16 +64,21 @@ class TextGenerator:
     }
 
     @staticmethod
-    def generate_action_output(action_num: int) -> str:
+    def generate_action_output(
+        action_num: int,
+        rng: Optional[np.random.Generator] = None
+    ) -> str:
         """
         Generate output for a simulated action
 
         Args:
             action_num: Action number
+            rng: NumPy generator (default: shared root generator)
 
         Returns:
             Generated output text
         """
+        rng = rng if rng is not None else default_generator()
         outputs = [
             f"Action {action_num}: Retrieved data from database. Found 15 records.",
             f"Action {action_num}: Processed user request. Status: Success.",
@@ -71,43 +86,164 @@ class TextGenerator:
             f"Action {action_num}: Updated system configuration.",
             f"Action {action_num}: Analyzed performance data.",
         ]
-        return random.choice(outputs) + " " + TextGenerator.generate_filler_text(50)
+        filler = TextGenerator.generate_filler_batch(1, 50, rng=rng)[0]
+        return outputs[rng.integers(len(outputs))] + " " + filler
 
     @staticmethod
-    def generate_filler_text(words: int) -> str:
+    def generate_filler_text(
+        words: int,
+        rng: Optional[np.random.Generator] = None
+    ) -> str:
         """
         Generate synthetic filler text
 
         Args:
             words: Number of words to generate
+            rng: NumPy generator (default: shared root generator)
 
         Returns:
             Generated text string
         """
         logger.debug(f"Generating {words} words of filler text")
+        return TextGenerator.generate_filler_batch(1, words, rng=rng)[0]
+
+    @staticmethod
+    def _split_streams(rng: np.random.Generator, count: int) -> List[np.random.Generator]:
+        """
+        Derive independent child generators from one generator
+
+        Drawing each quantity from its own stream keeps generation
+        prefix-stable: the first k documents of a corpus are the same
+        whatever the total document count.
+
+        Args:
+            rng: Parent generator (advanced by a fixed amount)
+            count: Number of child generators
+
+        Returns:
+            List of child generators
+        """
+        entropy = rng.integers(0, 2**32, size=4, dtype=np.uint64).tolist()
+        children = np.random.SeedSequence(entropy).spawn(count)
+        return [np.random.default_rng(child) for child in children]
+
+    @staticmethod
+    def _draw_filler_indices(
+        num_docs: int,
+        words: int,
+        word_rng: np.random.Generator,
+        length_rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw vocabulary indices and sentence boundaries for a batch
+
+        Args:
+            num_docs: Number of documents in the batch
+            words: Words per document
+            word_rng: NumPy generator for word indices
+            length_rng: NumPy generator for sentence lengths
+
+        Returns:
+            Tuple of (word index matrix, sentence-start mask), both
+            shaped (num_docs, words)
+        """
+        word_ids = word_rng.integers(
+            0, len(TextGenerator.FILLER_WORDS), size=(num_docs, words)
+        )
+
+        # Enough sentence lengths to cover every document, cut at `words`
+        max_sentences = -(-words // TextGenerator.MIN_SENTENCE_WORDS)
+        lengths = length_rng.integers(
+            TextGenerator.MIN_SENTENCE_WORDS,
+            TextGenerator.MAX_SENTENCE_WORDS + 1,
+            size=(num_docs, max_sentences)
+        )
+        starts = np.cumsum(lengths, axis=1) - lengths
+
+        sentence_start = np.zeros((num_docs, words + 1), dtype=bool)
+        rows = np.broadcast_to(np.arange(num_docs)[:, None], starts.shape)
+        sentence_start[rows, np.minimum(starts, words)] = True
+        return word_ids, sentence_start[:, :words]
 
-        text_words = []
-        for _ in range(words):
-            word = random.choice(TextGenerator.FILLER_WORDS)
-            text_words.append(word)
+    @staticmethod
+    def _filler_token_table() -> np.ndarray:
+        """
+        Build the rendered-token lookup table for the filler vocabulary
 
-        # Create sentences (10-15 words per sentence)
-        sentences = []
-        for i in range(0, len(text_words), random.randint(10, 15)):
-            sentence_words = text_words[i:i+random.randint(10, 15)]
-            if sentence_words:
-                sentence = " ".join(sentence_words).capitalize() + "."
-                sentences.append(sentence)
+        Each word has four variants indexed by ``word_id * 4 + flags``
+        where bit 0 marks a sentence start (capitalized) and bit 1 marks
+        a sentence end (trailing period).
 
-        result = " ".join(sentences)
-        logger.info(f"Generated filler text with {len(result.split())} words")
-        return result
+        Returns:
+            Object array of rendered tokens
+        """
+        table = []
+        for word in TextGenerator.FILLER_WORDS:
+            capitalized = word.capitalize()
+            table.extend([word, capitalized, word + ".", capitalized + "."])
+        return np.array(table, dtype=object)
+
+    @staticmethod
+    def _render_filler(
+        word_ids: np.ndarray,
+        sentence_start: np.ndarray
+    ) -> List[str]:
+        """
+        Render index matrices into filler text, one join per document
+
+        Args:
+            word_ids: Word index matrix (num_docs, words)
+            sentence_start: Sentence-start mask (num_docs, words)
+
+        Returns:
+            List of document texts
+        """
+        if word_ids.shape[1] == 0:
+            return ["" for _ in range(word_ids.shape[0])]
+
+        sentence_end = np.zeros_like(sentence_start)
+        sentence_end[:, :-1] = sentence_start[:, 1:]
+        sentence_end[:, -1] = True
+
+        codes = word_ids * 4 + sentence_start + sentence_end * 2
+        tokens = _FILLER_TOKENS[codes]
+        return [" ".join(row) for row in tokens.tolist()]
+
+    @staticmethod
+    def generate_filler_batch(
+        num_docs: int,
+        words: int,
+        rng: Optional[np.random.Generator] = None
+    ) -> List[str]:
+        """
+        Generate filler text for many documents in one vectorized pass
+
+        Word indices and sentence lengths (10-15 words) are drawn for the
+        whole batch at once; each document is then built with a single join.
+
+        Args:
+            num_docs: Number of documents to generate
+            words: Words per document
+            rng: NumPy generator (default: shared root generator)
+
+        Returns:
+            List of generated text strings
+        """
+        rng = rng if rng is not None else default_generator()
+        word_rng, length_rng = TextGenerator._split_streams(rng, 2)
+        word_ids, sentence_start = TextGenerator._draw_filler_indices(
+            num_docs, words, word_rng, length_rng
+        )
+        texts = TextGenerator._render_filler(word_ids, sentence_start)
+
+        logger.debug(f"Generated {num_docs} filler texts with {words} words each")
+        return texts
 
     @staticmethod
     def embed_critical_fact(
         text: str,
         fact: str,
-        position: str
+        position: Union[str, float]
     ) -> Tuple[str, int]:
         """
         Embed a critical fact at specified position
@@ -115,15 +251,15 @@ class TextGenerator:
         Args:
             text: Base text to embed fact into
             fact: Critical fact to embed
-            position: 'start', 'middle', or 'end'
+            position: 'start', 'middle', 'end', or a fractional depth (0-1)
 
         Returns:
             Tuple of (modified text, fact position index)
         """
         logger.debug(f"Embedding fact at position: {position}")
 
-        sentences = text.split(". ")
-        total_sentences = len(sentences)
+        embedder = NeedleEmbedder(text)
+        total_sentences = embedder.num_sentences
 
         if position == "start":
             insert_idx = 0
@@ -131,22 +267,138 @@ class TextGenerator:
             insert_idx = total_sentences // 2
         elif position == "end":
             insert_idx = total_sentences - 1
+        elif isinstance(position, (int, float)) and not isinstance(position, bool):
+            insert_idx = embedder.index_for_depth(position)
         else:
             raise ValueError(f"Invalid position: {position}")
 
         # Insert the fact
-        sentences.insert(insert_idx, fact)
-        result = ". ".join(sentences)
+        result = embedder.embed_at([fact], [insert_idx]).render()
 
-        logger.info(f"Fact embedded at position {position} (index {insert_idx})")
+        logger.debug(f"Fact embedded at position {position} (index {insert_idx})")
         return result, insert_idx
 
+    @staticmethod
+    def embed_needles(
+        text: str,
+        needles: Union[str, List[str]],
+        depths: Union[float, List[float]]
+    ) -> EmbeddedText:
+        """
+        Embed one or many needles at fractional depths without copying text
+
+        Args:
+            text: Base text to embed needles into
+            needles: Needle string, or one needle per depth
+            depths: Depth or list of depths in [0, 1]
+
+        Returns:
+            EmbeddedText with exact char and token offset per needle
+        """
+        return NeedleEmbedder(text).embed(needles, depths)
+
+    @staticmethod
+    def iter_document_batches(
+        num_docs: int = 5,
+        words_per_doc: int = 200,
+        fact: str = "The CEO of the company is David Cohen",
+        batch_size: int = 1000,
+        rng: Optional[np.random.Generator] = None,
+        start: int = 0
+    ) -> Iterator[List[Dict]]:
+        """
+        Lazily generate documents with embedded facts in fixed-size batches
+
+        Only one batch is held in memory at a time, so corpora of any size
+        can be consumed with bounded memory.
+
+        Args:
+            num_docs: Total number of documents to create
+            words_per_doc: Words per document
+            fact: Critical fact to embed
+            batch_size: Documents per yielded batch
+            rng: NumPy generator (default: shared root generator)
+            start: First document to yield; earlier documents are drawn
+                (so the streams stay aligned) but not rendered
+
+        Yields:
+            Lists of up to batch_size document dictionaries
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+        rng = rng if rng is not None else default_generator()
+        positions = ["start", "middle", "end"]
+
+        # Separate streams per quantity make any corpus a prefix of a larger
+        # one drawn from the same generator state
+        word_rng, length_rng, position_rng = TextGenerator._split_streams(rng, 3)
+
+        for offset in range(0, num_docs, batch_size):
+            count = min(batch_size, num_docs - offset)
+            word_ids, sentence_start = TextGenerator._draw_filler_indices(
+                count, words_per_doc, word_rng, length_rng
+            )
+            position_ids = position_rng.integers(len(positions), size=count)
+            skip = min(max(start - offset, 0), count)
+            if skip == count:
+                continue
+            base_texts = TextGenerator._render_filler(word_ids[skip:], sentence_start[skip:])
+
+            batch = []
+            for i, base_text in enumerate(base_texts, start=skip):
+                position = positions[position_ids[i]]
+                doc_text, fact_idx = TextGenerator.embed_critical_fact(
+                    base_text, fact, position
+                )
+
+                batch.append({
+                    "id": offset + i,
+                    "text": doc_text,
+                    "fact": fact,
+                    "fact_position": position,
+                    "fact_index": fact_idx,
+                    "word_count": len(doc_text.split())
+                })
+
+            yield batch
+
+    @staticmethod
+    def iter_documents(
+        num_docs: int = 5,
+        words_per_doc: int = 200,
+        fact: str = "The CEO of the company is David Cohen",
+        batch_size: int = 1000,
+        rng: Optional[np.random.Generator] = None,
+        start: int = 0
+    ) -> Iterator[Dict]:
+        """
+        Lazily generate documents with embedded facts one at a time
+
+        Args:
+            num_docs: Total number of documents to create
+            words_per_doc: Words per document
+            fact: Critical fact to embed
+            batch_size: Documents generated per internal batch
+            rng: NumPy generator (default: shared root generator)
+            start: First document to yield (see iter_document_batches)
+
+        Yields:
+            Document dictionaries with metadata
+        """
+        for batch in TextGenerator.iter_document_batches(
+            num_docs, words_per_doc, fact, batch_size=batch_size, rng=rng, start=start
+        ):
+            yield from batch
+
     @staticmethod
     def create_documents(
         num_docs: int = 5,
         words_per_doc: int = 200,
-        fact: str = "The CEO of the company is David Cohen"
-    ) -> List[Dict]:
+        fact: str = "The CEO of the company is David Cohen",
+        rng: Optional[np.random.Generator] = None,
+        as_table: bool = False
+    ) -> Union[List[Dict], DocumentTable]:
         """
         Create synthetic documents with embedded facts
 
@@ -154,71 +406,121 @@ class TextGenerator:
             num_docs: Number of documents to create
             words_per_doc: Words per document
             fact: Critical fact to embed
+            rng: NumPy generator (default: shared root generator)
+            as_table: Return a columnar DocumentTable instead of dicts
 
         Returns:
-            List of document dictionaries with metadata
+            List of document dictionaries with metadata, or DocumentTable
         """
         logger.info(f"Creating {num_docs} documents with {words_per_doc} words each")
 
-        documents = []
-        positions = ["start", "middle", "end"]
-
-        for i in range(num_docs):
-            base_text = TextGenerator.generate_filler_text(words_per_doc)
-            position = random.choice(positions)
-            doc_text, fact_idx = TextGenerator.embed_critical_fact(
-                base_text, fact, position
-            )
-
-            documents.append({
-                "id": i,
-                "text": doc_text,
-                "fact": fact,
-                "fact_position": position,
-                "fact_index": fact_idx,
-                "word_count": len(doc_text.split())
-            })
+        documents = TextGenerator.iter_documents(
+            num_docs, words_per_doc, fact, rng=rng
+        )
+        documents = DocumentTable.from_documents(documents) if as_table else list(documents)
 
         logger.info(f"Created {len(documents)} documents successfully")
         return documents
 
+    @staticmethod
+    def iter_hebrew_document_batches(
+        count: int = 20,
+        topics: List[str] = None,
+        batch_size: int = 1000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Lazily generate Hebrew documents in fixed-size batches
+
+        Args:
+            count: Total number of documents to create
+            topics: List of topics (default: all topics)
+            batch_size: Documents per yielded batch
+            rng: NumPy generator (default: shared root generator)
+
+        Yields:
+            Lists of up to batch_size Hebrew document dictionaries
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+        if topics is None:
+            topics = list(TextGenerator.HEBREW_TOPICS.keys())
+
+        rng = rng if rng is not None else default_generator()
+
+        for offset in range(0, count, batch_size):
+            batch = []
+            size = min(batch_size, count - offset)
+            topic_ids = rng.integers(len(topics), size=size)
+            for i in range(size):
+                topic = topics[topic_ids[i]]
+                pool = TextGenerator.HEBREW_TOPICS[topic]
+                picks = rng.choice(len(pool), size=min(3, len(pool)), replace=False)
+                sentences = [pool[j] for j in picks]
+
+                # Add some repetition for realistic document size
+                doc_text = " ".join(sentences * 3)
+
+                batch.append({
+                    "id": offset + i,
+                    "text": doc_text,
+                    "topic": topic,
+                    "word_count": len(doc_text.split())
+                })
+
+            yield batch
+
+    @staticmethod
+    def iter_hebrew_documents(
+        count: int = 20,
+        topics: List[str] = None,
+        batch_size: int = 1000,
+        rng: Optional[np.random.Generator] = None
+    ) -> Iterator[Dict]:
+        """
+        Lazily generate Hebrew documents one at a time
+
+        Args:
+            count: Total number of documents to create
+            topics: List of topics (default: all topics)
+            batch_size: Documents generated per internal batch
+            rng: NumPy generator (default: shared root generator)
+
+        Yields:
+            Hebrew document dictionaries
+        """
+        for batch in TextGenerator.iter_hebrew_document_batches(
+            count, topics, batch_size=batch_size, rng=rng
+        ):
+            yield from batch
+
     @staticmethod
     def create_hebrew_documents(
         count: int = 20,
-        topics: List[str] = None
-    ) -> List[Dict]:
+        topics: List[str] = None,
+        rng: Optional[np.random.Generator] = None,
+        as_table: bool = False
+    ) -> Union[List[Dict], DocumentTable]:
         """
         Generate Hebrew documents for RAG testing
 
         Args:
             count: Number of documents to create
             topics: List of topics (default: all topics)
+            rng: NumPy generator (default: shared root generator)
+            as_table: Return a columnar DocumentTable instead of dicts
 
         Returns:
-            List of Hebrew document dictionaries
+            List of Hebrew document dictionaries, or DocumentTable
         """
         if topics is None:
             topics = list(TextGenerator.HEBREW_TOPICS.keys())
 
         logger.info(f"Creating {count} Hebrew documents with topics: {topics}")
 
-        documents = []
-        for i in range(count):
-            topic = random.choice(topics)
-            sentences = random.sample(
-                TextGenerator.HEBREW_TOPICS[topic],
-                min(3, len(TextGenerator.HEBREW_TOPICS[topic]))
-            )
-
-            # Add some repetition for realistic document size
-            doc_text = " ".join(sentences * 3)
-
-            documents.append({
-                "id": i,
-                "text": doc_text,
-                "topic": topic,
-                "word_count": len(doc_text.split())
-            })
+        documents = TextGenerator.iter_hebrew_documents(count, topics, rng=rng)
+        documents = DocumentTable.from_documents(documents) if as_table else list(documents)
 
         logger.info(f"Created {len(documents)} Hebrew documents")
         return documents
@@ -237,3 +539,26 @@ class TextGenerator:
         texts = [doc['text'] for doc in documents]
         context = "\n\n".join(texts)
         return context
+
+
+    @staticmethod
+    def build_context(documents: Union[List[Dict], DocumentTable]) -> ContextBuffer:
+        """
+        Build a span-based context without concatenating documents
+
+        Args:
+            documents: List of document dictionaries, or DocumentTable
+
+        Returns:
+            ContextBuffer equivalent to concatenate_documents()
+        """
+        if isinstance(documents, DocumentTable):
+            # Reuse the table's per-document token counts
+            return ContextBuffer(
+                documents.texts, separator="\n\n", token_counts=documents.token_counts
+            )
+        return ContextBuffer.from_documents(documents, separator="\n\n")
+
+
+# Rendered filler tokens, indexed by word_id * 4 + (start | end << 1)
+_FILLER_TOKENS = TextGenerator._filler_token_table()
@@ -0,0 +1,322 @@
+"""
+Latency Timing Registry for Context Windows Lab
+Named high-resolution timers backed by log-bucketed histograms
+Author: Context Windows Lab
+"""
+
+import logging
+import threading
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Experiment phases reported by every experiment
+PHASES = ("generation", "retrieval", "llm_call", "evaluation", "plotting")
+
+# Log-linear buckets: values below 2**SUB_BITS ns are exact, larger values
+# keep SUB_BITS - 1 significant bits (relative error < 1/64)
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+# Up to 2**48 ns (~3 days) before clamping into the last bucket
+MAX_SHIFT = 48 - SUB_BITS
+NUM_BUCKETS = SUB_COUNT + MAX_SHIFT * HALF_COUNT
+
+
+def _bucket_bounds() -> np.ndarray:
+    """Lower bound (ns) of every bucket, plus the upper bound of the last"""
+    lower = list(range(SUB_COUNT))
+    for shift in range(1, MAX_SHIFT + 1):
+        lower.extend((m << shift) for m in range(HALF_COUNT, SUB_COUNT))
+    lower.append(SUB_COUNT << MAX_SHIFT)
+    return np.asarray(lower, dtype=np.float64)
+
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+
+# Samples buffered before being bucketed in one vectorized pass
+FLUSH_SIZE = 4096
+
+
+def bucket_indices(values_ns: np.ndarray) -> np.ndarray:
+    """
+    Histogram bucket of each duration
+
+    Args:
+        values_ns: Durations in nanoseconds (int64)
+
+    Returns:
+        Bucket index per value
+    """
+    values = np.maximum(np.asarray(values_ns, dtype=np.int64), 0)
+    # frexp exponent equals int.bit_length for values exact in float64
+    _, bit_length = np.frexp(values.astype(np.float64))
+    shift = bit_length.astype(np.int64) - SUB_BITS
+    scaled = np.right_shift(values, np.clip(shift, 0, MAX_SHIFT))
+    indices = np.where(shift <= 0, values, (shift - 1) * HALF_COUNT + scaled + HALF_COUNT)
+    return np.minimum(indices, NUM_BUCKETS - 1)
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond durations
+
+    record() only appends to a buffer; buffered samples are bucketed with
+    NumPy every FLUSH_SIZE samples and whenever statistics are read, which
+    keeps the per-sample cost to a list append.
+    """
+
+    __slots__ = ("_counts", "_count", "_total_ns", "_min_ns", "_max_ns", "_pending")
+
+    def __init__(self):
+        self._counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+        self._count = 0
+        self._total_ns = 0
+        self._min_ns = 0
+        self._max_ns = 0
+        self._pending: List[int] = []
+
+    def record(self, value_ns: int) -> None:
+        """
+        Add one duration
+
+        Args:
+            value_ns: Duration in nanoseconds
+        """
+        pending = self._pending
+        pending.append(value_ns)
+        if len(pending) >= FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Bucket buffered samples"""
+        if not self._pending:
+            return
+        values = np.asarray(self._pending, dtype=np.int64)
+        self._pending = []
+
+        self._counts += np.bincount(bucket_indices(values), minlength=NUM_BUCKETS)
+        low, high = int(values.min()), int(values.max())
+        self._min_ns = low if not self._count else min(self._min_ns, low)
+        self._max_ns = max(self._max_ns, high)
+        self._count += len(values)
+        self._total_ns += int(values.sum())
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Samples per bucket"""
+        self._flush()
+        return self._counts
+
+    @property
+    def count(self) -> int:
+        """Number of samples"""
+        return self._count + len(self._pending)
+
+    @property
+    def min_ns(self) -> int:
+        self._flush()
+        return self._min_ns
+
+    @property
+    def max_ns(self) -> int:
+        self._flush()
+        return self._max_ns
+
+    @property
+    def total_ns(self) -> int:
+        self._flush()
+        return self._total_ns
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's samples into this one"""
+        other._flush()
+        if not other._count:
+            return
+        self._flush()
+        self._counts += other._counts
+        self._min_ns = other._min_ns if not self._count else min(self._min_ns, other._min_ns)
+        self._max_ns = max(self._max_ns, other._max_ns)
+        self._count += other._count
+        self._total_ns += other._total_ns
+
+    def percentiles(self, quantiles: List[float]) -> List[float]:
+        """
+        Estimated duration at each quantile
+
+        Args:
+            quantiles: Quantiles in [0, 1]
+
+        Returns:
+            Durations in nanoseconds (bucket midpoints, clamped to min/max)
+        """
+        self._flush()
+        if not self._count:
+            return [0.0] * len(quantiles)
+
+        cumulative = np.cumsum(self._counts)
+        ranks = np.maximum(np.ceil(np.asarray(quantiles) * self._count), 1)
+        indices = np.searchsorted(cumulative, ranks)
+        midpoints = (BUCKET_BOUNDS[indices] + BUCKET_BOUNDS[indices + 1]) / 2
+        return np.clip(midpoints, self._min_ns, self._max_ns).tolist()
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Summary statistics in milliseconds
+
+        Returns:
+            Dictionary with count, mean, p50, p90, p99, min and max
+        """
+        p50, p90, p99 = self.percentiles([0.50, 0.90, 0.99])
+        count = self._count
+        return {
+            "count": count,
+            "mean_ms": self._total_ns / count / 1e6 if count else 0.0,
+            "p50_ms": p50 / 1e6,
+            "p90_ms": p90 / 1e6,
+            "p99_ms": p99 / 1e6,
+            "min_ms": self._min_ns / 1e6,
+            "max_ms": self._max_ns / 1e6,
+            "total_ms": self._total_ns / 1e6
+        }
+
+
+class Timer:
+    """Context manager timing one block into a histogram"""
+
+    __slots__ = ("_histogram", "_now", "_start", "elapsed_ns")
+
+    def __init__(self, histogram: LatencyHistogram, now: Callable[[], int] = perf_counter_ns):
+        self._histogram = histogram
+        self._now = now
+        self._start = 0
+        self.elapsed_ns = 0
+
+    def __enter__(self) -> "Timer":
+        self._start = self._now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed_ns = self.elapsed_ns = self._now() - self._start
+        # Inlined LatencyHistogram.record
+        histogram = self._histogram
+        pending = histogram._pending
+        pending.append(elapsed_ns)
+        if len(pending) >= FLUSH_SIZE:
+            histogram._flush()
+
+    @property
+    def elapsed(self) -> float:
+        """Elapsed time in seconds"""
+        return self.elapsed_ns / 1e9
+
+
+class TimingRegistry:
+    """
+    Named latency histograms
+
+    Each thread records into its own shard of histograms, so the hot path
+    takes no lock; shards are merged when a snapshot is taken. Experiments
+    keep one registry each and export its snapshot into their results JSON.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[str, LatencyHistogram]] = []
+        self._lock = threading.Lock()
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        """This thread's histogram for a timer name"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        histogram = shard.get(name)
+        if histogram is None:
+            histogram = shard[name] = LatencyHistogram()
+        return histogram
+
+    def record(self, name: str, value_ns: int) -> None:
+        """
+        Record one duration under a timer name
+
+        Args:
+            name: Timer (phase) name
+            value_ns: Duration in nanoseconds
+        """
+        try:
+            histogram = self._local.shard[name]
+        except (AttributeError, KeyError):
+            histogram = self._histogram(name)
+        histogram.record(value_ns)
+
+    def timer(self, name: str, clock=None) -> Timer:
+        """
+        Time a block: ``with registry.timer("llm_call") as t: ...``
+
+        Args:
+            name: Timer (phase) name
+            clock: utils.clock.Clock to read instead of perf_counter_ns
+                (a VirtualClock records simulated time)
+
+        Returns:
+            Timer context manager; elapsed / elapsed_ns are set on exit
+        """
+        now = perf_counter_ns if clock is None else clock.now_ns
+        try:
+            return Timer(self._local.shard[name], now)
+        except (AttributeError, KeyError):
+            return Timer(self._histogram(name), now)
+
+    def histogram(self, name: str) -> Optional[LatencyHistogram]:
+        """
+        Merged histogram for a timer name
+
+        Returns:
+            LatencyHistogram, or None if nothing was recorded under name
+        """
+        merged = None
+        with self._lock:
+            for shard in self._shards:
+                histogram = shard.get(name)
+                if histogram is not None:
+                    merged = merged or LatencyHistogram()
+                    merged.merge(histogram)
+        return merged
+
+    def names(self) -> List[str]:
+        """Recorded timer names, standard phases first"""
+        with self._lock:
+            recorded = {name for shard in self._shards for name in list(shard)}
+        ordered = [p for p in PHASES if p in recorded]
+        return ordered + sorted(recorded - set(PHASES))
+
+    def merge(self, other: "TimingRegistry") -> None:
+        """Add another registry's samples into this one"""
+        for name in other.names():
+            self._histogram(name).merge(other.histogram(name))
+
+    def reset(self) -> None:
+        """Drop all samples"""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Statistics for every timer, standard phases first
+
+        Returns:
+            Timer name -> summary statistics
+        """
+        return {name: self.histogram(name).snapshot() for name in self.names()}
+
+
+# Process-wide registry for ad-hoc timers (e.g. measure_latency)
+TIMINGS = TimingRegistry()
@@ -0,0 +1,217 @@
+"""
+Incremental Token Accounting for Context Windows Lab
+Keeps running token totals for append-only contexts such as action histories
+Author: Context Windows Lab
+"""
+
+import logging
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from utils.metrics import MetricsEvaluator
+from utils.context_buffer import ContextBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class TokenLedger:
+    """
+    Segments joined by a separator, with per-segment and running counts
+
+    Each segment is tokenized once when it is added. Cumulative character
+    lengths and token counts are kept in growable arrays, so appending
+    costs O(new text) and the token count of any contiguous range is O(1).
+    Range totals follow the same rules as ContextBuffer.total_tokens:
+    length-based tokenizers count the joined length, others sum segment
+    counts plus one separator count per join.
+
+    Views returned by view() share the ledger's storage. truncate() and
+    splice() rebuild the storage, so views taken before them stay valid.
+    """
+
+    def __init__(self, segments: Iterable[str] = (), separator: str = "\n", capacity: int = 64):
+        """
+        Initialize ledger
+
+        Args:
+            segments: Initial segments
+            separator: String placed between consecutive segments
+            capacity: Initial array capacity (grows by doubling)
+        """
+        self.separator = separator
+        self._tokenizer = MetricsEvaluator.get_tokenizer()
+        self._separator_tokens = self._tokenizer.count(separator)
+        self._reset(max(capacity, 1))
+        self.extend(segments)
+
+    def _reset(self, capacity: int) -> None:
+        """Allocate empty storage"""
+        self._texts: List[str] = []
+        self._cum_lengths = np.zeros(capacity + 1, dtype=np.int64)
+        self._cum_tokens = np.zeros(capacity + 1, dtype=np.int64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self) -> None:
+        """Double array capacity"""
+        capacity = 2 * len(self._counts)
+        self._counts = np.resize(self._counts, capacity)
+        self._cum_lengths = np.resize(self._cum_lengths, capacity + 1)
+        self._cum_tokens = np.resize(self._cum_tokens, capacity + 1)
+
+    def __len__(self) -> int:
+        """Number of segments"""
+        return len(self._texts)
+
+    def __getitem__(self, index: int) -> str:
+        return self._texts[index]
+
+    def append(self, text: str) -> int:
+        """
+        Add a segment at the end
+
+        Args:
+            text: Segment text
+
+        Returns:
+            Token count of the segment
+        """
+        n = len(self._texts)
+        if n == len(self._counts):
+            self._grow()
+
+        count = self._tokenizer.count(text)
+        self._texts.append(text)
+        self._counts[n] = count
+        self._cum_lengths[n + 1] = self._cum_lengths[n] + len(text)
+        self._cum_tokens[n + 1] = self._cum_tokens[n] + count
+        return count
+
+    def extend(self, texts: Iterable[str]) -> None:
+        """Append several segments"""
+        for text in texts:
+            self.append(text)
+
+    def truncate(self, count: int) -> None:
+        """
+        Keep only the first `count` segments
+
+        Args:
+            count: Segments to keep
+        """
+        if not 0 <= count <= len(self._texts):
+            raise ValueError(f"Truncate size out of range: {count}")
+        self.splice(count, len(self._texts), ())
+
+    def splice(self, start: int, stop: int, texts: Iterable[str]) -> None:
+        """
+        Replace segments [start, stop) with new ones
+
+        Counts of the retained segments are reused; only new texts are
+        tokenized.
+
+        Args:
+            start: First segment to replace
+            stop: End of the replaced range (exclusive)
+            texts: Replacement segments
+        """
+        if not 0 <= start <= stop <= len(self._texts):
+            raise ValueError(f"Invalid splice range: [{start}, {stop})")
+
+        head = self._texts[:start]
+        tail = self._texts[stop:]
+        head_counts = self._counts[:start].copy()
+        tail_counts = self._counts[stop:len(self._texts)].copy()
+
+        self._reset(max(len(self._counts), 1))
+        for text, count in zip(head, head_counts.tolist()):
+            self._append_counted(text, count)
+        self.extend(texts)
+        for text, count in zip(tail, tail_counts.tolist()):
+            self._append_counted(text, count)
+
+    def _append_counted(self, text: str, count: int) -> None:
+        """Append a segment whose token count is already known"""
+        n = len(self._texts)
+        if n == len(self._counts):
+            self._grow()
+        self._texts.append(text)
+        self._counts[n] = count
+        self._cum_lengths[n + 1] = self._cum_lengths[n] + len(text)
+        self._cum_tokens[n + 1] = self._cum_tokens[n] + count
+
+    def copy(self) -> "TokenLedger":
+        """Independent ledger with the same segments and counts"""
+        ledger = TokenLedger.__new__(TokenLedger)
+        ledger.separator = self.separator
+        ledger._tokenizer = self._tokenizer
+        ledger._separator_tokens = self._separator_tokens
+        ledger._texts = list(self._texts)
+        ledger._cum_lengths = self._cum_lengths.copy()
+        ledger._cum_tokens = self._cum_tokens.copy()
+        ledger._counts = self._counts.copy()
+        return ledger
+
+    def segment_tokens(self, index: int) -> int:
+        """Token count of one segment"""
+        if not 0 <= index < len(self._texts):
+            raise IndexError(f"Segment index out of range: {index}")
+        return int(self._counts[index])
+
+    def tokens(self, start: int = 0, stop: Optional[int] = None) -> int:
+        """
+        Token count of segments [start, stop) joined by the separator
+
+        Args:
+            start: First segment
+            stop: End segment, exclusive (default: all)
+
+        Returns:
+            Token count
+        """
+        stop = len(self._texts) if stop is None else stop
+        if not 0 <= start <= stop <= len(self._texts):
+            raise ValueError(f"Invalid range: [{start}, {stop})")
+        if start == stop:
+            return 0
+
+        joins = stop - start - 1
+        if self._tokenizer.length_based:
+            chars = int(self._cum_lengths[stop] - self._cum_lengths[start])
+            return (chars + joins * len(self.separator)) // self._tokenizer.chars_per_token
+        return int(self._cum_tokens[stop] - self._cum_tokens[start]) + joins * self._separator_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        """Token count of the whole joined ledger"""
+        return self.tokens()
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> ContextBuffer:
+        """
+        Context over segments [start, stop)
+
+        Prefix views share the ledger's storage; other ranges copy only the
+        selected entries. Token counts are carried over, never recomputed.
+
+        Args:
+            start: First segment
+            stop: End segment, exclusive (default: all)
+
+        Returns:
+            ContextBuffer with precomputed token counts
+        """
+        stop = len(self._texts) if stop is None else stop
+        total = self.tokens(start, stop)
+
+        if start == 0:
+            return ContextBuffer._view(
+                self._texts, self.separator, self._cum_lengths,
+                self._counts, stop, total_tokens=total
+            )
+
+        view = ContextBuffer(
+            self._texts[start:stop], self.separator,
+            token_counts=self._counts[start:stop]
+        )
+        view._total_tokens = total
+        return view
@@ -0,0 +1,419 @@
+"""
+Tokenizers for Context Windows Lab
+Pluggable token counters: the length heuristic and an offline byte-level BPE
+Author: Context Windows Lab
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sys
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# GPT-2 style pre-tokenizer; [^\W\d_] stands in for \p{L} so Hebrew letters
+# are grouped into words
+PRETOKENIZE_PATTERN = re.compile(
+    r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+"""
+)
+
+
+def bytes_to_unicode() -> Dict[int, str]:
+    """
+    GPT-2 byte -> printable character table
+
+    Every byte maps to a distinct visible character so byte sequences can be
+    stored as plain strings in vocab/merges files.
+
+    Returns:
+        Dictionary of byte value -> character
+    """
+    printable = (
+        list(range(ord("!"), ord("~") + 1))
+        + list(range(ord("¡"), ord("¬") + 1))
+        + list(range(ord("®"), ord("ÿ") + 1))
+    )
+    chars = printable[:]
+    extra = 0
+    for b in range(256):
+        if b not in printable:
+            printable.append(b)
+            chars.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, (chr(c) for c in chars)))
+
+
+BYTE_ENCODER = bytes_to_unicode()
+
+
+class Tokenizer(ABC):
+    """
+    Base class for token counters
+
+    Subclasses implement _count_uncached. Counts are memoized in an LRU
+    keyed by a hash of the text, so repeated contexts (the same haystack
+    across trials, growing histories) are only tokenized once.
+    """
+
+    name = "base"
+    # Length-based tokenizers count a concatenation from its length alone
+    length_based = False
+
+    def __init__(self, cache_size: int = 65536):
+        """
+        Initialize tokenizer
+
+        Args:
+            cache_size: Maximum memoized texts (0 disables the cache)
+        """
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @abstractmethod
+    def _count_uncached(self, text: str) -> int:
+        """Token count of text, bypassing the memo"""
+
+    def count(self, text: str) -> int:
+        """
+        Count tokens in text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Token count
+        """
+        if not text:
+            return 0
+        if not self.cache_size:
+            return self._count_uncached(text)
+
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+
+        self.cache_misses += 1
+        count = self._count_uncached(text)
+        self._cache[key] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """
+        Count tokens for many texts
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Token count per text
+        """
+        return [self.count(text) for text in texts]
+
+    def cache_info(self) -> Dict[str, int]:
+        """Memoization statistics"""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "entries": len(self._cache)
+        }
+
+
+class HeuristicTokenizer(Tokenizer):
+    """Characters-per-token estimate (the original count_tokens)"""
+
+    name = "heuristic"
+    length_based = True
+
+    def __init__(self, chars_per_token: int = 4):
+        """
+        Initialize tokenizer
+
+        Args:
+            chars_per_token: Characters counted as one token
+        """
+        super().__init__(cache_size=0)
+        self.chars_per_token = chars_per_token
+
+    def _count_uncached(self, text: str) -> int:
+        return len(text) // self.chars_per_token
+
+    def count(self, text: str) -> int:
+        return len(text) // self.chars_per_token if text else 0
+
+
+class BPETokenizer(Tokenizer):
+    """
+    Byte-level BPE tokenizer loaded from local vocab/merges files
+
+    Uses the GPT-2 file layout (vocab.json mapping token -> id, merges.txt
+    with one space-separated pair per line) so compatible vocabularies can
+    be dropped in; BPETokenizer.train builds one from local text.
+    """
+
+    name = "bpe"
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        merges: Sequence[Tuple[str, str]],
+        cache_size: int = 65536
+    ):
+        """
+        Initialize tokenizer
+
+        Args:
+            vocab: Token string -> id
+            merges: Merge pairs in priority order
+            cache_size: Maximum memoized texts
+        """
+        super().__init__(cache_size)
+        self.vocab = vocab
+        self.ranks = {tuple(pair): rank for rank, pair in enumerate(merges)}
+        # Pre-token -> BPE pieces; pre-tokens repeat heavily across texts
+        self._word_cache: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def from_files(cls, vocab_path: str, merges_path: str, cache_size: int = 65536) -> "BPETokenizer":
+        """
+        Load a tokenizer from vocab.json and merges.txt
+
+        Args:
+            vocab_path: Path to vocab.json
+            merges_path: Path to merges.txt
+            cache_size: Maximum memoized texts
+
+        Returns:
+            BPETokenizer
+        """
+        with open(vocab_path, encoding="utf-8") as f:
+            vocab = json.load(f)
+        merges = []
+        with open(merges_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line or line.startswith("#version"):
+                    continue
+                first, second = line.split(" ")
+                merges.append((first, second))
+        logger.info(f"Loaded BPE tokenizer: {len(vocab)} tokens, {len(merges)} merges")
+        return cls(vocab, merges, cache_size)
+
+    def save(self, output_dir: str) -> Tuple[Path, Path]:
+        """
+        Write vocab.json and merges.txt
+
+        Args:
+            output_dir: Directory for the two files
+
+        Returns:
+            Tuple of (vocab path, merges path)
+        """
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        vocab_path = out / "vocab.json"
+        merges_path = out / "merges.txt"
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        merges = sorted(self.ranks, key=self.ranks.get)
+        with open(merges_path, "w", encoding="utf-8") as f:
+            f.write("#version: 0.2\n")
+            f.writelines(f"{a} {b}\n" for a, b in merges)
+        return vocab_path, merges_path
+
+    @staticmethod
+    def _pretokenize(text: str) -> List[str]:
+        """Split text into byte-mapped pre-tokens"""
+        return [
+            "".join(BYTE_ENCODER[b] for b in piece.encode("utf-8"))
+            for piece in PRETOKENIZE_PATTERN.findall(text)
+        ]
+
+    def _bpe(self, word: str) -> Tuple[str, ...]:
+        """Apply merges to one pre-token (memoized)"""
+        pieces = self._word_cache.get(word)
+        if pieces is not None:
+            return pieces
+
+        parts = list(word)
+        ranks = self.ranks
+        while len(parts) > 1:
+            best_rank, best_i = None, -1
+            for i in range(len(parts) - 1):
+                rank = ranks.get((parts[i], parts[i + 1]))
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_i = rank, i
+            if best_rank is None:
+                break
+            merged = parts[best_i] + parts[best_i + 1]
+            # Merge every occurrence of the winning pair in one pass
+            first, second = parts[best_i], parts[best_i + 1]
+            out, i = [], 0
+            while i < len(parts):
+                if i < len(parts) - 1 and parts[i] == first and parts[i + 1] == second:
+                    out.append(merged)
+                    i += 2
+                else:
+                    out.append(parts[i])
+                    i += 1
+            parts = out
+
+        pieces = tuple(parts)
+        self._word_cache[word] = pieces
+        return pieces
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Split text into BPE token strings
+
+        Args:
+            text: Input text
+
+        Returns:
+            List of token strings
+        """
+        tokens = []
+        for word in self._pretokenize(text):
+            tokens.extend(self._bpe(word))
+        return tokens
+
+    def encode(self, text: str) -> List[int]:
+        """
+        Encode text to token ids
+
+        Args:
+            text: Input text
+
+        Returns:
+            List of token ids
+        """
+        return [self.vocab[token] for token in self.tokenize(text)]
+
+    def _count_uncached(self, text: str) -> int:
+        return sum(len(self._bpe(word)) for word in self._pretokenize(text))
+
+    @classmethod
+    def train(cls, texts: Iterable[str], vocab_size: int = 4096) -> "BPETokenizer":
+        """
+        Learn a byte-level BPE vocabulary from text
+
+        Args:
+            texts: Training texts
+            vocab_size: Target vocabulary size (256 byte tokens included)
+
+        Returns:
+            Trained BPETokenizer
+        """
+        word_freqs = Counter()
+        for text in texts:
+            word_freqs.update(cls._pretokenize(text))
+
+        words = [list(word) for word in word_freqs]
+        freqs = list(word_freqs.values())
+        vocab = {ch: i for i, ch in enumerate(BYTE_ENCODER.values())}
+        merges = []
+
+        while len(vocab) < vocab_size:
+            pair_counts = Counter()
+            for parts, freq in zip(words, freqs):
+                for pair in zip(parts, parts[1:]):
+                    pair_counts[pair] += freq
+            if not pair_counts:
+                break
+
+            best = max(pair_counts, key=pair_counts.get)
+            merged = best[0] + best[1]
+            merges.append(best)
+            vocab[merged] = len(vocab)
+
+            for w, parts in enumerate(words):
+                if len(parts) < 2:
+                    continue
+                out, i = [], 0
+                while i < len(parts):
+                    if i < len(parts) - 1 and parts[i] == best[0] and parts[i + 1] == best[1]:
+                        out.append(merged)
+                        i += 2
+                    else:
+                        out.append(parts[i])
+                        i += 1
+                words[w] = out
+
+        logger.info(f"Trained BPE tokenizer: {len(vocab)} tokens, {len(merges)} merges")
+        return cls(vocab, merges)
+
+
+def create_tokenizer(name: Optional[str] = None) -> Tokenizer:
+    """
+    Build the configured tokenizer
+
+    Falls back to the heuristic when the BPE files are missing.
+
+    Args:
+        name: 'heuristic' or 'bpe' (default: TOKENIZER setting)
+
+    Returns:
+        Tokenizer instance
+    """
+    settings = Config.get_tokenizer_config()
+    name = name or settings['name']
+
+    if name == "heuristic":
+        return HeuristicTokenizer(settings['chars_per_token'])
+    if name != "bpe":
+        raise ValueError(f"Unknown tokenizer: {name}")
+
+    vocab_path = Path(settings['vocab_path'])
+    merges_path = Path(settings['merges_path'])
+    if not vocab_path.exists() or not merges_path.exists():
+        logger.warning(
+            f"BPE files not found ({vocab_path}, {merges_path}), "
+            f"using heuristic token counts"
+        )
+        return HeuristicTokenizer(settings['chars_per_token'])
+    return BPETokenizer.from_files(vocab_path, merges_path, settings['cache_size'])
+
+
+def main():
+    """Train a BPE vocabulary on the lab's generated corpora"""
+    from utils.text_generator import TextGenerator
+
+    parser = argparse.ArgumentParser(
+        description='Train a byte-level BPE vocabulary for token counting'
+    )
+    parser.add_argument('--output-dir', type=str, default='src/data/tokenizer')
+    parser.add_argument('--vocab-size', type=int, default=4096)
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--input', type=str, nargs='*', default=[],
+                        help='Additional UTF-8 text files to train on')
+    args = parser.parse_args()
+
+    texts = [doc['text'] for doc in TextGenerator.iter_documents(
+        args.docs, 200, "The CEO of the company is David Cohen")]
+    texts += [doc['text'] for doc in TextGenerator.iter_hebrew_documents(args.docs)]
+    for path in args.input:
+        texts.append(Path(path).read_text(encoding="utf-8"))
+
+    tokenizer = BPETokenizer.train(texts, args.vocab_size)
+    vocab_path, merges_path = tokenizer.save(args.output_dir)
+    print(f"Wrote {vocab_path} and {merges_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ Author: Context Windows Lab
 """
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
@@ -31,7 +31,8 @@ class Visualizer:
     def plot_accuracy_by_position(
         results: Dict[str, List[float]],
         output_path: str = None,
-        title: str = "Accuracy by Fact Position"
+        title: str = "Accuracy by Fact Position",
+        intervals: Optional[Dict[str, Tuple[float, float]]] = None
     ) -> None:
         """
         Create bar chart showing accuracy by fact position
@@ -40,6 +41,7 @@ class Visualizer:
             results: Dictionary with positions as keys, accuracy lists as values
             output_path: Path to save plot (optional)
             title: Plot title
+            intervals: Optional (low, high) confidence interval per position
         """
         logger.info("Creating accuracy by position plot")
 
@@ -49,7 +51,16 @@ class Visualizer:
 
         # Create bar plot
         plt.figure(figsize=(10, 6))
-        bars = plt.bar(positions, averages, color=['#2ecc71', '#e74c3c', '#3498db'])
+        yerr = None
+        if intervals:
+            yerr = [
+                [max(avg - intervals[pos][0], 0.0) for pos, avg in zip(positions, averages)],
+                [max(intervals[pos][1] - avg, 0.0) for pos, avg in zip(positions, averages)]
+            ]
+        bars = plt.bar(
+            positions, averages, color=['#2ecc71', '#e74c3c', '#3498db'],
+            yerr=yerr, capsize=8 if yerr else 0
+        )
 
         # Add value labels on bars
         for bar, avg in zip(bars, averages):
@@ -99,6 +110,11 @@ class Visualizer:
             df['num_docs'], df['accuracy'],
             marker='o', linewidth=2, markersize=8, color='#3498db'
         )
+        if 'accuracy_ci' in df:
+            ax1.fill_between(
+                df['num_docs'], df['accuracy_ci'].str[0], df['accuracy_ci'].str[1],
+                color='#3498db', alpha=0.2
+            )
         ax1.set_xlabel('Number of Documents', fontsize=12, fontweight='bold')
         ax1.set_ylabel('Accuracy', fontsize=12, fontweight='bold')
         ax1.set_title('Accuracy Degradation vs Context Size', fontsize=13, fontweight='bold')
@@ -110,6 +126,11 @@ class Visualizer:
             df['num_docs'], df['latency'],
             marker='s', linewidth=2, markersize=8, color='#e74c3c'
         )
+        if 'latency_ci' in df:
+            ax2.fill_between(
+                df['num_docs'], df['latency_ci'].str[0], df['latency_ci'].str[1],
+                color='#e74c3c', alpha=0.2
+            )
         ax2.set_xlabel('Number of Documents', fontsize=12, fontweight='bold')
         ax2.set_ylabel('Latency (seconds)', fontsize=12, fontweight='bold')
         ax2.set_title('Response Time vs Context Size', fontsize=13, fontweight='bold')
@@ -124,6 +145,66 @@ class Visualizer:
         plt.show()
         plt.close()
 
+    @staticmethod
+    def plot_latency_breakdown(
+        results: List[Dict],
+        output_path: str = None
+    ) -> None:
+        """
+        Create stacked bars of time to first token and decode time per
+        context size, next to inter-token latency
+
+        Args:
+            results: List of result dictionaries with ttft, decode_time
+                and inter_token_latency
+            output_path: Path to save plot (optional)
+        """
+        logger.info("Creating latency breakdown plot")
+
+        df = pd.DataFrame(results)
+        # Unmeasured components are None; plot them as gaps
+        for column in ('ttft', 'decode_time', 'inter_token_latency'):
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        labels = [f"{n}\n({t:,} tok)" for n, t in zip(df['num_docs'], df['tokens_used'])]
+        positions = range(len(df))
+
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+        # Plot 1: Latency split into prefill (TTFT) and decode
+        ax1.bar(positions, df['ttft'], color='#e74c3c', label='Time to first token (prefill)')
+        ax1.bar(
+            positions, df['decode_time'], bottom=df['ttft'],
+            color='#3498db', label='Decode (remaining tokens)'
+        )
+        ax1.set_xticks(list(positions))
+        ax1.set_xticklabels(labels)
+        ax1.set_xlabel('Number of Documents', fontsize=12, fontweight='bold')
+        ax1.set_ylabel('Latency (seconds)', fontsize=12, fontweight='bold')
+        ax1.set_title('Where Latency Goes as Context Grows', fontsize=13, fontweight='bold')
+        ax1.legend(fontsize=10, loc='upper left')
+        ax1.grid(True, alpha=0.3, axis='y')
+        ax1.grid(False, axis='x')
+
+        # Plot 2: Inter-token latency
+        ax2.plot(
+            df['num_docs'], df['inter_token_latency'] * 1000,
+            marker='o', linewidth=2, markersize=8, color='#2ecc71'
+        )
+        ax2.set_xlabel('Number of Documents', fontsize=12, fontweight='bold')
+        ax2.set_ylabel('Inter-token Latency (ms)', fontsize=12, fontweight='bold')
+        ax2.set_title('Decode Speed vs Context Size', fontsize=13, fontweight='bold')
+        ax2.set_ylim(bottom=0)
+        ax2.grid(True, alpha=0.3)
+
+        if output_path:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            logger.info(f"Plot saved to {output_path}")
+
+        plt.tight_layout()
+        plt.show()
+        plt.close()
+
     @staticmethod
     def plot_rag_comparison(
         results: Dict,
@@ -239,3 +320,44 @@ class Visualizer:
         plt.tight_layout()
         plt.show()
         plt.close()
+
+    @staticmethod
+    def plot_memory_scaling(
+        curve: Dict[str, List[Dict]],
+        output_path: str = None,
+        title: str = "Memory by Phase vs Experiment Size"
+    ) -> None:
+        """
+        Create line graph of per-phase peak memory against experiment size
+
+        Args:
+            curve: Phase -> list of {size, peak_bytes} points
+                (MemoryTracker.scaling_curve)
+            output_path: Path to save plot (optional)
+            title: Plot title
+        """
+        logger.info("Creating memory scaling plot")
+
+        fig, ax = plt.subplots(figsize=(10, 6))
+
+        for phase, points in curve.items():
+            ax.plot(
+                [p['size'] for p in points],
+                [p['peak_bytes'] / (1024 * 1024) for p in points],
+                marker='o', linewidth=2, markersize=6, label=phase
+            )
+
+        ax.set_xlabel('Experiment Size (documents)', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Peak Traced Memory (MiB)', fontsize=12, fontweight='bold')
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.legend(fontsize=10, loc='best')
+        ax.grid(True, alpha=0.3)
+
+        if output_path:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            logger.info(f"Plot saved to {output_path}")
+
+        plt.tight_layout()
+        plt.show()
+        plt.close()